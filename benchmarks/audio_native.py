@@ -0,0 +1,86 @@
+"""
+Native audio benchmark — CPU per track: MP3 transcode vs M4A stream copy.
+
+For each audio file in a corpus directory (YouTube itag 140 .m4a files,
+as yt-dlp writes them with -f "bestaudio[ext=m4a]"), runs the two
+delivery paths the bot has:
+
+  mp3 320   FFmpegExtractAudio → libmp3lame -b:a 320k   (download_youtube_audio)
+  mp3 192   libmp3lame -b:a 192k -threads 4             (download_youtube_audio_192k)
+  m4a copy  -c:a copy -map_metadata 0 +faststart        (AUDIO_NATIVE, remux_audio)
+
+and prints ffmpeg's user+system CPU seconds (from the child rusage),
+wall time and output size per track, plus totals — the numbers to compare
+against playlist CPU load. Needs only ffmpeg on PATH — no bot dependencies.
+
+Usage:
+    python benchmarks/audio_native.py ~/m4a_corpus
+    python benchmarks/audio_native.py ~/m4a_corpus --repeat 3
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+AUDIO_EXTS = (".m4a", ".mp4", ".aac")
+
+MODES: Dict[str, Tuple[str, List[str]]] = {
+    "mp3 320":  ("mp3", ["-vn", "-c:a", "libmp3lame", "-b:a", "320k"]),
+    "mp3 192":  ("mp3", ["-vn", "-c:a", "libmp3lame", "-b:a", "192k", "-threads", "4"]),
+    "m4a copy": ("m4a", ["-vn", "-c:a", "copy", "-map_metadata", "0", "-movflags", "+faststart"]),
+}
+
+
+def _child_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_mode(src: Path, dst: Path, args: List[str]) -> Tuple[float, float]:
+    """(CPU seconds, wall seconds) for one ffmpeg run"""
+    cpu_before, started = _child_cpu(), time.monotonic()
+    subprocess.run(["ffmpeg", "-y", "-v", "error", "-i", str(src), *args, str(dst)], check=True)
+    return _child_cpu() - cpu_before, time.monotonic() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("corpus", type=Path, help="directory of .m4a tracks")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per track and mode (best is kept)")
+    opts = parser.parse_args()
+
+    tracks = sorted(p for p in opts.corpus.iterdir() if p.suffix.lower() in AUDIO_EXTS)
+    if not tracks:
+        print(f"No tracks in {opts.corpus}", file=sys.stderr)
+        return 1
+
+    totals = {mode: [0.0, 0.0, 0.0] for mode in MODES}   # cpu, wall, MB
+    header = "".join(f"{mode + ' cpu/wall/MB':>26}" for mode in MODES)
+    print(f"{'track':<34}{header}")
+    with tempfile.TemporaryDirectory(prefix="audiobench_") as tmp:
+        for track in tracks:
+            cells = []
+            for mode, (ext, args) in MODES.items():
+                out = Path(tmp) / f"out.{ext}"
+                cpu, wall = min(run_mode(track, out, args) for _ in range(max(1, opts.repeat)))
+                mb = out.stat().st_size / 1024 / 1024
+                for i, value in enumerate((cpu, wall, mb)):
+                    totals[mode][i] += value
+                cells.append(f"{cpu:8.2f}s {wall:6.2f}s {mb:6.1f}")
+                out.unlink()
+            print(f"{track.name[:33]:<34}" + "".join(f"{c:>26}" for c in cells))
+
+    print(f"\n{len(tracks)} tracks")
+    base = totals["mp3 320"][0] or 1e-9
+    for mode, (cpu, wall, mb) in totals.items():
+        print(f"  {mode:<9} cpu {cpu:8.2f}s ({cpu / len(tracks):.2f}s/track, {cpu / base:6.1%} of mp3 320)  "
+              f"wall {wall:7.2f}s  {mb:7.1f}MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Chunked encode benchmark — one libx264 process vs parallel keyframe chunks.
+
+For each clip in a corpus directory, re-encodes at the same bitrate and
+height twice, with the same flags ensure_video_fits_telegram uses:
+
+  single    one process, --threads threads
+  chunked   the utils/chunked_encode.py pipeline — segment copy at the
+            keyframes nearest duration × i/N, N processes side by side with
+            --threads / N threads each (same total CPU), audio alongside,
+            concat copy; every chunk gets the same bitrate (no per-chunk plan)
+
+and prints wall time, speed-up, output size and SSIM against the source
+for each. Run it with --chunks at the target machine's
+ffmpeg_pool.encode_slots() to size CHUNKED_ENCODE_MIN_DURATION.
+Needs only ffmpeg/ffprobe on PATH — no bot dependencies.
+
+Usage:
+    python benchmarks/chunked_encode.py ~/long_videos --chunks 4 --threads 8
+    python benchmarks/chunked_encode.py ~/long_videos --kbps 900 --height 720
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+VIDEO_EXTS = (".mp4", ".mkv", ".webm", ".mov")
+
+
+def probe_duration(path: Path) -> float:
+    out = subprocess.run(
+        ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", str(path)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return float(json.loads(out)["format"].get("duration") or 0)
+
+
+def keyframe_times(path: Path) -> List[float]:
+    out = subprocess.run(
+        ["ffprobe", "-v", "quiet", "-select_streams", "v:0", "-skip_frame", "nokey",
+         "-show_entries", "frame=pts_time", "-of", "csv=p=0", str(path)],
+        capture_output=True, text=True,
+    ).stdout
+    return [float(t) for t in out.split() if t.strip() not in ("", "N/A")]
+
+
+def video_args(kbps: int, height: int, preset: str, threads: int) -> List[str]:
+    return [
+        "-c:v", "libx264", "-preset", preset,
+        "-vf", f"scale=-2:{height}",
+        "-b:v", f"{kbps}k", "-maxrate", f"{kbps}k", "-bufsize", f"{kbps * 2}k",
+        "-pix_fmt", "yuv420p", "-threads", str(threads),
+    ]
+
+
+def run(args: List[str]) -> None:
+    subprocess.run(["ffmpeg", "-y", "-v", "error", *args], check=True)
+
+
+def encode_single(src: Path, dst: Path, kbps: int, height: int, preset: str, threads: int) -> float:
+    started = time.monotonic()
+    run(["-i", str(src), *video_args(kbps, height, preset, threads),
+         "-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart", str(dst)])
+    return time.monotonic() - started
+
+
+def encode_chunked(
+    src: Path, dst: Path, kbps: int, height: int, preset: str, threads: int, chunks: int, work: Path,
+) -> float:
+    started = time.monotonic()
+    duration = probe_duration(src)
+    keys = [t for t in keyframe_times(src) if 0 < t < duration]
+    cuts: List[float] = []
+    for i in range(1, chunks):
+        if keys:
+            best = min(keys, key=lambda t: abs(t - duration * i / chunks))
+            if not cuts or best > cuts[-1]:
+                cuts.append(best)
+    run(["-i", str(src), "-map", "0:v:0", "-c", "copy", "-f", "segment",
+         "-segment_times", ",".join(f"{max(t - 0.001, 0):.3f}" for t in cuts),
+         "-reset_timestamps", "1", "-segment_format", "matroska", str(work / "src_%03d.mkv")])
+    sources = sorted(work.glob("src_*.mkv"))
+    encoded = [work / f"enc_{i:03d}.mp4" for i in range(len(sources))]
+    audio = work / "audio.m4a"
+    per_chunk = max(1, threads // len(sources))
+
+    jobs = [["-i", str(s), "-an", *video_args(kbps, height, preset, per_chunk), str(e)]
+            for s, e in zip(sources, encoded)]
+    jobs.append(["-i", str(src), "-vn", "-c:a", "aac", "-b:a", "128k", str(audio)])
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        list(pool.map(run, jobs))
+
+    concat = work / "concat.txt"
+    concat.write_text("".join(f"file '{e.name}'\n" for e in encoded))
+    run(["-f", "concat", "-safe", "0", "-i", str(concat), "-i", str(audio),
+         "-map", "0:v:0", "-map", "1:a:0", "-c", "copy", "-movflags", "+faststart", str(dst)])
+    return time.monotonic() - started
+
+
+def ssim(src: Path, dst: Path, height: int) -> Optional[float]:
+    err = subprocess.run(
+        ["ffmpeg", "-v", "info", "-i", str(src), "-i", str(dst),
+         "-filter_complex", f"[0:v]scale=-2:{height}[r];[1:v][r]ssim", "-f", "null", "-"],
+        capture_output=True, text=True,
+    ).stderr
+    match = re.search(r"SSIM .*All:([\d.]+)", err)
+    return float(match.group(1)) if match else None
+
+
+def _fmt(value: Optional[float], spec: str) -> str:
+    return format(value, spec) if value is not None else "—"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("corpus", type=Path, help="directory of long source videos")
+    parser.add_argument("--chunks", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="total threads for either path")
+    parser.add_argument("--kbps", type=int, default=900)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--preset", default="veryfast")
+    opts = parser.parse_args()
+
+    clips = sorted(p for p in opts.corpus.iterdir() if p.suffix.lower() in VIDEO_EXTS)
+    if not clips:
+        print(f"No clips in {opts.corpus}", file=sys.stderr)
+        return 1
+
+    print(f"{opts.chunks} chunks, {opts.threads} threads, {opts.preset} @ {opts.height}p {opts.kbps}kbps\n")
+    print(f"{'clip':<32} {'dur':>6} {'single':>8} {'chunked':>8} {'speedup':>7} "
+          f"{'MB 1/N':>11} {'ssim 1/N':>15}")
+    for clip in clips:
+        with tempfile.TemporaryDirectory(prefix="chunkbench_") as tmp:
+            work = Path(tmp)
+            single_out, chunked_out = work / "single.mp4", work / "chunked.mp4"
+            chunk_dir = work / "chunks"
+            chunk_dir.mkdir()
+            t1 = encode_single(clip, single_out, opts.kbps, opts.height, opts.preset, opts.threads)
+            tn = encode_chunked(clip, chunked_out, opts.kbps, opts.height, opts.preset,
+                                opts.threads, opts.chunks, chunk_dir)
+            mb1 = single_out.stat().st_size / 1024 / 1024
+            mbn = chunked_out.stat().st_size / 1024 / 1024
+            print(
+                f"{clip.name[:32]:<32} {probe_duration(clip):6.0f} {t1:7.1f}s {tn:7.1f}s {t1 / tn:6.2f}x "
+                f"{mb1:5.1f}/{mbn:<5.1f} "
+                f"{_fmt(ssim(clip, single_out, opts.height), '.4f')}/{_fmt(ssim(clip, chunked_out, opts.height), '.4f')}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
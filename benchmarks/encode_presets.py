@@ -0,0 +1,131 @@
+"""
+Encode preset benchmark — the quality/speed curve behind utils/encode_policy.py.
+
+Encodes every clip in a corpus directory with each preset on the policy's
+ladder at a fixed bitrate and height (the same flags adaptive_encode uses),
+then scores each output against the source with ffmpeg's SSIM and PSNR
+filters. Prints per-preset averages:
+
+  speed     media seconds encoded per wall second (× realtime)
+  ratio     speed relative to veryfast — compare with PRESET_SPEED
+  ssim/psnr quality vs the source, scaled to the same height
+  size      output MB
+
+Needs only ffmpeg/ffprobe on PATH — no bot dependencies.
+
+Usage:
+    python benchmarks/encode_presets.py ~/corpus --height 720 --kbps 1500
+    python benchmarks/encode_presets.py ~/corpus --threads 4 --presets veryfast ultrafast
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PRESETS = ("faster", "veryfast", "superfast", "ultrafast")
+VIDEO_EXTS = (".mp4", ".mkv", ".webm", ".mov")
+
+
+def probe_duration(path: Path) -> float:
+    out = subprocess.run(
+        ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", str(path)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return float(json.loads(out)["format"].get("duration") or 0)
+
+
+def encode(src: Path, dst: Path, preset: str, height: int, kbps: int, threads: int) -> float:
+    """Wall seconds for one adaptive_encode-style encode"""
+    args = [
+        "ffmpeg", "-y", "-v", "error", "-i", str(src),
+        "-vcodec", "libx264", "-preset", preset,
+        "-b:v", f"{kbps}k", "-maxrate", f"{int(kbps * 1.2)}k", "-bufsize", f"{kbps * 2}k",
+        "-vf", f"scale=-2:{height}:flags=lanczos",
+        "-acodec", "aac", "-b:a", "128k",
+        "-pix_fmt", "yuv420p", "-threads", str(threads),
+        str(dst),
+    ]
+    started = time.monotonic()
+    subprocess.run(args, check=True)
+    return time.monotonic() - started
+
+
+def score(src: Path, dst: Path, height: int) -> Dict[str, Optional[float]]:
+    """SSIM (All) and average PSNR of dst against src scaled to the same height"""
+    graph = (
+        f"[0:v]scale=-2:{height}:flags=lanczos,split[r1][r2];"
+        f"[1:v]split[d1][d2];"
+        f"[d1][r1]ssim;[d2][r2]psnr"
+    )
+    err = subprocess.run(
+        ["ffmpeg", "-v", "info", "-i", str(src), "-i", str(dst),
+         "-filter_complex", graph, "-f", "null", "-"],
+        capture_output=True, text=True,
+    ).stderr
+    ssim = re.search(r"SSIM .*All:([\d.]+)", err)
+    psnr = re.search(r"PSNR .*average:([\d.]+|inf)", err)
+    return {
+        "ssim": float(ssim.group(1)) if ssim else None,
+        "psnr": float(psnr.group(1)) if psnr and psnr.group(1) != "inf" else None,
+    }
+
+
+def _mean(values: List[Optional[float]]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def _fmt(value: Optional[float], spec: str) -> str:
+    return format(value, spec) if value is not None else "—"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("corpus", type=Path, help="directory of source clips")
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--kbps", type=int, default=1500)
+    parser.add_argument("--threads", type=int, default=2, help="per encode, like FFMPEG_ENCODE_THREADS")
+    parser.add_argument("--presets", nargs="+", default=list(PRESETS))
+    opts = parser.parse_args()
+
+    clips = sorted(p for p in opts.corpus.iterdir() if p.suffix.lower() in VIDEO_EXTS)
+    if not clips:
+        print(f"No clips in {opts.corpus}", file=sys.stderr)
+        return 1
+
+    rows: Dict[str, Dict[str, list]] = {p: {"speed": [], "ssim": [], "psnr": [], "mb": []} for p in opts.presets}
+    with tempfile.TemporaryDirectory(prefix="encbench_") as tmp:
+        for clip in clips:
+            duration = probe_duration(clip)
+            for preset in opts.presets:
+                out = Path(tmp) / f"{clip.stem}_{preset}.mp4"
+                wall = encode(clip, out, preset, opts.height, opts.kbps, opts.threads)
+                quality = score(clip, out, opts.height)
+                rows[preset]["speed"].append(duration / wall if wall else None)
+                rows[preset]["ssim"].append(quality["ssim"])
+                rows[preset]["psnr"].append(quality["psnr"])
+                rows[preset]["mb"].append(out.stat().st_size / 1024 / 1024)
+                print(f"  {clip.name:<40} {preset:<10} {duration / wall:6.2f}x  ssim {_fmt(quality['ssim'], '.4f')}")
+                out.unlink()
+
+    base = _mean(rows.get("veryfast", {}).get("speed", []))
+    print(f"\n{len(clips)} clips @ {opts.height}p {opts.kbps}kbps, {opts.threads} threads\n")
+    print(f"{'preset':<10} {'speed':>8} {'ratio':>6} {'ssim':>7} {'psnr':>7} {'size':>8}")
+    for preset in opts.presets:
+        speed = _mean(rows[preset]["speed"])
+        ratio = speed / base if speed and base else None
+        print(
+            f"{preset:<10} {_fmt(speed, '7.2f')}x {_fmt(ratio, '6.2f')} "
+            f"{_fmt(_mean(rows[preset]['ssim']), '7.4f')} {_fmt(_mean(rows[preset]['psnr']), '7.2f')} "
+            f"{_fmt(_mean(rows[preset]['mb']), '6.1f')}MB"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Range download benchmark — one connection vs parallel HTTP ranges.
+
+Starts a local aiohttp server that serves a generated file with Range
+support and a bandwidth cap per connection (CDN-style throttling). It
+then downloads the file with utils/range_download.py at each connection
+count, and prints wall time, MB/s and speed-up over a single
+connection. Every download is checked byte-for-byte.
+
+utils/range_download.py is loaded straight from its file, with a minimal
+config and logger in place of core.config / utils.logger. Importing the
+bot packages would start aiogram and Redis. Needs aiohttp and yt-dlp
+(requirements.txt).
+
+Usage:
+    python benchmarks/range_download.py --mb 64 --kbps 2000 --connections 1 2 4 8
+    python benchmarks/range_download.py --mb 200 --kbps 5000 --piece-mb 8
+"""
+import argparse
+import asyncio
+import hashlib
+import importlib.util
+import logging
+import os
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+
+from aiohttp import web
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_engine(piece_mb: int, retries: int):
+    config = types.SimpleNamespace(
+        RANGE_CONNECTIONS=4, RANGE_PIECE_MB=piece_mb, RANGE_RETRIES=retries, RANGE_DOWNLOAD=True,
+    )
+    core = types.ModuleType("core")
+    core_config = types.ModuleType("core.config")
+    core_config.config = config
+    utils = types.ModuleType("utils")
+    utils_logger = types.ModuleType("utils.logger")
+    utils_logger.logger = logging.getLogger("range_bench")
+    sys.modules.update({"core": core, "core.config": core_config, "utils": utils, "utils.logger": utils_logger})
+
+    spec = importlib.util.spec_from_file_location("range_download", ROOT / "utils" / "range_download.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_app(payload: bytes, kbps: int) -> web.Application:
+    """Serve /file with Range support, each response paced to `kbps` KB/s"""
+    chunk = 64 * 1024
+    delay = chunk / (kbps * 1024)
+
+    async def handler(request: web.Request) -> web.StreamResponse:
+        start, end, status = 0, len(payload) - 1, 200
+        header = request.headers.get("Range", "")
+        if header.startswith("bytes="):
+            first, _, last = header[6:].partition("-")
+            start = int(first or 0)
+            end = min(int(last), len(payload) - 1) if last else len(payload) - 1
+            status = 206
+        resp = web.StreamResponse(status=status, headers={
+            "Accept-Ranges": "bytes",
+            "Content-Length": str(end - start + 1),
+            **({"Content-Range": f"bytes {start}-{end}/{len(payload)}"} if status == 206 else {}),
+        })
+        await resp.prepare(request)
+        for offset in range(start, end + 1, chunk):
+            await resp.write(payload[offset:min(offset + chunk, end + 1)])
+            await asyncio.sleep(delay)
+        await resp.write_eof()
+        return resp
+
+    app = web.Application()
+    app.router.add_get("/file", handler)
+    return app
+
+
+async def run(opts) -> int:
+    engine = load_engine(opts.piece_mb, opts.retries)
+    payload = os.urandom(opts.mb * 1024 * 1024)
+    digest = hashlib.sha256(payload).hexdigest()
+
+    runner = web.AppRunner(make_app(payload, opts.kbps))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/file"
+
+    print(f"{opts.mb}MB file, {opts.kbps}KB/s per connection, {opts.piece_mb}MB pieces\n")
+    print(f"{'connections':>11} {'seconds':>8} {'MB/s':>7} {'speedup':>8}")
+    baseline = None
+    try:
+        with tempfile.TemporaryDirectory(prefix="rangebench_") as tmp:
+            for n in opts.connections:
+                dest = Path(tmp) / f"out_{n}.bin"
+                started = time.monotonic()
+                ok = await engine.range_download(url, dest, connections=n)
+                elapsed = time.monotonic() - started
+                if not ok or hashlib.sha256(dest.read_bytes()).hexdigest() != digest:
+                    print(f"{n:>11} FAILED (download error or content mismatch)")
+                    continue
+                baseline = baseline or elapsed
+                print(f"{n:>11} {elapsed:8.2f} {opts.mb / elapsed:7.2f} {baseline / elapsed:7.2f}x")
+                dest.unlink()
+    finally:
+        await runner.cleanup()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mb", type=int, default=64, help="file size")
+    parser.add_argument("--kbps", type=int, default=2000, help="per-connection cap, KB/s")
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--piece-mb", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=2)
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -28,6 +28,8 @@ from core.bot import bot, dp
 from core.config import config
 from utils.logger import logger
 from utils.redis_client import redis_client
+from utils.layers import layer_stats
+from utils.cookie_pool import cookie_pool
 from utils.archive import init_archive_manager
 from downloaders.router import register_download_handlers
 
@@ -171,7 +173,7 @@ async def main():
     yt_cookie_path = Path(config.YT_COOKIES_FOLDER)
     logger.info(f"✓ YT cookies path: {yt_cookie_path}")
     if yt_cookie_path.exists():
-        yt_cookies = len(list(yt_cookie_path.glob("*.txt")))
+        yt_cookies = len(cookie_pool.files(config.YT_COOKIES_FOLDER))  # primes the index
         logger.info(f"✓ YT cookies: {yt_cookies} files found")
     else:
         logger.warning(f"⚠ YT cookies folder not found: {yt_cookie_path}")
@@ -179,11 +181,14 @@ async def main():
     yt_music_cookie_path = Path(config.YT_MUSIC_COOKIES_FOLDER)
     logger.info(f"✓ YT Music cookies path: {yt_music_cookie_path}")
     if yt_music_cookie_path.exists():
-        music_cookies = len(list(yt_music_cookie_path.glob("*.txt")))
+        music_cookies = len(cookie_pool.files(config.YT_MUSIC_COOKIES_FOLDER))  # primes the index
         logger.info(f"✓ YT Music cookies: {music_cookies} files found")
     else:
         logger.warning(f"⚠ YT Music cookies folder not found: {yt_music_cookie_path}")
     
+    # Restore learned extraction-layer order (survives deploys)
+    await layer_stats.load()
+
     # Register handlers
     register_download_handlers()
     logger.info("✓ All handlers registered")
@@ -266,6 +271,9 @@ async def main():
     except asyncio.CancelledError:
         pass
     
+    # Persist learned layer order
+    await layer_stats.save()
+
     # Stop health server
     try:
         await health_runner.cleanup()
@@ -73,10 +73,43 @@ class Config:
         self.MAX_CONCURRENT_MUSIC = 7
         self.MAX_CONCURRENT_SPOTIFY = 6    # Limit concurrent playlist downloads
         self.MAX_CONCURRENT_PER_USER = 6   # Max simultaneous jobs per user
+        self.PLAYLIST_PREFETCH = 3         # Playlist tracks downloaded ahead of the one uploading
+        self.ADMISSION_MAX_DEFER = 120     # Seconds light jobs may overtake a heavy one
+        self.ADMISSION_UNIT_SECONDS = 20.0 # Initial hold time per cost unit (learned at runtime)
+        self.ADMISSION_PEEK_TIMEOUT = 15   # Max seconds spent extracting info to cost a job
         
         # Timeout settings (seconds)
         self.DOWNLOAD_TIMEOUT = 600        # 10 minutes max per download (large playlists)
         self.FFMPEG_TIMEOUT = 180          # 3 minutes max for FFmpeg
+
+        # FFmpeg CPU pool — threads handed out per process (utils/ffmpeg_pool.py)
+        self.FFMPEG_CPU_BUDGET = int(os.getenv("FFMPEG_CPU_BUDGET", str(os.cpu_count() or 4)))
+        self.FFMPEG_ENCODE_THREADS = max(2, self.FFMPEG_CPU_BUDGET // 2)  # Per libx264 process
+        self.FFMPEG_STREAM_THREADS = min(2, self.FFMPEG_ENCODE_THREADS)  # Per libx264 process reading URLs
+        self.FFMPEG_STATS_WINDOW = 600     # Seconds of history for throughput stats
+
+        # Encode policy — x264 preset / scale per job from load (utils/encode_policy.py)
+        self.ENCODE_LATENCY_SLO = int(self.FFMPEG_TIMEOUT * 0.8)  # Target seconds, request → file; under the kill timeout
+        self.ENCODE_BASE_SPEED = 4.0       # Placeholder veryfast @ 720p speed until the first recorded encode
+        self.ENCODE_MIN_HEIGHT = 480       # Never downscale below this under load
+
+        # Chunked encode — long videos as parallel keyframe chunks (utils/chunked_encode.py)
+        self.CHUNKED_ENCODE_MIN_DURATION = 600   # Seconds; shorter videos use one process
+        self.CHUNKED_ENCODE_MAX_CHUNKS = 8       # Upper bound on parallel chunks
+
+        # Stream pipeline — ffmpeg reads short videos from the media URL (utils/stream_pipeline.py)
+        self.STREAM_PIPELINE = os.getenv("STREAM_PIPELINE", "1") == "1"
+        self.STREAM_PIPELINE_MAX_DURATION = 180  # Seconds; longer videos use the file path
+
+        # Native audio — send YouTube's AAC as tagged M4A, MP3 transcode only as fallback
+        self.AUDIO_NATIVE = os.getenv("AUDIO_NATIVE", "1") == "1"
+
+        # Download engine — parallel fragments in yt-dlp, HTTP ranges for direct URLs (utils/range_download.py)
+        self.DOWNLOAD_FRAGMENTS = int(os.getenv("DOWNLOAD_FRAGMENTS", "4"))  # yt-dlp concurrent_fragment_downloads
+        self.RANGE_DOWNLOAD = os.getenv("RANGE_DOWNLOAD", "1") == "1"
+        self.RANGE_CONNECTIONS = 4         # Parallel connections per direct download (per-job budget)
+        self.RANGE_PIECE_MB = 4            # Range request size
+        self.RANGE_RETRIES = 2             # Retries per failed piece
         self.SEND_TIMEOUT = 60             # 1 minute max for Telegram send
         
         # Premium emoji support
@@ -104,6 +137,43 @@ class Config:
         # Session memory duration (24 hours)
         self.SESSION_MEMORY_HOURS = 24
         
+        # file_id cache — in-process L1 in front of Redis
+        self.URL_CACHE_LOCAL_SIZE = 4096   # Max entries held in memory
+        self.URL_CACHE_LOCAL_TTL = 900     # 15 minutes — bounds staleness vs Redis
+
+        # Negative cache — media that failed every extraction layer
+        self.NEG_CACHE_TTL_PERMANENT = 900 # Private / removed / geo-blocked
+        self.NEG_CACHE_TTL_TRANSIENT = 60  # Proxy / network / rate limit
+
+        # yt-dlp info dict cache — extract once, download many formats
+        self.INFO_CACHE_SIZE = 256         # Info dicts are large (~0.5 MB each)
+        self.INFO_CACHE_TTL = 300          # 5 minutes — signed stream URLs expire
+
+        # Hedged extraction layers — start the next layer early when one is slow
+        self.HEDGE_ENABLED = True
+        self.HEDGE_DELAY_DEFAULT = 8.0     # Seconds before hedging, until stats exist
+        self.HEDGE_DELAY_MIN = 2.0         # Never hedge sooner than this
+        self.HEDGE_DELAY_MAX = 20.0        # Never wait longer than this
+        self.HEDGE_MIN_SAMPLES = 5         # Successes needed before trusting p90
+
+        # Adaptive layer order — rolling per-layer success rate + latency
+        self.LAYER_SCORE_HALFLIFE = 120    # Seconds — old outcomes fade, upstream changes win fast
+        self.LAYER_LATENCY_SCALE = 30.0    # Seconds of latency that halve a layer's score
+        self.LAYER_PERSIST_INTERVAL = 60   # Min seconds between Redis saves
+
+        # Proxy pool — health scoring and quarantine
+        self.PROXY_COOLDOWN_RATE_LIMIT = 300  # 429 — back off 5 minutes
+        self.PROXY_COOLDOWN_BLOCKED = 900     # 403 / bot check — 15 minutes
+        self.PROXY_QUARANTINE_FAILS = 3       # Consecutive proxy/network errors
+        self.PROXY_QUARANTINE_TTL = 120       # First quarantine; doubles per repeat (max 8×)
+
+        # Cookie pool — rotation, health and per-account rate cap
+        self.COOKIE_RATE_LIMIT = 10            # Max requests per cookie per window
+        self.COOKIE_RATE_WINDOW = 60           # Seconds
+        self.COOKIE_COOLDOWN_BLOCKED = 1800    # Sign-in / 403 — first flag; doubles per repeat (max 8×)
+        self.COOKIE_COOLDOWN_RATE_LIMIT = 300  # 429 on a cookie
+        self.COOKIE_RESCAN_INTERVAL = 30       # Min seconds between folder checks
+
         # Video quality settings
         self.VIDEO_QUALITY_PRESET = "premium"
         self.AUDIO_BITRATE = "320k"
@@ -111,10 +181,6 @@ class Config:
         # Health endpoint
         self.HEALTH_PORT = int(os.getenv("PORT", "8080"))
         
-    def pick_proxy(self) -> Optional[str]:
-        """Get random proxy from list"""
-        return random.choice(self.PROXIES) if self.PROXIES else None
-    
     def pick_user_agent(self) -> str:
         """Get random user agent"""
         return random.choice(self.USER_AGENTS)
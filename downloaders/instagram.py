@@ -11,23 +11,32 @@ Flow:
 No progress messages for Instagram.
 """
 import asyncio
+import functools
 import tempfile
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Optional, List, Tuple
 
 from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadCancelled
 from aiogram.types import Message, FSInputFile
 
 from core.bot import bot
 from core.config import config
-from workers.task_queue import download_semaphore
-from utils.helpers import get_random_cookie
+from workers.task_queue import download_scheduler
 from utils.logger import logger
 from utils.cache import url_cache
+from utils.negative_cache import negative_cache
+from utils.singleflight import singleflight
+from utils.proxy_pool import proxy_pool
+from utils.layers import run_hedged, ytdlp_cancel_hook
 from utils.media_processor import (
     ensure_fits_telegram, instagram_smart_encode,
     get_video_info,
 )
+from utils.stream_pipeline import stream_to_mp4
+from utils.range_download import ytdlp_download
+from utils.download_result import DownloadResult, results as download_results
 from utils.watchdog import acquire_user_slot, release_user_slot
 from ui.formatting import format_delivered_with_mention, safe_caption, build_safe_media_caption
 from ui.stickers import send_sticker, delete_sticker
@@ -36,15 +45,19 @@ from utils.log_channel import log_download
 
 # ─── Layered extraction ───────────────────────────────────────────────────────
 
+# extract_info(download=False) result + the proxy that resolved its media URLs
+Extracted = Tuple[dict, Optional[str]]
+
 def _base_opts(tmp: Path) -> dict:
     return {
         "quiet": True,
         "no_warnings": True,
         "outtmpl": str(tmp / "%(title)s.%(ext)s"),
-        "proxy": config.pick_proxy(),
+        "proxy": proxy_pool.pick(),
         "http_headers": {"User-Agent": config.pick_user_agent()},
         "socket_timeout": 30,
         "retries": 2,
+        "concurrent_fragment_downloads": config.DOWNLOAD_FRAGMENTS,
         "format": "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
     }
 
@@ -70,27 +83,103 @@ def _layer3_opts(tmp: Path) -> dict:
         opts["cookiefile"] = ig_cookie
     return opts
 
-async def _try_download(url: str, opts: dict) -> Optional[Path]:
-    tmp = Path(opts["outtmpl"]).parent
+async def _try_download(
+    url: str,
+    opts: dict,
+    errors: Optional[List[str]] = None,
+    cancel: Optional[threading.Event] = None,
+    info: Optional[dict] = None,
+) -> Optional[DownloadResult]:
     try:
-        with YoutubeDL(opts) as ydl:
-            await asyncio.to_thread(lambda: ydl.download([url]))
-        files = (
-            list(tmp.glob("*.mp4")) + list(tmp.glob("*.webm")) +
-            list(tmp.glob("*.mov")) + list(tmp.glob("*.mkv"))
-        )
-        return files[0] if files else None
+        # Progressive MP4 → parallel range download, else yt-dlp
+        info = await ytdlp_download(url, opts, cancel, info)
+        proxy_pool.report_ok(opts.get("proxy"))
+        # Exact files from the info dict, probe cache primed with their metadata
+        return next((f for f in download_results(info) if f.is_video), None)
+    except DownloadCancelled:
+        return None
     except Exception as e:
+        proxy_pool.report_error(opts.get("proxy"), str(e))
         logger.debug(f"IG layer failed: {type(e).__name__}: {str(e)[:80]}")
+        if errors is not None:
+            errors.append(str(e))
+        return None
+
+async def _attempt(
+    url: str,
+    errors: List[str],
+    layer_fn,
+    sub: Path,
+    extracted: Optional[Extracted],
+    cancel: threading.Event,
+) -> Optional[DownloadResult]:
+    opts = layer_fn(sub)
+    opts["progress_hooks"] = [ytdlp_cancel_hook(cancel)]
+    if extracted:
+        # Signed media URLs are bound to the proxy that resolved them
+        info, opts["proxy"] = extracted
+        return await _try_download(url, opts, errors, cancel, info)
+    return await _try_download(url, opts, errors, cancel)
+
+async def download_instagram(
+    url: str,
+    tmp: Path,
+    extracted: Optional[Extracted] = None,
+    errors: Optional[List[str]] = None,
+) -> Optional[Path]:
+    """
+    Hedged 3-layer Instagram download — each layer in its own subdir.
+    Layer 1 downloads from `extracted` (extract_instagram's result) when
+    given, and is skipped when extract_instagram already failed (its error
+    is in `errors`). Records a negative-cache entry if all layers fail.
+    """
+    errors = errors if errors is not None else []
+    layer1_failed = bool(errors) and not extracted
+    attempts = []
+    for i, layer_fn in enumerate([_layer1_opts, _layer2_opts, _layer3_opts], 1):
+        if i == 1 and layer1_failed:
+            continue
+        sub = tmp / f"layer{i}"
+        sub.mkdir(parents=True, exist_ok=True)
+        reuse = extracted if i == 1 else None
+        attempts.append((f"layer{i}", functools.partial(_attempt, url, errors, layer_fn, sub, reuse)))
+    result = await run_hedged("instagram", attempts)
+    if result:
+        return result.path
+    negative_cache.record(url, errors)
+    return None
+
+async def extract_instagram(url: str, tmp: Path, errors: List[str]) -> Optional[Extracted]:
+    """
+    Layer 1 extraction, once per link: (info, proxy) for stream_instagram
+    and then download_instagram, so carousels and failed streams don't
+    extract again. None on failure, with the error appended to `errors`.
+    """
+    opts = _layer1_opts(tmp)
+    try:
+        with YoutubeDL(opts) as ydl:
+            info = await asyncio.to_thread(ydl.extract_info, url, download=False)
+    except Exception as e:
+        proxy_pool.report_error(opts.get("proxy"), str(e))
+        logger.debug(f"IG layer1: extraction failed: {str(e)[:80]}")
+        errors.append(str(e))
         return None
+    return (info, opts.get("proxy")) if info else None
 
-async def download_instagram(url: str, tmp: Path) -> Optional[Path]:
-    """3-layer Instagram download"""
-    for layer_fn in [_layer1_opts, _layer2_opts, _layer3_opts]:
-        opts = layer_fn(tmp)
-        result = await _try_download(url, opts)
-        if result:
-            return result
+async def stream_instagram(extracted: Optional[Extracted], tmp: Path) -> Optional[Path]:
+    """
+    Stream pipeline for reels: ffmpeg encodes from the extracted media URL
+    while it downloads. None → use download_instagram.
+    """
+    if not config.STREAM_PIPELINE or not extracted:
+        return None
+    info, proxy = extracted
+    if info.get("entries") or (info.get("duration") or 0) > config.STREAM_PIPELINE_MAX_DURATION:
+        return None
+    output = tmp / "ig_stream.mp4"
+    if await stream_to_mp4(info, output, proxy, keep_fps=True):
+        proxy_pool.report_ok(proxy)
+        return output
     return None
 
 # ─── Safe reply helper ────────────────────────────────────────────────────────
@@ -172,6 +261,65 @@ async def _safe_reply_text(m: Message, text: str, **kwargs) -> Optional[Message]
         logger.error(f"IG reply failed: {e}")
         return None
 
+async def _send_cached(m: Message, url: str, caption: str) -> bool:
+    """Send cached file_id if present. Drops stale entries. True if delivered."""
+    cached = await url_cache.get(url, "video")
+    if not cached:
+        return False
+    try:
+        sent = await _safe_reply_video(
+            m,
+            video=cached,
+            caption=caption,
+            parse_mode="HTML",
+            supports_streaming=True,
+        )
+        if sent:
+            return True
+    except Exception:
+        pass
+    # Stale file_id — drop it from both tiers and fall through
+    await url_cache.invalidate(url, "video")
+    return False
+
+async def _send_flight(m: Message, flight, caption: str) -> bool:
+    """Follower: deliver the leader's file_id(s), or its failure. True if handled."""
+    if flight.failure:
+        logger.info(f"INSTAGRAM: Coalesced leader failed ({flight.failure}), failing fast")
+        _err = await get_emoji_async("ERROR")
+        await _safe_reply_text(
+            m,
+            f"{_err} Unable to process this link.\n\nPlease try again.",
+            parse_mode="HTML",
+        )
+        return True
+    delivered = False
+    for i, file_id in enumerate(flight.file_ids):
+        cap = caption if i == len(flight.file_ids) - 1 else f"Part {i+1}/{len(flight.file_ids)}"
+        sent = await _safe_reply_video(
+            m,
+            video=file_id,
+            caption=cap,
+            parse_mode="HTML",
+            supports_streaming=True,
+        )
+        delivered = delivered or bool(sent)
+    return delivered
+
+async def _fail_fast(m: Message, url: str) -> bool:
+    """Known-bad link — reply error without taking a download slot. True if handled."""
+    failure = negative_cache.get(url)
+    if not failure:
+        return False
+    logger.info(f"INSTAGRAM: Negative cache hit ({failure}) for {url}")
+    _err = await get_emoji_async("ERROR")
+    await _safe_reply_text(
+        m,
+        f"{_err} Unable to process this link.\n\nPlease try again.",
+        parse_mode="HTML",
+    )
+    return True
+
 # ─── Main handler ─────────────────────────────────────────────────────────────
 
 async def handle_instagram(m: Message, url: str):
@@ -196,25 +344,26 @@ async def handle_instagram(m: Message, url: str):
     _t_start = _time_mod.monotonic()
 
     sticker_msg_id = None
+    flight = None
 
     try:
         # Cache check
-        cached = await url_cache.get(url, "video")
-        if cached:
-            try:
-                sent = await _safe_reply_video(
-                    m,
-                    video=cached,
-                    caption=delivered_caption,
-                    parse_mode="HTML",
-                    supports_streaming=True,
-                )
-                if sent:
-                    return
-            except Exception:
-                pass  # Stale cache — fall through
-
-        async with download_semaphore:
+        if await _send_cached(m, url, delivered_caption):
+            return
+        if await _fail_fast(m, url):
+            return
+
+        # Same reel already downloading for someone else — wait, then reuse its outcome
+        flight = await singleflight.join(url, "video")
+        if not flight.leader:
+            if await _send_flight(m, flight, delivered_caption):
+                return
+            if await _send_cached(m, url, delivered_caption):
+                return
+            if await _fail_fast(m, url):
+                return
+
+        async with download_scheduler.slot(m.from_user.id):
             logger.info(f"INSTAGRAM: {url}")
 
             # Send sticker — no progress text message
@@ -224,9 +373,15 @@ async def handle_instagram(m: Message, url: str):
                 with tempfile.TemporaryDirectory() as tmp_dir:
                     tmp = Path(tmp_dir)
 
-                    video_file = await download_instagram(url, tmp)
+                    # Encode while downloading when the reel's media URL is directly
+                    # readable — the extraction is reused by the download path
+                    errors: List[str] = []
+                    extracted = await extract_instagram(url, tmp, errors) if config.STREAM_PIPELINE else None
+                    streamed = await stream_instagram(extracted, tmp)
+                    video_file = streamed or await download_instagram(url, tmp, extracted, errors)
 
                     if not video_file or not video_file.exists():
+                        flight.fail(negative_cache.get(url))
                         await delete_sticker(bot, m.chat.id, sticker_msg_id)
                         sticker_msg_id = None
                         _err = await get_emoji_async("ERROR")
@@ -237,10 +392,13 @@ async def handle_instagram(m: Message, url: str):
                         )
                         return
 
-                    # Smart encode
-                    encoded = tmp / "ig_enc.mp4"
-                    ok = await instagram_smart_encode(video_file, encoded)
-                    final = encoded if ok and encoded.exists() else video_file
+                    # Smart encode (the stream pipeline already did)
+                    if streamed:
+                        final = streamed
+                    else:
+                        encoded = tmp / "ig_enc.mp4"
+                        ok = await instagram_smart_encode(video_file, encoded)
+                        final = encoded if ok and encoded.exists() else video_file
 
                     # File size check
                     file_size_mb = final.stat().st_size / (1024 * 1024)
@@ -253,6 +411,7 @@ async def handle_instagram(m: Message, url: str):
                     await delete_sticker(bot, m.chat.id, sticker_msg_id)
                     sticker_msg_id = None
 
+                    file_ids = []
                     for i, part in enumerate(parts):
                         if not part.exists():
                             logger.warning(f"IG: Part {i} does not exist, skipping")
@@ -269,9 +428,14 @@ async def handle_instagram(m: Message, url: str):
                             height=info.get("height") or None,
                             duration=int(info.get("duration") or 0) or None,
                         )
+                        if sent and sent.video:
+                            file_ids.append(sent.video.file_id)
                         # Cache single-part result
                         if sent and sent.video and len(parts) == 1:
                             await url_cache.set(url, "video", sent.video.file_id)
+                    # Coalesced followers re-send every part
+                    if len(file_ids) == len(parts):
+                        flight.succeed(*file_ids)
 
                     logger.info(f"INSTAGRAM: Sent {len(parts)} file(s) to {user_id}")
 
@@ -299,6 +463,8 @@ async def handle_instagram(m: Message, url: str):
                 )
 
     finally:
+        if flight:
+            flight.release()
         await release_user_slot(m.from_user.id)
         if sticker_msg_id:
             await delete_sticker(bot, m.chat.id, sticker_msg_id)
@@ -20,20 +20,29 @@ Pinterest URL support:
 No progress messages for Pinterest.
 """
 import asyncio
+import functools
 import re
 import tempfile
+import threading
+import time
 from pathlib import Path
 from typing import Optional, List
 
 import aiohttp
-from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadCancelled
 from aiogram.types import Message, FSInputFile
 
 from core.bot import bot
 from core.config import config
-from workers.task_queue import download_semaphore
+from workers.task_queue import download_scheduler
 from utils.logger import logger
 from utils.cache import url_cache
+from utils.negative_cache import negative_cache, YtdlpErrorCollector
+from utils.singleflight import singleflight
+from utils.proxy_pool import proxy_pool
+from utils.layers import run_hedged, ytdlp_cancel_hook
+from utils.range_download import ytdlp_download
+from utils.download_result import results as download_results
 from utils.media_processor import (
     ensure_fits_telegram, instagram_smart_encode,
     get_video_info,
@@ -73,20 +82,26 @@ async def _resolve_pin_url(url: str) -> str:
     """
     if "pin.it/" not in url:
         return url
+    proxy = proxy_pool.pick(http_only=True)
     try:
+        started = time.monotonic()
         async with aiohttp.ClientSession() as session:
             async with session.head(
                 url,
                 allow_redirects=True,
                 timeout=aiohttp.ClientTimeout(total=10),
                 headers={"User-Agent": config.pick_user_agent()},
+                proxy=proxy,
             ) as resp:
                 resolved = str(resp.url)
+                proxy_pool.report_ok(proxy, latency=time.monotonic() - started)
                 logger.debug(f"Pinterest resolved: {url} → {resolved}")
                 return resolved
     except Exception as e:
+        proxy_pool.report_error(proxy, f"{type(e).__name__}: {e}")
         logger.debug(f"Pinterest URL resolve failed (HEAD): {e}")
         # Fallback: try GET redirect
+        proxy = proxy_pool.pick(http_only=True)
         try:
             async with aiohttp.ClientSession() as session:
                 async with session.get(
@@ -94,9 +109,12 @@ async def _resolve_pin_url(url: str) -> str:
                     allow_redirects=True,
                     timeout=aiohttp.ClientTimeout(total=10),
                     headers={"User-Agent": config.pick_user_agent()},
+                    proxy=proxy,
                 ) as resp:
+                    proxy_pool.report_ok(proxy)
                     return str(resp.url)
         except Exception as e2:
+            proxy_pool.report_error(proxy, f"{type(e2).__name__}: {e2}")
             logger.debug(f"Pinterest URL resolve failed (GET): {e2}")
             return url
 
@@ -107,17 +125,21 @@ async def _download_pinterest(url: str, tmp: Path) -> List[Path]:
     Download Pinterest video(s) with yt-dlp.
     Supports single videos and carousel pins (multiple media).
     Returns list of downloaded file paths.
+    Records a negative-cache entry if every attempt fails.
     """
+    errors: List[str] = []
     safe_title = _sanitize_filename("pin_%(id)s")
     base_opts = {
         "quiet": True,
         "no_warnings": True,
+        "logger": YtdlpErrorCollector(errors),  # ignoreerrors → yt-dlp reports instead of raising
         "outtmpl": str(tmp / f"{safe_title}.%(ext)s"),
-        "proxy": config.pick_proxy(),
+        "proxy": proxy_pool.pick(),
         "http_headers": {"User-Agent": config.pick_user_agent()},
         "socket_timeout": 30,
         "retries": 3,
         "fragment_retries": 3,
+        "concurrent_fragment_downloads": config.DOWNLOAD_FRAGMENTS,
         "ignoreerrors": True,  # Don't crash on private/unavailable items in carousel
     }
 
@@ -132,18 +154,6 @@ async def _download_pinterest(url: str, tmp: Path) -> List[Path]:
         }],
     }
 
-    try:
-        with YoutubeDL(opts_primary) as ydl:
-            await asyncio.to_thread(lambda: ydl.download([url]))
-        files = (
-            list(tmp.glob("*.mp4")) + list(tmp.glob("*.webm")) +
-            list(tmp.glob("*.mkv")) + list(tmp.glob("*.mov"))
-        )
-        if files:
-            return sorted(files)
-    except Exception as e:
-        logger.debug(f"Pinterest primary download failed: {type(e).__name__}: {str(e)[:100]}")
-
     # Fallback: best single format, no merge
     opts_fallback = {
         **base_opts,
@@ -151,18 +161,43 @@ async def _download_pinterest(url: str, tmp: Path) -> List[Path]:
         "ignoreerrors": True,
     }
 
-    try:
-        with YoutubeDL(opts_fallback) as ydl:
-            await asyncio.to_thread(lambda: ydl.download([url]))
-        files = (
-            list(tmp.glob("*.mp4")) + list(tmp.glob("*.webm")) +
-            list(tmp.glob("*.mkv")) + list(tmp.glob("*.mov"))
-        )
-        if files:
-            return sorted(files)
-    except Exception as e:
-        logger.debug(f"Pinterest fallback download failed: {type(e).__name__}: {str(e)[:100]}")
-
+    async def attempt(name: str, opts: dict, cancel: threading.Event) -> List[Path]:
+        # Own subdir per attempt — hedged attempts run side by side
+        sub = tmp / name
+        sub.mkdir(parents=True, exist_ok=True)
+        opts = {
+            **opts,
+            "outtmpl": str(sub / f"{safe_title}.%(ext)s"),
+            "progress_hooks": [ytdlp_cancel_hook(cancel)],
+        }
+        seen = len(errors)
+        try:
+            # Progressive MP4 → parallel range download, else yt-dlp
+            info = await ytdlp_download(url, opts, cancel)
+            # Exact files in carousel order, probe cache primed with their metadata
+            files = [f.path for f in download_results(info) if f.is_video]
+            # ignoreerrors → failures land in `errors` instead of raising
+            if files:
+                proxy_pool.report_ok(opts["proxy"])
+            elif len(errors) > seen:
+                proxy_pool.report_error(opts["proxy"], errors[-1])
+            return files
+        except DownloadCancelled:
+            return []
+        except Exception as e:
+            proxy_pool.report_error(opts["proxy"], str(e))
+            logger.debug(f"Pinterest {name} download failed: {type(e).__name__}: {str(e)[:100]}")
+            errors.append(str(e))
+            return []
+
+    files = await run_hedged("pinterest", [
+        ("primary", functools.partial(attempt, "primary", opts_primary)),
+        ("fallback", functools.partial(attempt, "fallback", opts_fallback)),
+    ])
+    if files:
+        return files
+
+    negative_cache.record(url, errors)
     return []
 
 # ─── Safe reply helpers ───────────────────────────────────────────────────────
@@ -244,6 +279,64 @@ async def _safe_reply_text(m: Message, text: str, **kwargs) -> Optional[Message]
         logger.error(f"PIN reply failed: {e}")
         return None
 
+async def _send_cached(m: Message, url: str, caption: str) -> bool:
+    """Send cached file_id if present. Drops stale entries. True if delivered."""
+    cached = await url_cache.get(url, "video")
+    if not cached:
+        return False
+    try:
+        sent = await _safe_reply_video(
+            m,
+            video=cached,
+            caption=caption,
+            parse_mode="HTML",
+            supports_streaming=True,
+        )
+        if sent:
+            return True
+    except Exception:
+        pass
+    # Stale file_id — drop it from both tiers and fall through
+    await url_cache.invalidate(url, "video")
+    return False
+
+async def _send_flight(m: Message, flight, caption: str) -> bool:
+    """Follower: deliver the leader's file_id(s), or its failure. True if handled."""
+    if flight.failure:
+        logger.info(f"PINTEREST: Coalesced leader failed ({flight.failure}), failing fast")
+        _err = await get_emoji_async("ERROR")
+        await _safe_reply_text(
+            m,
+            f"{_err} Unable to process this link.\n\nPlease try again.",
+            parse_mode="HTML",
+        )
+        return True
+    delivered = False
+    for i, file_id in enumerate(flight.file_ids):
+        sent = await _safe_reply_video(
+            m,
+            video=file_id,
+            caption=caption if i == len(flight.file_ids) - 1 else "",
+            parse_mode="HTML",
+            supports_streaming=True,
+        )
+        delivered = delivered or bool(sent)
+    return delivered
+
+async def _fail_fast(m: Message, url: str) -> bool:
+    """Known-bad link — reply error without taking a download slot. True if handled."""
+    failure = negative_cache.get(url)
+    if not failure:
+        return False
+    logger.info(f"PINTEREST: Negative cache hit ({failure}) for {url}")
+    _err = await get_emoji_async("ERROR")
+    await _safe_reply_text(
+        m,
+        f"{_err} Unable to process this link.\n\nPlease try again.",
+        parse_mode="HTML",
+    )
+    return True
+
 # ─── Main handler ─────────────────────────────────────────────────────────────
 
 async def handle_pinterest(m: Message, url: str):
@@ -268,6 +361,7 @@ async def handle_pinterest(m: Message, url: str):
     _t_start = _time_mod.monotonic()
 
     sticker_msg_id = None
+    flight = None
 
     try:
         # Validate URL
@@ -286,22 +380,22 @@ async def handle_pinterest(m: Message, url: str):
             logger.info(f"PINTEREST: Resolved to {url}")
 
         # Cache check (single video only)
-        cached = await url_cache.get(url, "video")
-        if cached:
-            try:
-                sent = await _safe_reply_video(
-                    m,
-                    video=cached,
-                    caption=delivered_caption,
-                    parse_mode="HTML",
-                    supports_streaming=True,
-                )
-                if sent:
-                    return
-            except Exception:
-                pass  # Stale cache — fall through
+        if await _send_cached(m, url, delivered_caption):
+            return
+        if await _fail_fast(m, url):
+            return
 
-        async with download_semaphore:
+        # Same pin already downloading for someone else — wait, then reuse its outcome
+        flight = await singleflight.join(url, "video")
+        if not flight.leader:
+            if await _send_flight(m, flight, delivered_caption):
+                return
+            if await _send_cached(m, url, delivered_caption):
+                return
+            if await _fail_fast(m, url):
+                return
+
+        async with download_scheduler.slot(m.from_user.id):
             logger.info(f"PINTEREST: {url}")
 
             # Send sticker — no progress text message
@@ -314,6 +408,7 @@ async def handle_pinterest(m: Message, url: str):
                     video_files = await _download_pinterest(url, tmp)
 
                     if not video_files:
+                        flight.fail(negative_cache.get(url))
                         await delete_sticker(bot, m.chat.id, sticker_msg_id)
                         sticker_msg_id = None
                         _err = await get_emoji_async("ERROR")
@@ -329,6 +424,8 @@ async def handle_pinterest(m: Message, url: str):
                     sticker_msg_id = None
 
                     total_sent = 0
+                    file_ids = []
+                    expected = 0
                     for video_idx, video_file in enumerate(video_files):
                         if not video_file.exists():
                             logger.warning(f"PIN: File {video_file} does not exist, skipping")
@@ -344,6 +441,7 @@ async def handle_pinterest(m: Message, url: str):
                         logger.debug(f"PIN: File size {file_size_mb:.1f}MB")
 
                         parts = await ensure_fits_telegram(final, tmp)
+                        expected += len(parts)
 
                         for i, part in enumerate(parts):
                             if not part.exists():
@@ -364,10 +462,16 @@ async def handle_pinterest(m: Message, url: str):
                                 duration=int(info.get("duration") or 0) or None,
                             )
                             total_sent += 1
+                            if sent and sent.video:
+                                file_ids.append(sent.video.file_id)
                             # Cache single-video, single-part result
                             if sent and sent.video and len(video_files) == 1 and len(parts) == 1:
                                 await url_cache.set(url, "video", sent.video.file_id)
 
+                    # Coalesced followers re-send every video/part
+                    if file_ids and len(file_ids) == expected:
+                        flight.succeed(*file_ids)
+
                     logger.info(f"PINTEREST: Sent {total_sent} file(s) to {user_id}")
 
                     # Log to channel
@@ -397,4 +501,6 @@ async def handle_pinterest(m: Message, url: str):
                     await delete_sticker(bot, m.chat.id, sticker_msg_id)
 
     finally:
+        if flight:
+            flight.release()
         await release_user_slot(m.from_user.id)
@@ -55,6 +55,7 @@ from ui.formatting import (
     format_assign_prompt,
     format_assign_updated,
     format_stats,
+    format_perf,
     EMOJI_POSITIONS,
     code_panel,
     mono,
@@ -72,7 +73,25 @@ from utils.broadcast import (
     run_broadcast,
 )
 from utils.redis_client import redis_client
+from utils.cache import url_cache
+from utils.negative_cache import negative_cache
+from utils.singleflight import singleflight
+from utils.info_cache import info_cache
+from utils.format_fit import format_fit_stats
+from utils.layers import layer_stats
+from utils.proxy_pool import proxy_pool
+from utils.cookie_pool import cookie_pool
+from workers.task_queue import download_scheduler, music_scheduler, spotify_scheduler
+from utils.ffmpeg_pool import ffmpeg_pool
+from utils.encode_policy import encode_policy
+from utils.media_processor import probe_cache_stats
+from utils.stream_pipeline import stream_stats
+from utils.range_download import range_stats
 from utils.log_channel import log_download
+from utils.media_id import (
+    detect_platform, canonical_media_id,
+    PLATFORM_INSTAGRAM, PLATFORM_YOUTUBE, PLATFORM_PINTEREST, PLATFORM_SPOTIFY,
+)
 
 # Link regex — improved to catch more URL formats
 LINK_RE = re.compile(r"https?://[^\s<>\"']+")
@@ -305,7 +324,6 @@ async def cmd_mp3(m: Message):
                 "-vn",
                 "-acodec", "libmp3lame",
                 "-b:a", "192k",
-                "-threads", "4",
                 str(audio_path),
             ]
             rc, err = await _run_ffmpeg(args)
@@ -445,6 +463,17 @@ async def cmd_myinfo(m: Message):
 
 # ─── /status ──────────────────────────────────────────────────────────────────
 
+_SCHEDULERS = (download_scheduler, music_scheduler, spotify_scheduler)
+
+
+def _load() -> dict:
+    """Running / waiting jobs across the download schedulers"""
+    return {
+        "active_jobs": sum(s.running() for s in _SCHEDULERS),
+        "queue": sum(s.waiting() for s in _SCHEDULERS),
+    }
+
+
 @dp.message(Command("status"))
 async def cmd_status(m: Message):
     uptime_secs = int(time.time() - _BOT_START_TIME)
@@ -456,15 +485,17 @@ async def cmd_status(m: Message):
         # Admin: full system stats
         await _safe_reply(
             m,
-            await format_status(active_jobs=0, queue=0, uptime=uptime_str),
+            await format_status(**_load(), uptime=uptime_str),
             parse_mode="HTML",
         )
     else:
-        # Normal user: uptime + active jobs only (no system internals)
+        # Normal user: uptime, active jobs and their own queued jobs (no system internals)
         _info = await get_emoji_async("INFO")
+        queued = sum(s.queued_for(m.from_user.id) for s in _SCHEDULERS)
         await _safe_reply(
             m,
-            f"{_info} <b>𝐁𝐨𝐭 𝐒𝐭𝐚𝐭𝐮𝐬</b>\n\nUptime: {uptime_str}\nActive Jobs: 0",
+            f"{_info} <b>𝐁𝐨𝐭 𝐒𝐭𝐚𝐭𝐮𝐬</b>\n\nUptime: {uptime_str}\nActive Jobs: {_load()['active_jobs']}"
+            + (f"\nYour Queued Jobs: {queued}" if queued else ""),
             parse_mode="HTML",
         )
 
@@ -478,14 +509,14 @@ async def cb_status(callback):
     await callback.answer()
     try:
         await callback.message.reply(
-            await format_status(active_jobs=0, queue=0, uptime=uptime_str),
+            await format_status(**_load(), uptime=uptime_str),
             parse_mode="HTML",
         )
     except Exception:
         try:
             await bot.send_message(
                 callback.message.chat.id,
-                await format_status(active_jobs=0, queue=0, uptime=uptime_str),
+                await format_status(**_load(), uptime=uptime_str),
                 parse_mode="HTML",
             )
         except Exception:
@@ -523,7 +554,7 @@ async def cmd_stats(m: Message):
         hours = (uptime_secs % 86400) // 3600
         await _safe_reply(
             m,
-            await format_status(active_jobs=0, queue=0, uptime=f"{days}d {hours}h"),
+            await format_status(**_load(), uptime=f"{days}d {hours}h"),
             parse_mode="HTML",
         )
         return
@@ -533,6 +564,60 @@ async def cmd_stats(m: Message):
     await _safe_reply(m, await format_stats(len(users), len(groups)), parse_mode="HTML")
 
 
+def _collect_perf_sections() -> dict:
+    """Gather runtime counters from the performance subsystems"""
+    return {
+        "file_id cache": url_cache.stats(),
+        "negative cache": negative_cache.stats(),
+        "singleflight": singleflight.stats(),
+        "info cache": info_cache.stats(),
+        "format fit": format_fit_stats.stats(),
+        "extraction layers": layer_stats.stats(),
+        "proxy pool": proxy_pool.stats(),
+        "cookie pool": cookie_pool.stats(),
+        "download slots": download_scheduler.stats(),
+        "music slots": music_scheduler.stats(),
+        "spotify slots": spotify_scheduler.stats(),
+        "ffmpeg pool": ffmpeg_pool.stats(),
+        "encode policy": encode_policy.stats(),
+        "probe cache": probe_cache_stats(),
+        "stream pipeline": stream_stats(),
+        "range download": range_stats(),
+    }
+
+
+@dp.message(Command("perf"))
+async def cmd_perf(m: Message):
+    """Performance counters — admin only"""
+    if not _is_admin(m.from_user.id):
+        _err = await get_emoji_async("ERROR")
+        await _safe_reply(m, f"{_err} 𝐀ᴅᴍɪɴ 𝐎ɴʟʏ", parse_mode="HTML")
+        return
+    await _safe_reply(m, await format_perf(_collect_perf_sections()), parse_mode="HTML")
+
+
+@dp.message(Command("layers"))
+async def cmd_layers(m: Message):
+    """
+    Learned extraction-layer order per platform — admin only.
+
+    Usage:
+      /layers         — show current order, decayed wins/fails, latency
+      /layers reset   — forget learned scores (back to code order)
+    """
+    if not _is_admin(m.from_user.id):
+        _err = await get_emoji_async("ERROR")
+        await _safe_reply(m, f"{_err} 𝐀ᴅᴍɪɴ 𝐎ɴʟʏ", parse_mode="HTML")
+        return
+    args = (m.text or "").split()[1:]
+    if args and args[0].lower() == "reset":
+        layer_stats.reset()
+        _ok = await get_emoji_async("SUCCESS")
+        await _safe_reply(m, f"{_ok} 𝐋ᴀʏᴇʀ ꜱᴄᴏʀᴇꜱ ʀᴇꜱᴇᴛ", parse_mode="HTML")
+        return
+    await _safe_reply(m, await format_perf(layer_stats.table(), title="𝐋ᴀʏᴇʀ 𝐎ʀᴅᴇʀ"), parse_mode="HTML")
+
+
 @dp.message(Command("broadcast"))
 async def cmd_broadcast(m: Message):
     """
@@ -788,7 +873,8 @@ async def on_bot_added_to_group(m: Message):
 
 async def _route_url(m: Message, url: str) -> None:
     """Route a URL to the appropriate downloader."""
-    url_lower = url.lower()
+    platform = detect_platform(url)
+    media_id = canonical_media_id(url) or ""
 
     # Register group
     if m.chat.type in ("group", "supergroup"):
@@ -796,8 +882,8 @@ async def _route_url(m: Message, url: str) -> None:
 
     # Delete user's link message after 5 seconds (except Spotify playlists)
     is_spotify_playlist_link = (
-        "spotify.com" in url_lower and
-        ("/playlist/" in url_lower or "/album/" in url_lower)
+        platform == PLATFORM_SPOTIFY and
+        media_id.startswith(("sp:playlist:", "sp:album:"))
     )
     if not is_spotify_playlist_link:
         async def _delete_link():
@@ -809,16 +895,13 @@ async def _route_url(m: Message, url: str) -> None:
         asyncio.create_task(_delete_link())
 
     try:
-        if "instagram.com" in url_lower:
+        if platform == PLATFORM_INSTAGRAM:
             await handle_instagram(m, url)
-        elif (
-            "youtube.com" in url_lower or
-            "youtu.be" in url_lower
-        ):
+        elif platform == PLATFORM_YOUTUBE:
             await handle_youtube(m, url)
-        elif "pinterest.com" in url_lower or "pin.it" in url_lower:
+        elif platform == PLATFORM_PINTEREST:
             await handle_pinterest(m, url)
-        elif "spotify.com" in url_lower or url_lower.startswith("spotify:"):
+        elif platform == PLATFORM_SPOTIFY:
             await handle_spotify_playlist(m, url)
         else:
             _err = await get_emoji_async("ERROR")
@@ -35,7 +35,8 @@ from aiogram.exceptions import TelegramForbiddenError
 
 from core.bot import bot
 from core.config import config
-from workers.task_queue import spotify_semaphore
+from workers.task_queue import spotify_scheduler, music_scheduler, PRIORITY_PLAYLIST
+from workers.prefetch import ordered_prefetch
 from ui.formatting import (
     format_playlist_progress, format_playlist_final,
     format_playlist_dm_complete, format_delivered_with_mention,
@@ -44,12 +45,12 @@ from ui.formatting import (
 from ui.emoji_config import get_emoji_async
 from utils.helpers import extract_song_metadata
 from utils.logger import logger
+from utils.cache import url_cache
+from utils.singleflight import singleflight
+from utils.proxy_pool import proxy_pool
 from utils.user_state import user_state_manager
 from utils.log_channel import log_download
 
-# ─── Separate semaphore for single tracks (don't wait behind playlists) ───────
-_single_semaphore = asyncio.Semaphore(4)
-
 # ─── URL detection ────────────────────────────────────────────────────────────
 
 def is_spotify_playlist(url: str) -> bool:
@@ -102,7 +103,9 @@ async def _get_spotify_token() -> Optional[str]:
         return _spotify_token
 
     # Fetch new token
+    proxy = proxy_pool.pick(http_only=True)
     try:
+        started = time.monotonic()
         credentials = f"{config.SPOTIFY_CLIENT_ID}:{config.SPOTIFY_CLIENT_SECRET}"
         encoded = base64.b64encode(credentials.encode()).decode()
 
@@ -115,8 +118,10 @@ async def _get_spotify_token() -> Optional[str]:
                 },
                 data={"grant_type": "client_credentials"},
                 timeout=aiohttp.ClientTimeout(total=10),
+                proxy=proxy,
             ) as resp:
                 if resp.status == 200:
+                    proxy_pool.report_ok(proxy, latency=time.monotonic() - started)
                     data = await resp.json()
                     _spotify_token = data.get("access_token")
                     expires_in = data.get("expires_in", 3600)
@@ -125,9 +130,11 @@ async def _get_spotify_token() -> Optional[str]:
                     return _spotify_token
                 else:
                     text = await resp.text()
+                    proxy_pool.report_error(proxy, f"HTTP {resp.status} {text[:200]}")
                     logger.error(f"Spotify token fetch failed: {resp.status} {text[:200]}")
                     return None
     except Exception as e:
+        proxy_pool.report_error(proxy, f"{type(e).__name__}: {e}")
         logger.error(f"Spotify token fetch error: {e}", exc_info=True)
         return None
 
@@ -147,13 +154,16 @@ async def _fetch_playlist_tracks_api(playlist_id: str, is_album: bool = False) -
     endpoint = "albums" if is_album else "playlists"
     url = f"https://api.spotify.com/v1/{endpoint}/{playlist_id}/tracks?limit=100&offset=0"
 
+    proxy = proxy_pool.pick(http_only=True)
     try:
         async with aiohttp.ClientSession() as session:
             while url:
+                started = time.monotonic()
                 async with session.get(
                     url,
                     headers={"Authorization": f"Bearer {token}"},
                     timeout=aiohttp.ClientTimeout(total=15),
+                    proxy=proxy,
                 ) as resp:
                     if resp.status == 401:
                         # Token expired — refresh and retry once
@@ -168,9 +178,11 @@ async def _fetch_playlist_tracks_api(playlist_id: str, is_album: bool = False) -
 
                     if resp.status != 200:
                         text = await resp.text()
+                        proxy_pool.report_error(proxy, f"HTTP {resp.status} {text[:200]}")
                         logger.error(f"Spotify playlist fetch failed: {resp.status} {text[:200]}")
                         break
 
+                    proxy_pool.report_ok(proxy, latency=time.monotonic() - started)
                     data = await resp.json()
                     items = data.get("items", [])
 
@@ -188,6 +200,7 @@ async def _fetch_playlist_tracks_api(playlist_id: str, is_album: bool = False) -
                     logger.debug(f"Spotify: fetched {len(track_urls)} tracks so far")
 
     except Exception as e:
+        proxy_pool.report_error(proxy, f"{type(e).__name__}: {e}")
         logger.error(f"Spotify playlist fetch error: {e}", exc_info=True)
 
     return track_urls
@@ -347,6 +360,21 @@ async def _download_track(url: str, tmp: Path) -> Optional[Path]:
 
 # ─── Single track handler ─────────────────────────────────────────────────────
 
+async def _send_file_id(m: Message, file_id: str, caption: str) -> bool:
+    """Send an already-uploaded track by file_id in the same chat. True if delivered."""
+    try:
+        await bot.send_audio(
+            m.chat.id,
+            file_id,
+            caption=caption,
+            parse_mode="HTML",
+            reply_to_message_id=m.message_id,
+        )
+        return True
+    except Exception as e:
+        logger.debug(f"SPOTIFY SINGLE: Send by file_id failed: {e}")
+        return False
+
 async def handle_spotify_single(m: Message, url: str):
     """
     Download single Spotify track.
@@ -378,11 +406,34 @@ async def handle_spotify_single(m: Message, url: str):
     target_chat = m.chat.id
     _t_start = time.monotonic()
 
+    # Cache check — popular tracks are already on Telegram
+    cached = await url_cache.get(url, "audio")
+    if cached:
+        if await _send_file_id(m, cached, delivered_caption):
+            logger.info(f"SPOTIFY SINGLE: Cache hit → chat {target_chat}")
+            return
+        await url_cache.invalidate(url, "audio")
+
+    # Same track already downloading for someone else — wait, then reuse its outcome
+    flight = await singleflight.join(url, "audio")
+    if not flight.leader:
+        if flight.file_ids and await _send_file_id(m, flight.file_ids[0], delivered_caption):
+            logger.info(f"SPOTIFY SINGLE: Coalesced → chat {target_chat}")
+            return
+        if flight.failure:
+            _err = await get_emoji_async("ERROR")
+            await _safe_reply(
+                m,
+                f"{_err} Unable to process this link.\n\nPlease try again.",
+                parse_mode="HTML",
+            )
+            return
+
     # Send initial progress bar immediately
     progress = await _safe_reply(m, _bar(20), parse_mode="HTML")
 
     try:
-        async with _single_semaphore:
+        async with music_scheduler.slot(m.from_user.id):
             with tempfile.TemporaryDirectory() as tmp_dir:
                 tmp = Path(tmp_dir)
 
@@ -421,8 +472,9 @@ async def handle_spotify_single(m: Message, url: str):
                 # Send in same chat (group or private).
                 # Caption already sanitized via build_safe_media_caption().
                 # Retry once without caption on ENTITY_TEXT_INVALID — never silently drop.
+                sent = None
                 try:
-                    await bot.send_audio(
+                    sent = await bot.send_audio(
                         target_chat,
                         FSInputFile(mp3_file),
                         title=title,
@@ -438,7 +490,7 @@ async def handle_spotify_single(m: Message, url: str):
                             f"SPOTIFY SINGLE: ENTITY_TEXT_INVALID after sanitization, "
                             f"retrying without caption. Error: {_send_err}"
                         )
-                        await bot.send_audio(
+                        sent = await bot.send_audio(
                             target_chat,
                             FSInputFile(mp3_file),
                             title=title,
@@ -447,6 +499,10 @@ async def handle_spotify_single(m: Message, url: str):
                     else:
                         raise
 
+                if sent and sent.audio:
+                    await url_cache.set(url, "audio", sent.audio.file_id)
+                    flight.succeed(sent.audio.file_id)
+
                 logger.info(f"SPOTIFY SINGLE: '{title}' by '{artist}' → chat {target_chat}")
 
                 # Log to channel
@@ -470,6 +526,8 @@ async def handle_spotify_single(m: Message, url: str):
             f"{_err} Unable to process this link.\n\nPlease try again.",
             parse_mode="HTML",
         )
+    finally:
+        flight.release()
 
 # ─── Playlist handler ─────────────────────────────────────────────────────────
 
@@ -569,8 +627,9 @@ async def _run_playlist_download(m: Message, url: str):
     """
     Inner playlist download.
     Fetches tracks via Spotify API (page-by-page).
-    Downloads each track individually with spotdl.
-    Sends each track to user's DM immediately.
+    Downloads each track individually with spotdl, PLAYLIST_PREFETCH ahead
+    of the upload (workers/prefetch.py), under the global music_scheduler budget.
+    Sends each track to user's DM in playlist order.
 
     Progress:
     - Group chat: overall playlist progress bar (updates every 5 tracks)
@@ -578,7 +637,7 @@ async def _run_playlist_download(m: Message, url: str):
     - DM: start notification with playlist info
     - DM: completion message when done
     """
-    async with spotify_semaphore:
+    async with spotify_scheduler.slot(m.from_user.id, PRIORITY_PLAYLIST):
         # Delete user's link after 4 seconds
         async def _delete_link():
             await asyncio.sleep(4)
@@ -658,96 +717,18 @@ async def _run_playlist_download(m: Message, url: str):
 
             sent_count = 0
             failed_count = 0
+            cache_hits = 0
             blocked = False
             start_time = time.perf_counter()
 
-            # Download and send each track individually
-            for i, track_url in enumerate(track_urls):
-                if blocked:
-                    break
-
-                try:
-                    with tempfile.TemporaryDirectory() as tmp_dir:
-                        tmp = Path(tmp_dir)
-
-                        # Update current song progress in group chat
-                        total_done = sent_count + failed_count
-                        pct = min(99, int(total_done * 100 / total)) if total > 0 else 0
-                        song_num = i + 1
-                        _dl = await get_emoji_async("DOWNLOAD")
-                        try:
-                            await _safe_edit(
-                                progress_msg,
-                                f"{_sp} <b>𝐏ʟᴀʏʟɪꜱᴛ:</b> {playlist_name}\n\n"
-                                f"{_bar(pct)}\n"
-                                f"{total_done} / {total}\n\n"
-                                f"{_dl} Song {song_num}/{total}",
-                                parse_mode="HTML",
-                            )
-                        except Exception:
-                            pass
-
-                        mp3_file = await _download_track(track_url, tmp)
-
-                        if not mp3_file or not mp3_file.exists():
-                            failed_count += 1
-                            logger.warning(f"SPOTIFY PLAYLIST: Track {i+1}/{total} failed: {track_url}")
-                        else:
-                            artist, title = extract_song_metadata(mp3_file.stem)
-                            # Build sanitized per-track caption — prevents ENTITY_TEXT_INVALID
-                            track_caption = build_safe_media_caption(
-                                user_id,
-                                m.from_user.first_name or "User",
-                                await get_emoji_async("DELIVERED"),
-                            )
-                            try:
-                                # Send to user's DM with sanitized caption
-                                await bot.send_audio(
-                                    user_id,
-                                    FSInputFile(mp3_file),
-                                    title=title,
-                                    performer=artist,
-                                    caption=track_caption,
-                                    parse_mode="HTML",
-                                )
-                                sent_count += 1
-                                logger.info(f"SPOTIFY PLAYLIST: Sent {sent_count}/{total}: '{title}'")
-                            except TelegramForbiddenError:
-                                logger.error(f"User {user_id} blocked bot")
-                                blocked = True
-                                break
-                            except Exception as _send_err:
-                                _err_str = str(_send_err).lower()
-                                if "entity_text_invalid" in _err_str or "bad request" in _err_str:
-                                    # Caption broken — retry once without caption
-                                    logger.warning(
-                                        f"SPOTIFY PLAYLIST: ENTITY_TEXT_INVALID for '{title}', "
-                                        f"retrying without caption"
-                                    )
-                                    try:
-                                        await bot.send_audio(
-                                            user_id,
-                                            FSInputFile(mp3_file),
-                                            title=title,
-                                            performer=artist,
-                                        )
-                                        sent_count += 1
-                                        logger.info(f"SPOTIFY PLAYLIST: Sent (no caption) {sent_count}/{total}: '{title}'")
-                                    except TelegramForbiddenError:
-                                        logger.error(f"User {user_id} blocked bot")
-                                        blocked = True
-                                        break
-                                    except Exception as e2:
-                                        logger.error(f"SPOTIFY PLAYLIST: Send retry failed for '{title}': {e2}")
-                                        failed_count += 1
-                                else:
-                                    logger.error(f"SPOTIFY PLAYLIST: Send failed for '{title}': {_send_err}")
-                                    failed_count += 1
-
-                except Exception as e:
-                    logger.error(f"SPOTIFY PLAYLIST: Track {i+1} error: {e}", exc_info=True)
-                    failed_count += 1
+            # Build sanitized per-track caption once — prevents ENTITY_TEXT_INVALID
+            track_caption = build_safe_media_caption(
+                user_id,
+                m.from_user.first_name or "User",
+                await get_emoji_async("DELIVERED"),
+            )
 
+            async def _update_overall_progress():
                 # Update overall progress every 5 tracks
                 total_done = sent_count + failed_count
                 if total_done % 5 == 0 or total_done == total:
@@ -761,6 +742,118 @@ async def _run_playlist_download(m: Message, url: str):
                     except Exception:
                         pass
 
+            async def _fetch(track_url: str, tmp: Path, slot):
+                # Cache hit → file_id, no download slot taken
+                cached = await url_cache.get(track_url, "audio")
+                if cached:
+                    return cached
+                async with slot:
+                    return await _download_track(track_url, tmp)
+
+            # spotdl runs PLAYLIST_PREFETCH tracks ahead; delivery stays in order
+            stream = ordered_prefetch(
+                track_urls, _fetch, ahead=config.PLAYLIST_PREFETCH,
+                scheduler=music_scheduler, user_id=user_id,
+            )
+            try:
+                async for i, track_url, result, tmp in stream:
+                    if isinstance(result, str):
+                        try:
+                            await bot.send_audio(
+                                user_id,
+                                result,
+                                caption=track_caption,
+                                parse_mode="HTML",
+                            )
+                            sent_count += 1
+                            cache_hits += 1
+                            logger.info(f"SPOTIFY PLAYLIST: Sent (cached) {sent_count}/{total}")
+                            await _update_overall_progress()
+                            continue
+                        except TelegramForbiddenError:
+                            logger.error(f"User {user_id} blocked bot")
+                            blocked = True
+                            break
+                        except Exception as e:
+                            logger.debug(f"SPOTIFY PLAYLIST: Cached send failed, re-downloading: {e}")
+                            await url_cache.invalidate(track_url, "audio")
+                            async with music_scheduler.slot(user_id, PRIORITY_PLAYLIST):
+                                result = await _download_track(track_url, tmp)
+
+                    # Update current song progress in group chat
+                    total_done = sent_count + failed_count
+                    pct = min(99, int(total_done * 100 / total)) if total > 0 else 0
+                    _dl = await get_emoji_async("DOWNLOAD")
+                    try:
+                        await _safe_edit(
+                            progress_msg,
+                            f"{_sp} <b>𝐏ʟᴀʏʟɪꜱᴛ:</b> {playlist_name}\n\n"
+                            f"{_bar(pct)}\n"
+                            f"{total_done} / {total}\n\n"
+                            f"{_dl} Song {i + 1}/{total}",
+                            parse_mode="HTML",
+                        )
+                    except Exception:
+                        pass
+
+                    mp3_file = result
+                    if not mp3_file or not mp3_file.exists():
+                        failed_count += 1
+                        logger.warning(f"SPOTIFY PLAYLIST: Track {i+1}/{total} failed: {track_url}")
+                    else:
+                        artist, title = extract_song_metadata(mp3_file.stem)
+                        sent = None
+                        try:
+                            # Send to user's DM with sanitized caption
+                            sent = await bot.send_audio(
+                                user_id,
+                                FSInputFile(mp3_file),
+                                title=title,
+                                performer=artist,
+                                caption=track_caption,
+                                parse_mode="HTML",
+                            )
+                            sent_count += 1
+                            logger.info(f"SPOTIFY PLAYLIST: Sent {sent_count}/{total}: '{title}'")
+                        except TelegramForbiddenError:
+                            logger.error(f"User {user_id} blocked bot")
+                            blocked = True
+                            break
+                        except Exception as _send_err:
+                            _err_str = str(_send_err).lower()
+                            if "entity_text_invalid" in _err_str or "bad request" in _err_str:
+                                # Caption broken — retry once without caption
+                                logger.warning(
+                                    f"SPOTIFY PLAYLIST: ENTITY_TEXT_INVALID for '{title}', "
+                                    f"retrying without caption"
+                                )
+                                try:
+                                    sent = await bot.send_audio(
+                                        user_id,
+                                        FSInputFile(mp3_file),
+                                        title=title,
+                                        performer=artist,
+                                    )
+                                    sent_count += 1
+                                    logger.info(f"SPOTIFY PLAYLIST: Sent (no caption) {sent_count}/{total}: '{title}'")
+                                except TelegramForbiddenError:
+                                    logger.error(f"User {user_id} blocked bot")
+                                    blocked = True
+                                    break
+                                except Exception as e2:
+                                    logger.error(f"SPOTIFY PLAYLIST: Send retry failed for '{title}': {e2}")
+                                    failed_count += 1
+                            else:
+                                logger.error(f"SPOTIFY PLAYLIST: Send failed for '{title}': {_send_err}")
+                                failed_count += 1
+
+                        if sent and sent.audio:
+                            await url_cache.set(track_url, "audio", sent.audio.file_id)
+
+                    await _update_overall_progress()
+            finally:
+                await stream.aclose()
+
             elapsed = time.perf_counter() - start_time
 
             if blocked:
@@ -815,7 +908,7 @@ async def _run_playlist_download(m: Message, url: str):
 
             logger.info(
                 f"SPOTIFY PLAYLIST: Done — {sent_count} sent, "
-                f"{failed_count} failed in {elapsed:.1f}s"
+                f"{failed_count} failed ({cache_hits} from cache) in {elapsed:.1f}s"
             )
 
             # Log to channel
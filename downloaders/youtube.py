@@ -4,8 +4,11 @@ YouTube Downloader — Silent delivery with sticker support.
 Flow (normal video):
   1. Send sticker
   2. Show inline [🎥 Video] [🎧 Audio] buttons (minimal status)
-  3. Both streams download in background simultaneously
+  3. One background yt-dlp run fetches video + best audio stream
+     (merged MP4 for 🎥, kept audio stream copied to M4A — or MP3 — for 🎧)
   4. User taps → send when ready
+     (🎧 tapped while the video stream is still downloading → abort it,
+      fetch audio only; temp dir is freed as soon as the reply is sent)
   5. Delete sticker + status message after send
   6. Reply to original with ✓ Delivered — <mention>
 
@@ -24,6 +27,8 @@ Playlist:
 Cache:
   SHA256(url+format) → Telegram file_id
   If cached → send instantly, no re-download
+  Video ID → yt-dlp info dict (5 min) — layers, formats and handlers
+  download from it without re-extracting the page
 
 Cookie folder:
   Never crash if folder missing — skip silently
@@ -33,16 +38,21 @@ Resolution rule:
   >  120s → 720p
 
 >50MB fix:
-  Dynamic bitrate re-encode to fit under 49MB.
+  Format picked from the info dict to fit 49MB (utils/format_fit.py),
+  dynamic bitrate re-encode only when nothing fits.
 """
 import asyncio
+import contextlib
+import functools
 import re
 import time
 import tempfile
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Optional, List, Tuple
 
 from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadCancelled
 from aiogram.types import (
     Message, FSInputFile,
     InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery,
@@ -51,13 +61,29 @@ from aiogram.exceptions import TelegramForbiddenError
 
 from core.bot import bot, dp
 from core.config import config
-from workers.task_queue import download_semaphore
-from utils.helpers import get_random_cookie
+from workers.task_queue import (
+    FairScheduler, download_scheduler, music_scheduler, PRIORITY_PLAYLIST,
+)
+from workers.prefetch import ordered_prefetch
 from utils.logger import logger
 from utils.cache import url_cache
+from utils.negative_cache import negative_cache
+from utils.singleflight import singleflight
+from utils.info_cache import info_cache
+from utils.proxy_pool import proxy_pool
+from utils.cookie_pool import cookie_pool
+from utils.format_fit import Picker, telegram_format_picker, format_fit_stats, pick_fitting_format
+from utils.job_cost import estimate_cost
+from utils.encode_policy import encode_policy
+from utils.chunked_encode import chunk_count, chunked_encode
+from utils.stream_pipeline import stream_inputs, stream_to_mp4
+from utils.layers import run_hedged, ytdlp_cancel_hook
+from utils.download_result import DownloadResult, kept_streams, results as download_results
 from utils.media_processor import (
     reencode_shorts,
     get_video_info, get_file_size, _run_ffmpeg,
+    describe_output,
+    extract_audio_from_video, remux_audio,
 )
 from utils.watchdog import acquire_user_slot, release_user_slot
 from ui.formatting import (
@@ -68,6 +94,7 @@ from ui.formatting import (
     format_yt_playlist_final,
     safe_caption,
     build_safe_media_caption,
+    format_queued,
 )
 from ui.stickers import send_sticker, delete_sticker
 from ui.emoji_config import get_emoji_async
@@ -120,11 +147,14 @@ def _base_opts(tmp: Path) -> dict:
         "quiet": True,
         "no_warnings": True,
         "outtmpl": str(tmp / "%(title)s.%(ext)s"),
-        "proxy": config.pick_proxy(),
+        "proxy": proxy_pool.pick(),
         "http_headers": {"User-Agent": config.pick_user_agent()},
         "socket_timeout": 30,
         "retries": 2,
         "fragment_retries": 2,
+        "concurrent_fragment_downloads": config.DOWNLOAD_FRAGMENTS,
+        # watch?v=X&list=RD… is routed here on purpose — download X, not the mix
+        "noplaylist": True,
         "ignoreerrors": False,
     }
 
@@ -145,7 +175,7 @@ def _layer2_opts(tmp: Path, fmt: str) -> dict:
 def _layer3_opts(tmp: Path, fmt: str) -> dict:
     opts = _base_opts(tmp)
     opts["format"] = fmt
-    cookie_file = get_random_cookie(config.YT_COOKIES_FOLDER)
+    cookie_file = cookie_pool.pick(config.YT_COOKIES_FOLDER)
     if cookie_file:
         opts["cookiefile"] = cookie_file
     return opts
@@ -153,39 +183,249 @@ def _layer3_opts(tmp: Path, fmt: str) -> dict:
 def _layer3_music_opts(tmp: Path, fmt: str) -> dict:
     opts = _base_opts(tmp)
     opts["format"] = fmt
-    cookie_file = get_random_cookie(config.YT_MUSIC_COOKIES_FOLDER)
+    cookie_file = cookie_pool.pick(config.YT_MUSIC_COOKIES_FOLDER)
     if cookie_file:
         opts["cookiefile"] = cookie_file
     return opts
 
+# Admission peeks extract with plain layer-1 options, so layer 1 reuses them
+_PEEK_ROUTE = "layer1"
+
 # ─── Download helpers ─────────────────────────────────────────────────────────
 
-async def _try_download(url: str, opts: dict) -> Optional[Path]:
-    """Attempt yt-dlp download. Returns file path or None."""
-    tmp = Path(opts["outtmpl"]).parent
-    try:
+def _process_sync(
+    url: str,
+    opts: dict,
+    info: Optional[dict],
+    picker: Optional[Picker] = None,
+    cancel: Optional[threading.Event] = None,
+    route: str = _PEEK_ROUTE,
+) -> Tuple[Optional[dict], List[DownloadResult]]:
+    """
+    Blocking: download from `info`, or extract it first and cache it under `route`.
+    `picker` may replace opts["format"] with a spec chosen from the info dict.
+    Returns (processed info, files yt-dlp wrote).
+    """
+    if info is None:
+        started = time.monotonic()
         with YoutubeDL(opts) as ydl:
-            await asyncio.to_thread(lambda: ydl.download([url]))
-        files = (
-            list(tmp.glob("*.mp4")) + list(tmp.glob("*.webm")) +
-            list(tmp.glob("*.mkv")) + list(tmp.glob("*.m4v"))
+            info = ydl.extract_info(url, download=False, process=False)
+        if not info:
+            return None, []
+        # Extraction is a few small requests — a fair proxy latency sample
+        proxy_pool.report_ok(opts.get("proxy"), latency=time.monotonic() - started)
+        cookie_pool.report_ok(opts.get("cookiefile"))
+        # Cached before downloading so a parallel branch on the same route can
+        # reuse it right away — a hedged layer extracts for itself
+        info_cache.set(
+            url, YoutubeDL.sanitize_info(info, remove_private_keys=True), opts.get("proxy"), route=route,
         )
-        return files[0] if files else None
+
+    # Lost a hedge race during extraction — don't start writing files
+    if cancel is not None and cancel.is_set():
+        raise DownloadCancelled("attempt cancelled")
+
+    picked = picker(info) if picker else None
+    if picked:
+        opts = {**opts, "format": picked[0]}
+
+    with YoutubeDL(opts) as ydl:
+        result = ydl.process_ie_result(info, download=True)
+    files = download_results(result)
+
+    if picked and files:
+        _, predicted, limit = picked
+        format_fit_stats.record_actual(predicted, files[0].size, limit)
+    return result, files
+
+async def _ydl_download(
+    url: str,
+    opts: dict,
+    picker: Optional[Picker] = None,
+    cancel: Optional[threading.Event] = None,
+    route: str = _PEEK_ROUTE,
+) -> Tuple[Optional[dict], List[DownloadResult]]:
+    """
+    yt-dlp download that reuses the info dict `route` (the layer) cached
+    earlier, with its proxy. Other layers' entries are never used — a hedge
+    must take a different route. A cached entry that fails is dropped and
+    the page re-extracted once. Raises like YoutubeDL.download().
+    """
+    cached = info_cache.get(url, route=route)
+    if cached:
+        info, proxy = cached
+        try:
+            return await asyncio.to_thread(
+                _process_sync, url, {**opts, "proxy": proxy}, info, picker, cancel, route,
+            )
+        except DownloadCancelled:
+            raise
+        except Exception as e:
+            if "requested format is not available" in str(e).lower():
+                raise
+            # Not this attempt's cookie — the entry was extracted earlier, maybe with another
+            proxy_pool.report_error(proxy, str(e))
+            logger.debug(f"Cached info failed, re-extracting: {str(e)[:80]}")
+            info_cache.invalidate(url, route=route)
+    try:
+        return await asyncio.to_thread(_process_sync, url, opts, None, picker, cancel, route)
+    except DownloadCancelled:
+        raise
+    except Exception as e:
+        proxy_pool.report_error(opts.get("proxy"), str(e))
+        cookie_pool.report_error(opts.get("cookiefile"), str(e))
+        raise
+
+def _layer_name(layer_fn) -> str:
+    """Layer name for run_hedged — also the info_cache route"""
+    return layer_fn.__name__.strip("_").replace("_opts", "")
+
+def _layer_attempts(tmp: Path, layer_fns: list, attempt) -> list:
+    """
+    [(layer name, fn(cancel))] for run_hedged.
+    Each layer gets its own subdir — hedged layers run side by side.
+    """
+    attempts = []
+    for layer_fn in layer_fns:
+        name = _layer_name(layer_fn)
+        sub = tmp / name
+        sub.mkdir(parents=True, exist_ok=True)
+        attempts.append((name, functools.partial(attempt, layer_fn, sub)))
+    return attempts
+
+async def _try_download(
+    url: str,
+    opts: dict,
+    errors: Optional[List[str]] = None,
+    picker: Optional[Picker] = None,
+    cancel: Optional[threading.Event] = None,
+    route: str = _PEEK_ROUTE,
+) -> Optional[DownloadResult]:
+    """Attempt yt-dlp download. Returns the video written or None (error appended to `errors`)."""
+    try:
+        _, files = await _ydl_download(url, opts, picker, cancel, route)
+        return next((f for f in files if f.is_video), None)
+    except DownloadCancelled:
+        return None
+    except Exception as e:
+        logger.debug(f"yt-dlp layer failed: {type(e).__name__}: {str(e)[:100]}")
+        if errors is not None:
+            errors.append(str(e))
+        return None
+
+_DEFAULT_VIDEO_FMT = "bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][ext=mp4]/best"
+# Muxed HLS — the stream pipeline's ffmpeg reads it segment by segment, unthrottled
+_STREAM_HLS_FMT = "best[protocol^=m3u8][height<=1080]"
+
+# yt-dlp names kept pre-merge streams "<title>.f<format_id>.<ext>"
+_KEPT_STREAM_RE = re.compile(r"\.f[\w-]+$")
+
+async def _try_download_streams(
+    url: str,
+    opts: dict,
+    errors: Optional[List[str]] = None,
+    picker: Optional[Picker] = None,
+    cancel: Optional[threading.Event] = None,
+    route: str = _PEEK_ROUTE,
+    job_cancel: Optional[threading.Event] = None,
+) -> Optional[Tuple[Path, Path]]:
+    """
+    Attempt one yt-dlp download that serves both buttons.
+    Returns (video_path, audio_source) or None: audio_source is the kept
+    bestaudio stream, or the video itself when a progressive format was picked.
+    Nothing is extracted once job_cancel is set.
+    """
+    if job_cancel is not None and job_cancel.is_set():
+        return None
+    try:
+        info, files = await _ydl_download(url, opts, picker, cancel, route)
+    except DownloadCancelled:
+        return None
     except Exception as e:
         logger.debug(f"yt-dlp layer failed: {type(e).__name__}: {str(e)[:100]}")
+        if errors is not None:
+            errors.append(str(e))
         return None
 
+    video = next((f for f in files if f.is_video), None)
+    if not video:
+        return None
+    audio = next((f for f in kept_streams(info) if not f.is_video), None)
+    return video.path, (audio or video).path
+
+async def download_youtube_streams(
+    url: str,
+    tmp: Path,
+    cancel: Optional[threading.Event] = None,
+    state: Optional[dict] = None,
+) -> Tuple[Optional[Path], Optional[Path]]:
+    """
+    Download video + best audio stream once — hedged 3-layer fallback.
+    keepvideo leaves the pre-merge audio stream on disk, so the 🎧 reply
+    is a local transcode instead of a second extraction and transfer.
+    Setting `cancel` aborts at the next progress tick (nothing is negative-cached).
+    """
+    errors: List[str] = []
+    picker = telegram_format_picker(max_height=1080)
+    job_cancel = cancel or threading.Event()
+
+    async def attempt(layer_fn, sub: Path, layer_cancel: threading.Event):
+        opts = layer_fn(sub, _DEFAULT_VIDEO_FMT)
+        opts["keepvideo"] = True
+        opts["progress_hooks"] = [ytdlp_cancel_hook(job_cancel, layer_cancel, state=state)]
+        return await _try_download_streams(
+            url, opts, errors, picker, layer_cancel, _layer_name(layer_fn), job_cancel,
+        )
+
+    result = await run_hedged(
+        "youtube", _layer_attempts(tmp, [_layer1_opts, _layer2_opts, _layer3_opts], attempt), job_cancel,
+    )
+    if result:
+        return result
+    if not job_cancel.is_set():
+        negative_cache.record(url, errors)
+    return None, None
+
+async def audio_from_stream(source: Path, tmp: Path, bitrate: str = "320k") -> Optional[Path]:
+    """
+    Audio file named after the title from a downloaded audio stream (or video):
+    the kept M4A copied into a tagged M4A when AUDIO_NATIVE, else an MP3 transcode.
+    """
+    title = _KEPT_STREAM_RE.sub("", source.stem)
+    if config.AUDIO_NATIVE and source.suffix.lower() == ".m4a":
+        native = tmp / f"{title}.m4a"
+        if native.exists() or (await remux_audio(source, native) and native.exists()):
+            return native
+    output = tmp / f"{title}.mp3"
+    if output.exists():
+        return output
+    if await extract_audio_from_video(source, output, bitrate=bitrate) and output.exists():
+        return output
+    return None
+
 async def download_youtube_video(
     url: str,
     tmp: Path,
-    fmt: str = "bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][ext=mp4]/best",
+    fmt: str = _DEFAULT_VIDEO_FMT,
+    picker: Optional[Picker] = None,
 ) -> Optional[Path]:
-    """Download YouTube video — 3-layer fallback"""
-    for layer_fn in [_layer1_opts, _layer2_opts, _layer3_opts]:
-        opts = layer_fn(tmp, fmt)
-        result = await _try_download(url, opts)
-        if result:
-            return result
+    """
+    Download YouTube video — hedged 3-layer fallback. Records a negative-cache entry if all layers fail.
+    `picker` chooses a size-fitting format from the info dict; `fmt` is the fallback.
+    """
+    errors: List[str] = []
+
+    async def attempt(layer_fn, sub: Path, cancel: threading.Event):
+        opts = layer_fn(sub, fmt)
+        opts["progress_hooks"] = [ytdlp_cancel_hook(cancel)]
+        return await _try_download(url, opts, errors, picker, cancel, _layer_name(layer_fn))
+
+    result = await run_hedged(
+        "youtube", _layer_attempts(tmp, [_layer1_opts, _layer2_opts, _layer3_opts], attempt),
+    )
+    if result:
+        return result.path
+    negative_cache.record(url, errors)
     return None
 
 async def download_youtube_video_quality(
@@ -195,56 +435,97 @@ async def download_youtube_video_quality(
 ) -> Optional[Path]:
     """Download YouTube video at specific quality"""
     fmt = f"bestvideo[height<={height}][ext=mp4]+bestaudio[ext=m4a]/best[height<={height}][ext=mp4]/best[height<={height}]"
-    return await download_youtube_video(url, tmp, fmt=fmt)
-
-async def download_youtube_audio(url: str, tmp: Path, is_music: bool = False, quality: str = "320") -> Optional[Path]:
-    """Download YouTube/YT Music audio as MP3"""
-    fmt = "bestaudio[ext=m4a]/bestaudio/best"
-    layer_fns = [_layer1_opts, _layer2_opts]
-    layer_fns.append(_layer3_music_opts if is_music else _layer3_opts)
+    return await download_youtube_video(url, tmp, fmt=fmt, picker=telegram_format_picker(max_height=height))
 
-    for layer_fn in layer_fns:
-        opts = layer_fn(tmp, fmt)
-        opts["postprocessors"] = [{
-            "key": "FFmpegExtractAudio",
-            "preferredcodec": "mp3",
-            "preferredquality": quality,
-        }]
-        opts["outtmpl"] = str(tmp / "%(title)s.%(ext)s")
+async def _download_audio_layers(
+    url: str,
+    tmp: Path,
+    layer_fns: list,
+    postprocessors: list,
+    postprocessor_args: Optional[dict] = None,
+    fmt: str = "bestaudio[ext=m4a]/bestaudio/best",
+    ext: str = "mp3",
+    errors: Optional[List[str]] = None,
+) -> Optional[Path]:
+    """Hedged audio download → path of the *.{ext} file yt-dlp wrote, or None"""
+
+    async def attempt(layer_fn, sub: Path, cancel: threading.Event):
+        opts = layer_fn(sub, fmt)
+        opts["postprocessors"] = postprocessors
+        if postprocessor_args:
+            opts["postprocessor_args"] = postprocessor_args
+        opts["progress_hooks"] = [ytdlp_cancel_hook(cancel)]
         try:
-            with YoutubeDL(opts) as ydl:
-                await asyncio.to_thread(lambda: ydl.download([url]))
-            mp3_files = list(tmp.glob("*.mp3"))
-            if mp3_files:
-                return mp3_files[0]
+            _, files = await _ydl_download(url, opts, cancel=cancel, route=_layer_name(layer_fn))
+            return next((f.path for f in files if f.path.suffix == f".{ext}"), None)
+        except DownloadCancelled:
+            return None
         except Exception as e:
             logger.debug(f"Audio layer failed: {str(e)[:80]}")
+            if errors is not None:
+                errors.append(str(e))
+            return None
 
-    return None
+    return await run_hedged("youtube", _layer_attempts(tmp, layer_fns, attempt))
+
+# Native audio: YouTube's AAC stream (itag 140) as-is, tags written by a remux
+_NATIVE_AUDIO_FMT = "bestaudio[ext=m4a]"
+_NATIVE_AUDIO_PP = [{"key": "FFmpegMetadata", "add_metadata": True}]
+
+async def _download_native_audio(url: str, tmp: Path, layer_fns: list) -> Tuple[Optional[Path], bool]:
+    """
+    (M4A path, try MP3) — the MP3 fallback is only worth it when the native
+    attempt failed for lack of an M4A format, not when the video is unavailable.
+    """
+    errors: List[str] = []
+    result = await _download_audio_layers(
+        url, tmp, layer_fns, _NATIVE_AUDIO_PP, fmt=_NATIVE_AUDIO_FMT, ext="m4a", errors=errors,
+    )
+    if result:
+        return result, False
+    retry = not errors or any("format" in e.lower() for e in errors)
+    logger.info(f"YT AUDIO: no native M4A{', MP3 fallback' if retry else ''}: {url[:60]}")
+    return None, retry
+
+async def download_youtube_audio(
+    url: str,
+    tmp: Path,
+    is_music: bool = False,
+    quality: str = "320",
+    native: Optional[bool] = None,
+) -> Optional[Path]:
+    """
+    Download YouTube/YT Music audio — native M4A when `native` (default
+    config.AUDIO_NATIVE), else or as fallback MP3 at `quality` kbps.
+    """
+    layer_fns = [_layer1_opts, _layer2_opts]
+    layer_fns.append(_layer3_music_opts if is_music else _layer3_opts)
+    if config.AUDIO_NATIVE if native is None else native:
+        result, retry = await _download_native_audio(url, tmp, layer_fns)
+        if result or not retry:
+            return result
+    return await _download_audio_layers(url, tmp, layer_fns, [{
+        "key": "FFmpegExtractAudio",
+        "preferredcodec": "mp3",
+        "preferredquality": quality,
+    }])
 
 async def download_youtube_audio_192k(url: str, tmp: Path) -> Optional[Path]:
-    """Download YouTube audio as 192k MP3 (fast mode)"""
-    fmt = "bestaudio[ext=m4a]/bestaudio/best"
-    for layer_fn in [_layer1_opts, _layer2_opts, _layer3_opts]:
-        opts = layer_fn(tmp, fmt)
-        opts["postprocessors"] = [{
+    """Download YouTube audio as native M4A (config.AUDIO_NATIVE), else 192k MP3 (fast mode)"""
+    layer_fns = [_layer1_opts, _layer2_opts, _layer3_opts]
+    if config.AUDIO_NATIVE:
+        result, retry = await _download_native_audio(url, tmp, layer_fns)
+        if result or not retry:
+            return result
+    return await _download_audio_layers(
+        url, tmp, layer_fns,
+        [{
             "key": "FFmpegExtractAudio",
             "preferredcodec": "mp3",
             "preferredquality": "192",
-        }]
-        opts["postprocessor_args"] = {
-            "FFmpegExtractAudio": ["-acodec", "libmp3lame", "-b:a", "192k", "-preset", "ultrafast", "-threads", "4"]
-        }
-        opts["outtmpl"] = str(tmp / "%(title)s.%(ext)s")
-        try:
-            with YoutubeDL(opts) as ydl:
-                await asyncio.to_thread(lambda: ydl.download([url]))
-            mp3_files = list(tmp.glob("*.mp3"))
-            if mp3_files:
-                return mp3_files[0]
-        except Exception as e:
-            logger.debug(f"Audio 192k layer failed: {str(e)[:80]}")
-    return None
+        }],
+        {"FFmpegExtractAudio": ["-acodec", "libmp3lame", "-b:a", "192k", "-preset", "ultrafast", "-threads", "4"]},
+    )
 
 # ─── Ensure video fits Telegram (>50MB fix) ───────────────────────────────────
 
@@ -253,6 +534,8 @@ async def ensure_video_fits_telegram(video_path: Path, tmp_dir: Path) -> Optiona
     Ensure video fits Telegram 49MB limit.
     Uses dynamic bitrate calculation.
     Falls back to 720p if still too large.
+    Preset (and a possible downscale) come from the encode policy.
+    Long videos are encoded as parallel chunks (utils/chunked_encode.py).
     Never silently fails.
     """
     TG_LIMIT = 49 * 1024 * 1024
@@ -270,6 +553,7 @@ async def ensure_video_fits_telegram(video_path: Path, tmp_dir: Path) -> Optiona
             ]
             rc, _ = await _run_ffmpeg(args)
             if rc == 0 and remuxed.exists():
+                describe_output(remuxed, await get_video_info(video_path))
                 return remuxed
         return video_path
 
@@ -283,21 +567,40 @@ async def ensure_video_fits_telegram(video_path: Path, tmp_dir: Path) -> Optiona
     bitrate = int((target_size_mb * 8 * 1024) / max(duration, 1))
     bitrate = max(bitrate, 300)  # minimum 300kbps
 
+    orig_height = info.get("height") or 1080
+    # Long videos encode as parallel keyframe chunks — the policy predicts per-chunk time
+    chunked = duration >= config.CHUNKED_ENCODE_MIN_DURATION
+    policy_duration = duration / chunk_count() if chunked else duration
+    preset, enc_h = encode_policy.choose(policy_duration, orig_height)
+    scale = ["-vf", f"scale=-2:{enc_h}"] if enc_h < orig_height else []
+
     encoded = tmp_dir / f"enc_{video_path.stem}.mp4"
-    args = [
-        "-y", "-i", str(video_path),
-        "-c:v", "libx264",
-        "-preset", "veryfast",
-        "-b:v", f"{bitrate}k",
-        "-maxrate", f"{bitrate}k",
-        "-bufsize", f"{bitrate * 2}k",
-        "-c:a", "aac",
-        "-b:a", "128k",
-        "-movflags", "+faststart",
-        "-threads", "4",
-        str(encoded),
-    ]
-    rc, err = await _run_ffmpeg(args)
+    # A chunk that timed out means the whole video would too — skip the single-process encode
+    chunk_status: dict = {}
+    if chunked and await chunked_encode(video_path, encoded, bitrate, preset, enc_h if scale else None, chunk_status):
+        rc = 0
+    elif chunk_status.get("timed_out"):
+        logger.warning("YT VIDEO: chunked encode timed out, skipping single-process encode")
+        rc = -1
+    else:
+        args = [
+            "-y", "-i", str(video_path),
+            "-c:v", "libx264",
+            "-preset", preset,
+            *scale,
+            "-b:v", f"{bitrate}k",
+            "-maxrate", f"{bitrate}k",
+            "-bufsize", f"{bitrate * 2}k",
+            "-c:a", "aac",
+            "-b:a", "128k",
+            "-movflags", "+faststart",
+            str(encoded),
+        ]
+        timing: dict = {}
+        rc, err = await _run_ffmpeg(args, timing=timing)
+        if rc == 0:
+            encode_policy.record(preset, enc_h, duration, timing.get("seconds", 0))
+            describe_output(encoded, info, enc_h)
 
     if rc == 0 and encoded.exists():
         enc_size = get_file_size(encoded)
@@ -308,26 +611,36 @@ async def ensure_video_fits_telegram(video_path: Path, tmp_dir: Path) -> Optiona
 
     # Fallback: 720p re-encode
     fallback = tmp_dir / f"fallback_{video_path.stem}.mp4"
-    orig_height = info.get("height") or 1080
     target_h = min(orig_height, 720)
+    preset, target_h = encode_policy.choose(policy_duration, target_h)
     bitrate_720 = int((target_size_mb * 8 * 1024) / max(duration, 1))
     bitrate_720 = max(bitrate_720, 300)
 
-    args_720 = [
-        "-y", "-i", str(video_path),
-        "-c:v", "libx264",
-        "-preset", "veryfast",
-        "-vf", f"scale=-2:{target_h}",
-        "-b:v", f"{bitrate_720}k",
-        "-maxrate", f"{bitrate_720}k",
-        "-bufsize", f"{bitrate_720 * 2}k",
-        "-c:a", "aac",
-        "-b:a", "128k",
-        "-movflags", "+faststart",
-        "-threads", "4",
-        str(fallback),
-    ]
-    rc2, err2 = await _run_ffmpeg(args_720)
+    chunk_status = {}
+    if chunked and await chunked_encode(video_path, fallback, bitrate_720, preset, target_h, chunk_status):
+        rc2 = 0
+    elif chunk_status.get("timed_out"):
+        logger.warning("YT VIDEO: chunked 720p encode timed out, skipping single-process encode")
+        rc2 = -1
+    else:
+        args_720 = [
+            "-y", "-i", str(video_path),
+            "-c:v", "libx264",
+            "-preset", preset,
+            "-vf", f"scale=-2:{target_h}",
+            "-b:v", f"{bitrate_720}k",
+            "-maxrate", f"{bitrate_720}k",
+            "-bufsize", f"{bitrate_720 * 2}k",
+            "-c:a", "aac",
+            "-b:a", "128k",
+            "-movflags", "+faststart",
+            str(fallback),
+        ]
+        timing = {}
+        rc2, err2 = await _run_ffmpeg(args_720, timing=timing)
+        if rc2 == 0:
+            encode_policy.record(preset, target_h, duration, timing.get("seconds", 0))
+            describe_output(fallback, info, target_h)
 
     if rc2 == 0 and fallback.exists():
         fb_size = get_file_size(fallback)
@@ -477,15 +790,188 @@ async def _safe_reply_text(m: Message, text: str, **kwargs) -> Optional[Message]
         logger.error(f"YT reply failed: {e}")
         return None
 
+async def _send_cached(
+    chat_id: int,
+    reply_to_msg_id: Optional[int],
+    url: str,
+    fmt: str,
+    caption: str,
+) -> bool:
+    """Send cached file_id for url+fmt if present. Drops stale entries. True if delivered."""
+    cached = await url_cache.get(url, fmt)
+    if not cached:
+        return False
+    try:
+        if fmt.startswith("audio"):
+            sent = await _safe_send_audio(
+                chat_id, reply_to_msg_id,
+                audio=cached, caption=caption, parse_mode="HTML",
+            )
+        else:
+            sent = await _safe_send_video(
+                chat_id, reply_to_msg_id,
+                video=cached, caption=caption, parse_mode="HTML",
+                supports_streaming=True,
+            )
+        if sent:
+            return True
+    except Exception:
+        pass
+    # Stale file_id — drop it from both tiers and fall through
+    await url_cache.invalidate(url, fmt)
+    return False
+
+async def _send_flight(
+    chat_id: int,
+    reply_to_msg_id: Optional[int],
+    flight,
+    fmt: str,
+    caption: str,
+) -> bool:
+    """Follower: deliver the leader's file_id(s), or its failure. True if handled."""
+    if flight.failure:
+        logger.info(f"YOUTUBE: Coalesced leader failed ({flight.failure}), failing fast")
+        _err = await get_emoji_async("ERROR")
+        await bot.send_message(
+            chat_id,
+            f"{_err} Unable to process this link.\n\nPlease try again.",
+            parse_mode="HTML",
+        )
+        return True
+    delivered = False
+    for i, file_id in enumerate(flight.file_ids):
+        cap = caption if i == len(flight.file_ids) - 1 else f"Part {i+1}/{len(flight.file_ids)}"
+        if fmt.startswith("audio"):
+            sent = await _safe_send_audio(
+                chat_id, reply_to_msg_id,
+                audio=file_id, caption=cap, parse_mode="HTML",
+            )
+        else:
+            sent = await _safe_send_video(
+                chat_id, reply_to_msg_id,
+                video=file_id, caption=cap, parse_mode="HTML",
+                supports_streaming=True,
+            )
+        delivered = delivered or bool(sent)
+    return delivered
+
+async def _fail_fast(m: Message, url: str) -> bool:
+    """Known-bad video — reply error without taking a download slot. True if handled."""
+    failure = negative_cache.get(url)
+    if not failure:
+        return False
+    logger.info(f"YOUTUBE: Negative cache hit ({failure}) for {url}")
+    _err = await get_emoji_async("ERROR")
+    await _safe_reply_text(
+        m,
+        f"{_err} Unable to process this link.\n\nPlease try again.",
+        parse_mode="HTML",
+    )
+    return True
+
+# ─── Admission ────────────────────────────────────────────────────────────────
+
+async def _peek_info(url: str) -> Optional[dict]:
+    """
+    Info dict for costing a job before it takes a slot — from info_cache, or
+    one extraction that the download then reuses. None on failure (1 unit).
+    """
+    cached = info_cache.get(url, route=_PEEK_ROUTE)
+    if cached:
+        return cached[0]
+    opts = _base_opts(Path(tempfile.gettempdir()))
+
+    def _extract():
+        with YoutubeDL(opts) as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
+            return YoutubeDL.sanitize_info(info, remove_private_keys=True) if info else None
+
+    started = time.monotonic()
+    try:
+        info = await asyncio.wait_for(asyncio.to_thread(_extract), timeout=config.ADMISSION_PEEK_TIMEOUT)
+    except asyncio.TimeoutError:
+        return None
+    except Exception as e:
+        proxy_pool.report_error(opts["proxy"], str(e))
+        logger.debug(f"Admission peek failed, costing as 1 unit: {str(e)[:80]}")
+        return None
+    if info:
+        proxy_pool.report_ok(opts["proxy"], latency=time.monotonic() - started)
+        info_cache.set(url, info, opts["proxy"], route=_PEEK_ROUTE)
+    return info
+
+async def _stream_video(url: str, tmp: Path, fmt: str) -> Optional[Path]:
+    """
+    Stream pipeline for short videos: select formats from the (cached) info
+    dict and let ffmpeg encode from their URLs while they download, through
+    the proxy that resolved them. None → use the download path.
+    """
+    if not config.STREAM_PIPELINE:
+        return None
+    info = await _peek_info(url)
+    cached = info_cache.get(url, route=_PEEK_ROUTE)
+    if not info or not cached or (info.get("duration") or 0) > config.STREAM_PIPELINE_MAX_DURATION:
+        return None
+    proxy = cached[1]
+    picked = pick_fitting_format(info, 1080)
+
+    def _select(spec: str) -> dict:
+        with YoutubeDL({**_base_opts(tmp), "proxy": proxy, "format": spec}) as ydl:
+            return ydl.process_ie_result(info, download=False)
+
+    # googlevideo's DASH/progressive URLs need chunked ranges ffmpeg won't
+    # send (stream_inputs rejects them) — HLS first, then the usual pick
+    processed = None
+    for spec in (_STREAM_HLS_FMT, picked[0] if picked else fmt):
+        try:
+            selected = await asyncio.to_thread(_select, spec)
+        except Exception as e:
+            logger.debug(f"Stream pipeline: format selection failed: {str(e)[:80]}")
+            continue
+        if stream_inputs(selected, proxy):
+            processed = selected
+            break
+    if processed is None:
+        return None
+    output = tmp / "stream.mp4"
+    if await stream_to_mp4(processed, output, proxy):
+        return output
+    return None
+
+@contextlib.asynccontextmanager
+async def _admitted(ticket, weight: str, show_notice, clear_notice):
+    """
+    Enter a download_scheduler ticket, showing the queue position and
+    estimated wait (show_notice(text)) while it waits, clear_notice() once it runs.
+    """
+    runs_now, position, wait_s = download_scheduler.admission(ticket)
+    logger.info(
+        f"ADMISSION: user {ticket.user_id} cost {ticket.cost:g} ({weight}) → "
+        + ("run" if runs_now else f"queued #{position}, ~{wait_s:.0f}s")
+    )
+    if not runs_now:
+        try:
+            await show_notice(await format_queued(position, wait_s, weight))
+        except Exception as e:
+            logger.debug(f"ADMISSION: notice failed: {e}")
+    async with ticket:
+        if not runs_now:
+            try:
+                await clear_notice()
+            except Exception as e:
+                logger.debug(f"ADMISSION: clearing notice failed: {e}")
+        yield
+
 # ─── Pending job store (for inline button flow) ───────────────────────────────
 _pending: dict = {}
 
 # ─── YT Music handler ────────────────────────────────────────────────────────
 
-async def handle_youtube_music(m: Message, url: str):
+async def handle_youtube_music(m: Message, url: str) -> Optional[str]:
     """
-    YT Music → 320kbps MP3.
+    YT Music → native M4A (AUDIO_NATIVE), else 320kbps MP3.
     Silent: sticker → download → delete sticker → send → ✓ Delivered — <mention>
+    Returns the sent audio's file_id (None if nothing was delivered).
     """
     user_id = m.from_user.id
     first_name = m.from_user.first_name or "User"
@@ -494,22 +980,6 @@ async def handle_youtube_music(m: Message, url: str):
     delivered_caption = build_safe_media_caption(user_id, first_name, delivered_emoji)
     _t_start = time.monotonic()
 
-    # Cache check
-    cached = await url_cache.get(url, "audio")
-    if cached:
-        try:
-            sent = await _safe_send_audio(
-                m.chat.id,
-                m.message_id,
-                audio=cached,
-                caption=delivered_caption,
-                parse_mode="HTML",
-            )
-            if sent:
-                return
-        except Exception:
-            pass
-
     # Send sticker — no progress text message
     sticker_msg_id = await send_sticker(bot, m.chat.id, "music")
 
@@ -554,6 +1024,7 @@ async def handle_youtube_music(m: Message, url: str):
                 media_type="Audio (YT Music)",
                 time_taken=_elapsed,
             ))
+            return sent.audio.file_id if sent and sent.audio else None
 
     except asyncio.CancelledError:
         raise
@@ -569,10 +1040,10 @@ async def handle_youtube_music(m: Message, url: str):
 
 # ─── Shorts handler ───────────────────────────────────────────────────────────
 
-async def handle_youtube_short(m: Message, url: str):
+async def handle_youtube_short(m: Message, url: str) -> Optional[str]:
     """
     YouTube Shorts — Silent: sticker → download → delete sticker → send → ✓ Delivered — <mention>
-    No progress messages.
+    No progress messages. Returns the sent video's file_id (None if nothing was delivered).
     """
     user_id = m.from_user.id
     first_name = m.from_user.first_name or "User"
@@ -581,23 +1052,6 @@ async def handle_youtube_short(m: Message, url: str):
     delivered_caption = build_safe_media_caption(user_id, first_name, delivered_emoji)
     _t_start = time.monotonic()
 
-    # Cache check
-    cached = await url_cache.get(url, "video")
-    if cached:
-        try:
-            sent = await _safe_send_video(
-                m.chat.id,
-                m.message_id,
-                video=cached,
-                caption=delivered_caption,
-                parse_mode="HTML",
-                supports_streaming=True,
-            )
-            if sent:
-                return
-        except Exception:
-            pass
-
     # Send sticker — no progress text message
     sticker_msg_id = await send_sticker(bot, m.chat.id, "youtube")
 
@@ -605,10 +1059,10 @@ async def handle_youtube_short(m: Message, url: str):
         with tempfile.TemporaryDirectory() as tmp_dir:
             tmp = Path(tmp_dir)
 
-            video_file = await download_youtube_video(
-                url, tmp,
-                fmt="bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
-            )
+            shorts_fmt = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best"
+            # Encode while downloading when the media URLs are directly readable
+            streamed = await _stream_video(url, tmp, shorts_fmt)
+            video_file = streamed or await download_youtube_video(url, tmp, fmt=shorts_fmt)
 
             if not video_file or not video_file.exists():
                 await delete_sticker(bot, m.chat.id, sticker_msg_id)
@@ -620,9 +1074,12 @@ async def handle_youtube_short(m: Message, url: str):
                 )
                 return
 
-            encoded = tmp / "short_enc.mp4"
-            ok = await reencode_shorts(video_file, encoded)
-            final = encoded if ok and encoded.exists() else video_file
+            if streamed:
+                final = streamed
+            else:
+                encoded = tmp / "short_enc.mp4"
+                ok = await reencode_shorts(video_file, encoded)
+                final = encoded if ok and encoded.exists() else video_file
 
             # Ensure fits Telegram
             final = await ensure_video_fits_telegram(final, tmp) or final
@@ -657,6 +1114,7 @@ async def handle_youtube_short(m: Message, url: str):
                 media_type="Video (Short)",
                 time_taken=_elapsed,
             ))
+            return sent.video.file_id if sent and sent.video else None
 
     except asyncio.CancelledError:
         raise
@@ -677,7 +1135,7 @@ async def handle_youtube_normal(m: Message, url: str):
     Normal YouTube video:
     1. Send sticker
     2. Show inline [🎥 Video] [🎧 Audio] buttons (minimal status — no progress bar)
-    3. Both streams download in background simultaneously
+    3. Video + audio stream download once in background (one slot)
     4. User taps → send when ready
     5. Delete sticker + status message after send
     6. Caption: ✓ Delivered — <mention>
@@ -728,9 +1186,11 @@ async def handle_youtube_normal(m: Message, url: str):
     video_future: asyncio.Future = loop.create_future()
     audio_future: asyncio.Future = loop.create_future()
 
-    _pending[job_key] = {
+    job = {
         "video_future": video_future,
         "audio_future": audio_future,
+        "cancel": threading.Event(),
+        "dl_state": {},
         "tmp_dir": tmp_dir_obj,
         "tmp": tmp,
         "url": url,
@@ -738,48 +1198,81 @@ async def handle_youtube_normal(m: Message, url: str):
         "user_id": user_id,
         "first_name": first_name,
         "status_id": status.message_id,
+        "keyboard": keyboard,
+        "key": job_key,
         "sticker_msg_id": sticker_msg_id,
         "original_msg_id": m.message_id,
         "created_at": time.time(),
     }
-
-    asyncio.create_task(_bg_download_video(job_key, url, tmp, video_future))
-    asyncio.create_task(_bg_download_audio(job_key, url, tmp, audio_future))
+    job["task"] = asyncio.create_task(_bg_download_streams(job))
+    _pending[job_key] = job
     asyncio.create_task(_cleanup_pending(job_key, delay=600))
 
-async def _bg_download_video(job_key: str, url: str, tmp: Path, future: asyncio.Future):
-    """Background video download"""
-    try:
-        async with download_semaphore:
-            video_file = await download_youtube_video(url, tmp)
-            if not future.done():
-                future.set_result(video_file)
-    except Exception as e:
-        logger.error(f"BG video error: {e}")
-        if not future.done():
-            future.set_result(None)
+async def _bg_download_streams(job: dict):
+    """
+    Background download for both buttons — one extraction, one slot.
+    video_future → merged MP4, audio_future → audio source (M4A copy / MP3 transcode on tap).
+    """
+    video_file = audio_source = None
+
+    async def _set_status(text: str) -> None:
+        # Picker still up (no button tapped yet) — keep its buttons
+        if _pending.get(job["key"]) is job:
+            await bot.edit_message_text(
+                text, chat_id=job["chat_id"], message_id=job["status_id"],
+                reply_markup=job["keyboard"], parse_mode="HTML",
+            )
+
+    async def _restore_status() -> None:
+        _yt = await get_emoji_async("YT")
+        await _set_status(f"{_yt} <b>𝐂𝐡𝐨𝐨𝐬𝐞 𝐅𝐨𝐫𝐦𝐚𝐭</b>")
 
-async def _bg_download_audio(job_key: str, url: str, tmp: Path, future: asyncio.Future):
-    """Background audio download"""
     try:
-        async with download_semaphore:
-            audio_file = await download_youtube_audio(url, tmp)
-            if not future.done():
-                future.set_result(audio_file)
+        cost, weight = estimate_cost(await _peek_info(job["url"]), "video")
+        ticket = download_scheduler.slot(job["user_id"], cost=cost)
+        async with _admitted(ticket, weight, _set_status, _restore_status):
+            if not job["cancel"].is_set():
+                job["dl_state"]["started"] = True
+                video_file, audio_source = await download_youtube_streams(
+                    job["url"], job["tmp"], cancel=job["cancel"], state=job["dl_state"],
+                )
     except Exception as e:
-        logger.error(f"BG audio error: {e}")
-        if not future.done():
-            future.set_result(None)
+        logger.error(f"BG download error: {e}")
+    finally:
+        if not job["video_future"].done():
+            job["video_future"].set_result(video_file)
+        if not job["audio_future"].done():
+            job["audio_future"].set_result(audio_source)
+
+def _abort_download(job: dict) -> None:
+    """Stop a job's background download: drop it from the queue, or abort yt-dlp mid-transfer"""
+    job["cancel"].set()
+    task = job.get("task")
+    if task and not task.done() and not job["dl_state"].get("started"):
+        task.cancel()
+
+def _release_job(job: dict) -> None:
+    """Abort the job's download and free its temp dir once the download has stopped"""
+    _abort_download(job)
+
+    def _cleanup(_=None):
+        try:
+            job["tmp_dir"].cleanup()
+        except Exception:
+            pass
+
+    task = job.get("task")
+    if task and not task.done():
+        task.add_done_callback(_cleanup)
+    else:
+        _cleanup()
 
 async def _cleanup_pending(job_key: str, delay: int = 600):
-    """Clean up pending job after timeout"""
+    """Release a job nobody tapped within `delay` seconds"""
     await asyncio.sleep(delay)
     job = _pending.pop(job_key, None)
     if job:
-        try:
-            job["tmp_dir"].cleanup()
-        except Exception:
-            pass
+        _release_job(job)
 
 # ─── Callback handlers ────────────────────────────────────────────────────────
 
@@ -787,7 +1280,8 @@ async def _cleanup_pending(job_key: str, delay: int = 600):
 async def cb_yt_video(callback: CallbackQuery):
     """Video button tap"""
     job_key = callback.data.split(":", 1)[1]
-    job = _pending.get(job_key)
+    # Pop — the picker is deleted below, so a job serves exactly one tap
+    job = _pending.pop(job_key, None)
 
     if not job:
         await callback.answer("Session expired. Send the link again.", show_alert=True)
@@ -812,24 +1306,20 @@ async def cb_yt_video(callback: CallbackQuery):
         pass
     await delete_sticker(bot, chat_id, sticker_msg_id)
 
-    # Cache check
-    cached = await url_cache.get(url, "video")
-    if cached:
-        try:
-            sent = await _safe_send_video(
-                chat_id,
-                original_msg_id,
-                video=cached,
-                caption=delivered_caption,
-                parse_mode="HTML",
-                supports_streaming=True,
-            )
-            if sent:
+    flight = None
+    try:
+        # Cache check
+        if await _send_cached(chat_id, original_msg_id, url, "video", delivered_caption):
+            return
+
+        # Another job is already preparing this video — wait, then reuse its outcome
+        flight = await singleflight.join(url, "video")
+        if not flight.leader:
+            if await _send_flight(chat_id, original_msg_id, flight, "video", delivered_caption):
+                return
+            if await _send_cached(chat_id, original_msg_id, url, "video", delivered_caption):
                 return
-        except Exception:
-            pass
 
-    try:
         try:
             video_file = await asyncio.wait_for(
                 asyncio.shield(job["video_future"]),
@@ -845,6 +1335,7 @@ async def cb_yt_video(callback: CallbackQuery):
             return
 
         if not video_file or not video_file.exists():
+            flight.fail(negative_cache.get(url))
             _err = await get_emoji_async("ERROR")
             await bot.send_message(
                 chat_id,
@@ -872,6 +1363,7 @@ async def cb_yt_video(callback: CallbackQuery):
         )
         if sent and sent.video:
             await url_cache.set(url, "video", sent.video.file_id)
+            flight.succeed(sent.video.file_id)
 
         logger.info(f"YT VIDEO: Sent to {user_id}")
 
@@ -895,13 +1387,18 @@ async def cb_yt_video(callback: CallbackQuery):
             )
         except Exception:
             pass
+    finally:
+        if flight:
+            flight.release()
+        _release_job(job)
 
 
 @dp.callback_query(lambda c: c.data and c.data.startswith("yt_audio:"))
 async def cb_yt_audio(callback: CallbackQuery):
     """Audio button tap"""
     job_key = callback.data.split(":", 1)[1]
-    job = _pending.get(job_key)
+    # Pop — the picker is deleted below, so a job serves exactly one tap
+    job = _pending.pop(job_key, None)
 
     if not job:
         await callback.answer("Session expired. Send the link again.", show_alert=True)
@@ -926,25 +1423,30 @@ async def cb_yt_audio(callback: CallbackQuery):
         pass
     await delete_sticker(bot, chat_id, sticker_msg_id)
 
-    # Cache check
-    cached = await url_cache.get(url, "audio")
-    if cached:
-        try:
-            sent = await _safe_send_audio(
-                chat_id,
-                original_msg_id,
-                audio=cached,
-                caption=delivered_caption,
-                parse_mode="HTML",
-            )
-            if sent:
+    flight = None
+    try:
+        # Cache check
+        if await _send_cached(chat_id, original_msg_id, url, "audio", delivered_caption):
+            return
+
+        # Another job is already preparing this audio — wait, then reuse its outcome
+        flight = await singleflight.join(url, "audio")
+        if not flight.leader:
+            if await _send_flight(chat_id, original_msg_id, flight, "audio", delivered_caption):
+                return
+            if await _send_cached(chat_id, original_msg_id, url, "audio", delivered_caption):
                 return
-        except Exception:
-            pass
 
-    try:
+        audio_file = None
+        if not job["audio_future"].done() and not job["dl_state"].get("streams_done"):
+            # Still on the video stream — abort it and fetch audio only
+            _abort_download(job)
+            await asyncio.wait({job["task"]})
+            async with download_scheduler.slot(job["user_id"]):
+                audio_file = await download_youtube_audio(url, job["tmp"])
+
         try:
-            audio_file = await asyncio.wait_for(
+            audio_source = await asyncio.wait_for(
                 asyncio.shield(job["audio_future"]),
                 timeout=config.DOWNLOAD_TIMEOUT,
             )
@@ -957,7 +1459,11 @@ async def cb_yt_audio(callback: CallbackQuery):
             )
             return
 
+        if not audio_file and audio_source and audio_source.exists():
+            audio_file = await audio_from_stream(audio_source, job["tmp"])
+
         if not audio_file or not audio_file.exists():
+            flight.fail(negative_cache.get(url))
             _err = await get_emoji_async("ERROR")
             await bot.send_message(
                 chat_id,
@@ -976,6 +1482,7 @@ async def cb_yt_audio(callback: CallbackQuery):
 
         if sent and sent.audio:
             await url_cache.set(url, "audio", sent.audio.file_id)
+            flight.succeed(sent.audio.file_id)
 
         logger.info(f"YT AUDIO: Sent to {user_id}")
 
@@ -999,11 +1506,15 @@ async def cb_yt_audio(callback: CallbackQuery):
             )
         except Exception:
             pass
+    finally:
+        if flight:
+            flight.release()
+        _release_job(job)
 
 # ─── YouTube Playlist handler ─────────────────────────────────────────────────
 
-# Semaphore: max 1 concurrent playlist job
-_playlist_semaphore = asyncio.Semaphore(1)
+# Max 1 concurrent playlist job, users served round robin
+_playlist_scheduler = FairScheduler("yt playlist", 1)
 
 # Pending playlist jobs store
 _playlist_pending: dict = {}
@@ -1028,7 +1539,7 @@ async def _get_playlist_info(url: str) -> dict:
             "no_warnings": True,
             "extract_flat": True,
             "playlistend": 200,  # limit to 200 items
-            "proxy": config.pick_proxy(),
+            "proxy": proxy_pool.pick(),
             "http_headers": {"User-Agent": config.pick_user_agent()},
             "socket_timeout": 30,
             "ignoreerrors": True,  # skip unavailable entries, don't abort
@@ -1036,7 +1547,7 @@ async def _get_playlist_info(url: str) -> dict:
 
         # Use correct cookie folder based on URL type
         if is_yt_music_url:
-            cookie_file = get_random_cookie(config.YT_MUSIC_COOKIES_FOLDER)
+            cookie_file = cookie_pool.pick(config.YT_MUSIC_COOKIES_FOLDER)
             if cookie_file:
                 opts["cookiefile"] = cookie_file
                 logger.info(f"YT PLAYLIST INFO: Using YT Music cookie: {cookie_file}")
@@ -1047,7 +1558,7 @@ async def _get_playlist_info(url: str) -> dict:
                 "youtube": {"player_client": ["android_music", "web"]}
             }
         else:
-            cookie_file = get_random_cookie(config.YT_COOKIES_FOLDER)
+            cookie_file = cookie_pool.pick(config.YT_COOKIES_FOLDER)
             if cookie_file:
                 opts["cookiefile"] = cookie_file
 
@@ -1055,7 +1566,21 @@ async def _get_playlist_info(url: str) -> dict:
             with YoutubeDL(opts) as ydl:
                 return ydl.extract_info(url, download=False)
 
-        info = await asyncio.to_thread(_extract)
+        cached = info_cache.get(url, flat=True)
+        if cached:
+            info = cached[0]
+        else:
+            started = time.monotonic()
+            try:
+                info = await asyncio.to_thread(_extract)
+            except Exception as e:
+                proxy_pool.report_error(opts["proxy"], str(e))
+                cookie_pool.report_error(opts.get("cookiefile"), str(e))
+                raise
+            if info:
+                proxy_pool.report_ok(opts["proxy"], latency=time.monotonic() - started)
+                cookie_pool.report_ok(opts.get("cookiefile"))
+                info_cache.set(url, info, opts["proxy"], flat=True)
         if not info:
             logger.warning(f"YT PLAYLIST INFO: yt-dlp returned None for {url[:80]}")
             return {}
@@ -1312,9 +1837,11 @@ async def _run_yt_playlist_audio(callback: CallbackQuery, job_key: str, job: dic
     Uses YT Music cookies when URL is from music.youtube.com.
     Sanitized caption per track via build_safe_media_caption().
     Single-track failure does NOT abort the playlist.
+    Tracks download PLAYLIST_PREFETCH ahead of the upload (music_scheduler
+    budget) and are delivered in playlist order.
     """
     import html as _html
-    async with _playlist_semaphore:
+    async with _playlist_scheduler.slot(job["user_id"], PRIORITY_PLAYLIST):
         chat_id = job["chat_id"]
         user_id = job["user_id"]
         first_name = job.get("first_name", "User")
@@ -1354,104 +1881,159 @@ async def _run_yt_playlist_audio(callback: CallbackQuery, job_key: str, job: dic
 
         sent_count = 0
         failed_count = 0
+        cache_hits = 0
         blocked = False
 
-        for i, entry in enumerate(entries):
-            if blocked:
-                break
+        # Cache format tag must match what the download path produces
+        audio_fmt = "audio192" if quality == "192" and not is_yt_music_playlist else "audio"
 
-            if not entry:
-                failed_count += 1
-                continue
+        async def _update_progress():
+            # Update progress every 5 items
+            total_done = sent_count + failed_count
+            if progress_msg and (total_done % 5 == 0 or total_done == total):
+                pct = min(100, int(total_done * 100 / total)) if total > 0 else 0
+                try:
+                    await progress_msg.edit_text(
+                        f"{_music} <b>𝐏ʟᴀʏʟɪꜱᴛ:</b> {playlist_name}\n\n{_bar(pct)}\n{total_done} / {total}",
+                        parse_mode="HTML",
+                    )
+                except Exception:
+                    pass
 
-            entry_url = entry.get("url") or entry.get("webpage_url")
-            if not entry_url:
-                # Try to construct URL from id
-                entry_id = entry.get("id")
-                if entry_id:
-                    # Use music.youtube.com URL for YT Music playlists
-                    if is_yt_music_playlist:
-                        entry_url = f"https://music.youtube.com/watch?v={entry_id}"
-                    else:
-                        entry_url = f"https://www.youtube.com/watch?v={entry_id}"
+        # Resolve entry URLs up front — entries without one count as failed
+        tracks: List[Tuple[dict, str]] = []
+        for entry in entries:
+            entry_url = entry.get("url") or entry.get("webpage_url") if entry else None
+            if entry and not entry_url and entry.get("id"):
+                # Use music.youtube.com URL for YT Music playlists
+                if is_yt_music_playlist:
+                    entry_url = f"https://music.youtube.com/watch?v={entry['id']}"
                 else:
-                    failed_count += 1
-                    continue
-
-            try:
-                with tempfile.TemporaryDirectory() as tmp_dir:
-                    tmp = Path(tmp_dir)
+                    entry_url = f"https://www.youtube.com/watch?v={entry['id']}"
+            if entry_url:
+                tracks.append((entry, entry_url))
+            else:
+                failed_count += 1
 
-                    # Use YT Music download path for music playlist entries
-                    if is_yt_music_playlist:
-                        audio_file = await download_youtube_audio(
-                            entry_url, tmp, is_music=True, quality="320"
+        async def _download(entry_url: str, tmp: Path) -> Optional[Path]:
+            # Use YT Music download path for music playlist entries
+            if is_yt_music_playlist:
+                return await download_youtube_audio(entry_url, tmp, is_music=True, quality="320")
+            if quality == "hires" or quality == "320":
+                # An explicit high-bitrate pick gets the MP3 it asked for
+                return await download_youtube_audio(entry_url, tmp, quality="320", native=False)
+            return await download_youtube_audio_192k(entry_url, tmp)  # 192k fast
+
+        async def _fetch(track: Tuple[dict, str], tmp: Path, slot):
+            # Cache hit → file_id, no download slot taken
+            cached = await url_cache.get(track[1], audio_fmt)
+            if cached:
+                return cached
+            async with slot:
+                return await _download(track[1], tmp)
+
+        # Downloads run PLAYLIST_PREFETCH tracks ahead; delivery stays in order
+        stream = ordered_prefetch(
+            tracks, _fetch, ahead=config.PLAYLIST_PREFETCH,
+            scheduler=music_scheduler, user_id=user_id,
+        )
+        try:
+            async for i, (entry, entry_url), result, tmp in stream:
+                if isinstance(result, str):
+                    try:
+                        await bot.send_audio(
+                            user_id,
+                            result,
+                            caption=track_caption,
+                            parse_mode="HTML",
                         )
-                    elif quality == "hires" or quality == "320":
-                        audio_file = await download_youtube_audio(entry_url, tmp, quality="320")
-                    else:  # 192k fast
-                        audio_file = await download_youtube_audio_192k(entry_url, tmp)
-
-                    if not audio_file or not audio_file.exists():
-                        failed_count += 1
-                        logger.warning(f"YT PLAYLIST AUDIO: Track {i+1}/{total} failed: {entry_url[:60]}")
-                    else:
+                        sent_count += 1
+                        cache_hits += 1
+                        logger.info(f"YT PLAYLIST AUDIO: Sent (cached) {sent_count}/{total}")
+                        await _update_progress()
+                        continue
+                    except TelegramForbiddenError:
+                        logger.error(f"User {user_id} blocked bot")
+                        blocked = True
+                        break
+                    except Exception as e:
+                        logger.debug(f"YT PLAYLIST AUDIO: Cached send failed, re-downloading: {e}")
+                        await url_cache.invalidate(entry_url, audio_fmt)
                         try:
-                            await bot.send_audio(
-                                user_id,
-                                FSInputFile(audio_file),
-                                title=entry.get("title") or audio_file.stem,
-                                caption=track_caption,
-                                parse_mode="HTML",
+                            async with music_scheduler.slot(user_id, PRIORITY_PLAYLIST):
+                                result = await _download(entry_url, tmp)
+                        except Exception as e2:
+                            logger.error(f"YT PLAYLIST AUDIO: Track {i+1} error: {e2}", exc_info=True)
+                            result = None
+
+                audio_file = result
+                if not audio_file or not audio_file.exists():
+                    failed_count += 1
+                    logger.warning(f"YT PLAYLIST AUDIO: Track {i+1}/{len(tracks)} failed: {entry_url[:60]}")
+                else:
+                    sent = None
+                    try:
+                        sent = await bot.send_audio(
+                            user_id,
+                            FSInputFile(audio_file),
+                            title=entry.get("title") or audio_file.stem,
+                            caption=track_caption,
+                            parse_mode="HTML",
+                        )
+                        sent_count += 1
+                        logger.info(f"YT PLAYLIST AUDIO: Sent {sent_count}/{total}")
+                    except TelegramForbiddenError:
+                        logger.error(f"User {user_id} blocked bot")
+                        blocked = True
+                        break
+                    except Exception as _send_err:
+                        _err_str = str(_send_err).lower()
+                        if "entity_text_invalid" in _err_str or "bad request" in _err_str:
+                            # Retry once without caption
+                            logger.warning(
+                                f"YT PLAYLIST AUDIO: ENTITY_TEXT_INVALID for track {i+1}, "
+                                f"retrying without caption"
                             )
-                            sent_count += 1
-                            logger.info(f"YT PLAYLIST AUDIO: Sent {sent_count}/{total}")
-                        except TelegramForbiddenError:
-                            logger.error(f"User {user_id} blocked bot")
-                            blocked = True
-                            break
-                        except Exception as _send_err:
-                            _err_str = str(_send_err).lower()
-                            if "entity_text_invalid" in _err_str or "bad request" in _err_str:
-                                # Retry once without caption
-                                logger.warning(
-                                    f"YT PLAYLIST AUDIO: ENTITY_TEXT_INVALID for track {i+1}, "
-                                    f"retrying without caption"
+                            try:
+                                sent = await bot.send_audio(
+                                    user_id,
+                                    FSInputFile(audio_file),
+                                    title=entry.get("title") or audio_file.stem,
                                 )
-                                try:
-                                    await bot.send_audio(
-                                        user_id,
-                                        FSInputFile(audio_file),
-                                        title=entry.get("title") or audio_file.stem,
-                                    )
-                                    sent_count += 1
-                                    logger.info(f"YT PLAYLIST AUDIO: Sent (no caption) {sent_count}/{total}")
-                                except TelegramForbiddenError:
-                                    logger.error(f"User {user_id} blocked bot")
-                                    blocked = True
-                                    break
-                                except Exception as e2:
-                                    logger.error(f"YT PLAYLIST AUDIO: Send retry failed: {e2}")
-                                    failed_count += 1
-                            else:
-                                logger.error(f"YT PLAYLIST AUDIO: Send failed: {_send_err}")
+                                sent_count += 1
+                                logger.info(f"YT PLAYLIST AUDIO: Sent (no caption) {sent_count}/{total}")
+                            except TelegramForbiddenError:
+                                logger.error(f"User {user_id} blocked bot")
+                                blocked = True
+                                break
+                            except Exception as e2:
+                                logger.error(f"YT PLAYLIST AUDIO: Send retry failed: {e2}")
                                 failed_count += 1
+                        else:
+                            logger.error(f"YT PLAYLIST AUDIO: Send failed: {_send_err}")
+                            failed_count += 1
 
-            except Exception as e:
-                logger.error(f"YT PLAYLIST AUDIO: Track {i+1} error: {e}", exc_info=True)
-                failed_count += 1
+                    if sent and sent.audio:
+                        await url_cache.set(entry_url, audio_fmt, sent.audio.file_id)
 
-            # Update progress every 5 items
-            total_done = sent_count + failed_count
-            if progress_msg and (total_done % 5 == 0 or total_done == total):
-                pct = min(100, int(total_done * 100 / total)) if total > 0 else 0
+                await _update_progress()
+        finally:
+            await stream.aclose()
+
+        if blocked:
+            await user_state_manager.mark_user_blocked(user_id)
+            await user_state_manager.apply_cooldown(user_id)
+            if progress_msg:
+                _err = await get_emoji_async("ERROR")
                 try:
                     await progress_msg.edit_text(
-                        f"{_music} <b>𝐏ʟᴀʏʟɪꜱᴛ:</b> {playlist_name}\n\n{_bar(pct)}\n{total_done} / {total}",
+                        f"{_err} <b>𝐁𝐨𝐭 𝐁𝐥𝐨𝐜𝐤𝐞𝐝</b> — cooldown applied.",
                         parse_mode="HTML",
                     )
                 except Exception:
                     pass
+            logger.info(f"YT PLAYLIST AUDIO: Stopped — user blocked the bot after {sent_count} sent")
+            return
 
         # Show completion
         if progress_msg:
@@ -1486,7 +2068,10 @@ async def _run_yt_playlist_audio(callback: CallbackQuery, job_key: str, job: dic
         except Exception:
             pass
 
-        logger.info(f"YT PLAYLIST AUDIO: Done — {sent_count} sent, {failed_count} failed")
+        logger.info(
+            f"YT PLAYLIST AUDIO: Done — {sent_count} sent ({cache_hits} from cache), "
+            f"{failed_count} failed"
+        )
 
         # Log to channel
         asyncio.create_task(log_download(
@@ -1505,7 +2090,7 @@ async def _run_yt_playlist_video(callback: CallbackQuery, job_key: str, job: dic
     Download YouTube playlist as video and send to DM.
     """
     import html as _html
-    async with _playlist_semaphore:
+    async with _playlist_scheduler.slot(job["user_id"], PRIORITY_PLAYLIST):
         chat_id = job["chat_id"]
         user_id = job["user_id"]
         playlist_name = _html.escape(str(job["playlist_name"] or "Playlist")[:40])
@@ -1538,6 +2123,21 @@ async def _run_yt_playlist_video(callback: CallbackQuery, job_key: str, job: dic
 
         sent_count = 0
         failed_count = 0
+        cache_hits = 0
+        video_fmt = f"video{height}"
+
+        async def _update_progress():
+            # Update progress every 5 items
+            total_done = sent_count + failed_count
+            if progress_msg and (total_done % 5 == 0 or total_done == total):
+                pct = min(100, int(total_done * 100 / total)) if total > 0 else 0
+                try:
+                    await progress_msg.edit_text(
+                        f"{_yt} <b>𝐏ʟᴀʏʟɪꜱᴛ:</b> {playlist_name}\n\n{_bar(pct)}\n{total_done} / {total}",
+                        parse_mode="HTML",
+                    )
+                except Exception:
+                    pass
 
         for i, entry in enumerate(entries):
             if not entry:
@@ -1553,11 +2153,33 @@ async def _run_yt_playlist_video(callback: CallbackQuery, job_key: str, job: dic
                     failed_count += 1
                     continue
 
+            # Cache check — send by file_id, skip yt-dlp entirely
+            cached = await url_cache.get(entry_url, video_fmt)
+            if cached:
+                try:
+                    await bot.send_video(
+                        user_id,
+                        cached,
+                        supports_streaming=True,
+                    )
+                    sent_count += 1
+                    cache_hits += 1
+                    logger.info(f"YT PLAYLIST VIDEO: Sent (cached) {sent_count}/{total}")
+                    await _update_progress()
+                    continue
+                except TelegramForbiddenError:
+                    logger.error(f"User {user_id} blocked bot")
+                    break
+                except Exception as e:
+                    logger.debug(f"YT PLAYLIST VIDEO: Cached send failed, re-downloading: {e}")
+                    await url_cache.invalidate(entry_url, video_fmt)
+
             try:
                 with tempfile.TemporaryDirectory() as tmp_dir:
                     tmp = Path(tmp_dir)
 
-                    video_file = await download_youtube_video_quality(entry_url, tmp, height=height)
+                    async with download_scheduler.slot(user_id, PRIORITY_PLAYLIST):
+                        video_file = await download_youtube_video_quality(entry_url, tmp, height=height)
 
                     if not video_file or not video_file.exists():
                         failed_count += 1
@@ -1568,7 +2190,7 @@ async def _run_yt_playlist_video(callback: CallbackQuery, job_key: str, job: dic
                         info = await get_video_info(final_video)
 
                         try:
-                            await bot.send_video(
+                            sent = await bot.send_video(
                                 user_id,
                                 FSInputFile(final_video),
                                 title=entry.get("title") or "",
@@ -1579,6 +2201,8 @@ async def _run_yt_playlist_video(callback: CallbackQuery, job_key: str, job: dic
                             )
                             sent_count += 1
                             logger.info(f"YT PLAYLIST VIDEO: Sent {sent_count}/{total}")
+                            if sent and sent.video:
+                                await url_cache.set(entry_url, video_fmt, sent.video.file_id)
                         except TelegramForbiddenError:
                             logger.error(f"User {user_id} blocked bot")
                             break
@@ -1590,17 +2214,7 @@ async def _run_yt_playlist_video(callback: CallbackQuery, job_key: str, job: dic
                 logger.error(f"YT PLAYLIST VIDEO: Item {i+1} error: {e}", exc_info=True)
                 failed_count += 1
 
-            # Update progress every 5 items
-            total_done = sent_count + failed_count
-            if progress_msg and (total_done % 5 == 0 or total_done == total):
-                pct = min(100, int(total_done * 100 / total)) if total > 0 else 0
-                try:
-                    await progress_msg.edit_text(
-                        f"{_yt} <b>𝐏ʟᴀʏʟɪꜱᴛ:</b> {playlist_name}\n\n{_bar(pct)}\n{total_done} / {total}",
-                        parse_mode="HTML",
-                    )
-                except Exception:
-                    pass
+            await _update_progress()
 
         # Show completion
         if progress_msg:
@@ -1635,7 +2249,10 @@ async def _run_yt_playlist_video(callback: CallbackQuery, job_key: str, job: dic
         except Exception:
             pass
 
-        logger.info(f"YT PLAYLIST VIDEO: Done — {sent_count} sent, {failed_count} failed")
+        logger.info(
+            f"YT PLAYLIST VIDEO: Done — {sent_count} sent ({cache_hits} from cache), "
+            f"{failed_count} failed"
+        )
 
         # Log to channel
         asyncio.create_task(log_download(
@@ -1651,6 +2268,53 @@ async def _run_yt_playlist_video(callback: CallbackQuery, job_key: str, job: dic
 
 # ─── Main entry point ─────────────────────────────────────────────────────────
 
+async def _run_single(m: Message, url: str, fmt: str, handler) -> None:
+    """
+    Run a single-media handler (Shorts / YT Music):
+    cache → singleflight → cost-weighted download_scheduler slot → handler.
+    Followers wait for the leader, then reuse its file_id (or its failure)
+    without taking a slot. The handler returns the file_id it sent; without
+    one, only a negative-cached failure class is published — otherwise
+    followers download for themselves.
+    """
+    delivered_emoji = await get_emoji_async("DELIVERED")
+    caption = build_safe_media_caption(m.from_user.id, m.from_user.first_name or "User", delivered_emoji)
+    if await _send_cached(m.chat.id, m.message_id, url, fmt, caption):
+        return
+
+    flight = await singleflight.join(url, fmt)
+    try:
+        if not flight.leader:
+            if await _send_flight(m.chat.id, m.message_id, flight, fmt, caption):
+                return
+            if await _send_cached(m.chat.id, m.message_id, url, fmt, caption):
+                return
+            if await _fail_fast(m, url):
+                return
+        # Shorts are light by definition — only audio is worth a cost peek
+        info = await _peek_info(url) if fmt.startswith("audio") else None
+        cost, weight = estimate_cost(info, "audio" if fmt.startswith("audio") else "video")
+        notice: List[Message] = []
+
+        async def _show(text: str) -> None:
+            sent = await _safe_reply_text(m, text, parse_mode="HTML")
+            if sent:
+                notice.append(sent)
+
+        async def _clear() -> None:
+            for msg in notice:
+                await msg.delete()
+
+        async with _admitted(download_scheduler.slot(m.from_user.id, cost=cost), weight, _show, _clear):
+            file_id = await handler(m, url)
+        if file_id:
+            flight.succeed(file_id)
+        else:
+            flight.fail(negative_cache.get(url))
+    finally:
+        flight.release()
+
+
 async def handle_youtube(m: Message, url: str):
     """Route YouTube URL to appropriate handler"""
     if not await acquire_user_slot(m.from_user.id, config.MAX_CONCURRENT_PER_USER):
@@ -1666,12 +2330,14 @@ async def handle_youtube(m: Message, url: str):
         return
 
     try:
+        # Known-bad video — fail fast without taking a download slot
+        if not is_youtube_playlist(url) and await _fail_fast(m, url):
+            return
+
         if is_youtube_music(url):
-            async with download_semaphore:
-                await handle_youtube_music(m, url)
+            await _run_single(m, url, "audio", handle_youtube_music)
         elif is_youtube_short(url):
-            async with download_semaphore:
-                await handle_youtube_short(m, url)
+            await _run_single(m, url, "video", handle_youtube_short)
         elif is_youtube_playlist(url):
             await handle_youtube_playlist(m, url)
         else:
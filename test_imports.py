@@ -27,10 +27,10 @@ except ImportError as e:
 
 try:
     print("✓ Testing workers imports...")
-    from workers import download_semaphore, music_semaphore, spotify_semaphore
-    print("  ✓ workers.download_semaphore")
-    print("  ✓ workers.music_semaphore")
-    print("  ✓ workers.spotify_semaphore")
+    from workers import download_scheduler, music_scheduler, spotify_scheduler
+    print("  ✓ workers.download_scheduler")
+    print("  ✓ workers.music_scheduler")
+    print("  ✓ workers.spotify_scheduler")
 except ImportError as e:
     print(f"  ✗ workers imports failed: {e}")
     exit(1)
@@ -0,0 +1,13 @@
+"""
+Shared pytest setup.
+
+core.bot builds the aiogram Bot at import time, and it rejects a malformed
+token. A dummy token in the right shape lets the modules under test import.
+It is never used to talk to Telegram.
+"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("BOT_TOKEN", "123456:test-token-not-used")
@@ -0,0 +1,34 @@
+"""_plan_cuts: greedy keyframe cuts for split_video, on hand-built packet scans"""
+from utils.media_processor import _plan_cuts
+
+INF = float("inf")
+
+
+def test_fits_in_one_part():
+    assert _plan_cuts([(0.0, 0), (1.0, 10), (INF, 20)], budget=30) == []
+
+
+def test_cuts_at_last_keyframe_within_budget():
+    # A keyframe every second, 10 bytes per second, 100 bytes in total
+    keyframes = [(float(t), t * 10) for t in range(10)] + [(INF, 100)]
+    assert _plan_cuts(keyframes, budget=35) == [3.0, 6.0, 9.0]
+
+
+def test_oversized_keyframe_interval_becomes_its_own_part():
+    # 1s → 2s holds 90 bytes: more than the budget, and stream copy can't cut inside it
+    keyframes = [(0.0, 0), (1.0, 10), (2.0, 100), (3.0, 110), (INF, 120)]
+    assert _plan_cuts(keyframes, budget=30) == [1.0, 2.0]
+
+
+def test_oversized_first_interval():
+    assert _plan_cuts([(0.0, 0), (5.0, 100), (INF, 110)], budget=30) == [5.0]
+
+
+def test_oversized_tail_is_not_cut():
+    # Nothing after the last keyframe to cut at — the tail stays one part
+    assert _plan_cuts([(0.0, 0), (1.0, 10), (INF, 100)], budget=30) == [1.0]
+
+
+def test_never_cuts_at_zero():
+    # Audio packets ahead of the first video keyframe push it past the budget
+    assert _plan_cuts([(0.0, 50), (1.0, 60), (INF, 70)], budget=30) == []
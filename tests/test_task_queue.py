@@ -0,0 +1,125 @@
+"""FairScheduler: priority classes, per-user round robin, promote, position, backfill"""
+import asyncio
+
+from workers.task_queue import (
+    FairScheduler, PRIORITY_SINGLE, PRIORITY_PLAYLIST, PRIORITY_PREFETCH,
+)
+
+
+async def _hold(scheduler: FairScheduler, cost: float = 1.0):
+    """Take capacity so that later tickets queue"""
+    ticket = scheduler.slot(user_id=0, cost=cost)
+    await ticket.__aenter__()
+    return ticket
+
+
+async def _enqueue(ticket, label: str, order: list) -> asyncio.Task:
+    async def run():
+        async with ticket:
+            order.append(label)
+
+    task = asyncio.create_task(run())
+    await asyncio.sleep(0)  # let it reach the queue before the next one
+    return task
+
+
+async def _drain(blocker, tasks) -> None:
+    await blocker.__aexit__(None, None, None)
+    await asyncio.gather(*tasks)
+
+
+def test_round_robin_alternates_users():
+    async def scenario():
+        scheduler = FairScheduler("test", 1)
+        blocker = await _hold(scheduler)
+        order = []
+        tasks = [await _enqueue(scheduler.slot(1), f"a{i}", order) for i in range(3)]
+        tasks.append(await _enqueue(scheduler.slot(2), "b0", order))
+        await _drain(blocker, tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["a0", "b0", "a1", "a2"]
+
+
+def test_priority_class_beats_arrival_order():
+    async def scenario():
+        scheduler = FairScheduler("test", 1)
+        blocker = await _hold(scheduler)
+        order = []
+        tasks = [
+            await _enqueue(scheduler.slot(1, PRIORITY_PREFETCH), "prefetch", order),
+            await _enqueue(scheduler.slot(2, PRIORITY_PLAYLIST), "playlist", order),
+            await _enqueue(scheduler.slot(3, PRIORITY_SINGLE), "single", order),
+        ]
+        await _drain(blocker, tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["single", "playlist", "prefetch"]
+
+
+def test_promote_moves_waiting_ticket_ahead():
+    async def scenario():
+        scheduler = FairScheduler("test", 1)
+        blocker = await _hold(scheduler)
+        order = []
+        playlist = scheduler.slot(1, PRIORITY_PLAYLIST)
+        prefetch = scheduler.slot(2, PRIORITY_PREFETCH)
+        tasks = [
+            await _enqueue(playlist, "playlist", order),
+            await _enqueue(prefetch, "prefetch", order),
+        ]
+        prefetch.promote(PRIORITY_SINGLE)
+        assert prefetch.priority == PRIORITY_SINGLE
+        await _drain(blocker, tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["prefetch", "playlist"]
+
+
+def test_position_counts_round_robin_order():
+    async def scenario():
+        scheduler = FairScheduler("test", 1)
+        blocker = await _hold(scheduler)
+        order = []
+        a0, a1, b0 = scheduler.slot(1), scheduler.slot(1), scheduler.slot(2)
+        tasks = [await _enqueue(t, label, order) for t, label in ((a0, "a0"), (a1, "a1"), (b0, "b0"))]
+        positions = (blocker.position(), a0.position(), b0.position(), a1.position())
+        assert scheduler.slot(3).position() is None
+        await _drain(blocker, tasks)
+        return positions
+
+    assert asyncio.run(scenario()) == (0, 1, 2, 3)
+
+
+def test_light_ticket_backfills_past_heavy_head():
+    async def scenario():
+        scheduler = FairScheduler("test", 2)
+        blocker = await _hold(scheduler, cost=1.0)
+        order = []
+        heavy, light = scheduler.slot(1, cost=2.0), scheduler.slot(2, cost=1.0)
+        heavy_task = await _enqueue(heavy, "heavy", order)
+        light_task = await _enqueue(light, "light", order)
+        await light_task
+        assert not heavy.granted
+        await _drain(blocker, [heavy_task])
+        return order, scheduler.stats()["backfilled"]
+
+    order, backfilled = asyncio.run(scenario())
+    assert order == ["light", "heavy"]
+    assert backfilled == 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = FairScheduler("test", 1)
+        blocker = await _hold(scheduler)
+        order = []
+        gone = await _enqueue(scheduler.slot(1), "gone", order)
+        kept = await _enqueue(scheduler.slot(2), "kept", order)
+        gone.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.waiting() == 1
+        await _drain(blocker, [kept])
+        return order, scheduler.running()
+
+    assert asyncio.run(scenario()) == (["kept"], 0)
@@ -8,7 +8,7 @@ from .formatting import (
     quoted_block, styled_text, premium_panel,
     # Download status
     format_delivered, format_downloading, format_progress, format_processing,
-    format_error,
+    format_error, format_queued,
     # Welcome / help
     format_welcome, format_help_video, format_help_music, format_help_info,
     # User info
@@ -30,7 +30,7 @@ __all__ = [
     'mono', 'bold', 'code_panel',
     'quoted_block', 'styled_text', 'premium_panel',
     'format_delivered', 'format_downloading', 'format_progress', 'format_processing',
-    'format_error',
+    'format_error', 'format_queued',
     'format_welcome', 'format_help_video', 'format_help_music', 'format_help_info',
     'format_user_info', 'format_id', 'format_chatid', 'format_myinfo',
     'format_admin_panel', 'format_status',
@@ -241,6 +241,17 @@ async def format_progress(pct: int, label: str = "𝐅ᴇᴛᴄʜɪɴɢ 𝐅ɪʟ
     return _h(f"{dl} 𝐃ᴏᴡɴʟᴏᴀᴅɪɴɢ\n\n[{bar}] {pct}%\n{label}")
 
 
+async def format_queued(position: int, wait_s: float, weight: str = "") -> str:
+    """Admission notice — job is waiting for download capacity"""
+    load = await get_emoji_async("LOADING")
+    if wait_s >= 60:
+        wait = f"~{int(wait_s // 60)}m {int(wait_s % 60)}s"
+    else:
+        wait = f"~{max(1, int(wait_s))}s"
+    note = "\n𝐋ᴀʀɢᴇ ꜰɪʟᴇ — ꜱʜᴏʀᴛ ᴊᴏʙꜱ ɢᴏ ꜰɪʀꜱᴛ" if weight == "heavy" else ""
+    return _h(f"{load} 𝐐ᴜᴇᴜᴇᴅ · #{position}\n𝐄ꜱᴛ. ᴡᴀɪᴛ {wait}{note}")
+
+
 async def format_delivered() -> str:
     """Plain delivery confirmation"""
     emoji = await get_emoji_async("SUCCESS")
@@ -449,6 +460,8 @@ async def format_admin_panel(stats: dict = None) -> str:
         "/broadcast — 𝐒ᴇɴᴅ ᴛᴏ ᴀʟʟ\n"
         "/assign — 𝐂ᴏɴꜰɪɢᴜʀᴇ ᴇᴍᴏᴊɪ\n"
         "/stats — 𝐔ꜱᴇʀ ꜱᴛᴀᴛꜱ\n"
+        "/perf — 𝐏ᴇʀꜰᴏʀᴍᴀɴᴄᴇ\n"
+        "/layers — 𝐋ᴀʏᴇʀ 𝐎ʀᴅᴇʀ\n"
     )
     if stats:
         text += (
@@ -661,6 +674,23 @@ async def format_stats(users: int, groups: int) -> str:
     )
 
 
+async def format_perf(sections: dict, title: str = "𝐏ᴇʀꜰᴏʀᴍᴀɴᴄᴇ") -> str:
+    """
+    Admin performance panel.
+    sections: {"Title": {"metric": value, ...}, ...} — one code panel each.
+    """
+    zap = await get_emoji_async("ZAP")
+    parts = [f"{zap} {title}"]
+    for title, metrics in sections.items():
+        lines = [str(title), "---"]
+        if metrics:
+            lines += [f"{k}: {v}" for k, v in metrics.items()]
+        else:
+            lines.append("no data")
+        parts.append(code_panel(lines))
+    return _h("\n\n".join(parts))
+
+
 # ─── Legacy compat ────────────────────────────────────────────────────────────
 
 async def format_user_info(user: User) -> str:
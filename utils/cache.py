@@ -2,9 +2,17 @@
 URL Cache — SHA256-based instant re-delivery system.
 
 Strategy:
-  hash = SHA256(url + format_tag)
+  hash = SHA256(media_key(url) + format_tag)
+  media_key() collapses URL variants (youtu.be / watch?v= / shorts, igsh=
+  tracking params, ...) to one canonical media ID — see utils/media_id.py.
   If Telegram file_id cached → send instantly (no re-download, no re-encode).
-  Cache stored in Redis with 24h TTL.
+
+Tiers:
+  L1 — in-process LRU (bounded, short TTL) → no network round trip
+  L2 — Redis with 24h TTL → shared across restarts / instances
+  get():        L1 → L2 (L2 hit is promoted into L1)
+  set():        write-through to both tiers
+  invalidate(): drop from both tiers (stale file_id never lingers in L1)
 
 Usage:
     from utils.cache import url_cache
@@ -19,9 +27,13 @@ Usage:
     await url_cache.set(url, "video", sent_message.video.file_id)
 """
 import hashlib
-from typing import Optional
+import time
+from collections import OrderedDict
+from typing import Optional, Dict
+from core.config import config
 from utils.redis_client import redis_client
 from utils.logger import logger
+from utils.media_id import media_key
 
 # Cache TTL: 24 hours
 _CACHE_TTL = 86400
@@ -31,14 +43,57 @@ _PREFIX = "cache:fileid:"
 
 
 def _make_key(url: str, fmt: str) -> str:
-    """Deterministic cache key from URL + format tag"""
-    raw = f"{url}:{fmt}"
+    """Deterministic cache key from canonical media ID + format tag"""
+    raw = f"{media_key(url)}:{fmt}"
     h = hashlib.sha256(raw.encode()).hexdigest()[:32]
     return f"{_PREFIX}{h}"
 
 
+class _LocalLRU:
+    """Bounded in-process LRU with per-entry TTL"""
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if not entry:
+            return None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
 class URLCache:
-    """Telegram file_id cache backed by Redis"""
+    """Telegram file_id cache — in-process LRU in front of Redis"""
+
+    def __init__(self):
+        self._local = _LocalLRU(config.URL_CACHE_LOCAL_SIZE, config.URL_CACHE_LOCAL_TTL)
+        self._stats: Dict[str, int] = {
+            "l1_hit": 0, "l1_miss": 0,
+            "l2_hit": 0, "l2_miss": 0,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters per tier + current L1 size"""
+        return {**self._stats, "l1_size": len(self._local)}
 
     async def get(self, url: str, fmt: str) -> Optional[str]:
         """
@@ -47,9 +102,20 @@ class URLCache:
         """
         try:
             key = _make_key(url, fmt)
+            result = self._local.get(key)
+            if result:
+                self._stats["l1_hit"] += 1
+                logger.debug(f"Cache HIT (L1): {url[:50]} [{fmt}]")
+                return result
+            self._stats["l1_miss"] += 1
+
             result = await redis_client.get(key)
             if result:
-                logger.debug(f"Cache HIT: {url[:50]} [{fmt}]")
+                self._stats["l2_hit"] += 1
+                self._local.set(key, result)
+                logger.debug(f"Cache HIT (L2): {url[:50]} [{fmt}]")
+            else:
+                self._stats["l2_miss"] += 1
             return result
         except Exception as e:
             logger.debug(f"Cache get error: {e}")
@@ -62,6 +128,7 @@ class URLCache:
         """
         try:
             key = _make_key(url, fmt)
+            self._local.set(key, file_id)
             ok = await redis_client.setex(key, _CACHE_TTL, file_id)
             if ok:
                 logger.debug(f"Cache SET: {url[:50]} [{fmt}]")
@@ -71,9 +138,11 @@ class URLCache:
             return False
 
     async def invalidate(self, url: str, fmt: str) -> bool:
-        """Remove cached entry"""
+        """Remove cached entry from both tiers"""
         try:
             key = _make_key(url, fmt)
+            self._local.delete(key)
+            logger.debug(f"Cache INVALIDATE: {url[:50]} [{fmt}]")
             return await redis_client.delete(key)
         except Exception:
             return False
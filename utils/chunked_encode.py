@@ -0,0 +1,215 @@
+"""
+Chunked encode — re-encode long videos as parallel keyframe chunks.
+
+One libx264 process over a 40-minute video regularly runs past
+FFMPEG_TIMEOUT and the whole job fails. For videos of at least
+CHUNKED_ENCODE_MIN_DURATION seconds, ensure_video_fits_telegram uses this
+instead:
+
+  1. split    one stream-copy segment pass cuts the video track at the
+              keyframes nearest duration × i/N (no re-encode, no seek drift)
+  2. plan     the target bitrate is shared out by each chunk's source
+              bytes/second (busy scenes get more, clamped to
+              ±CHUNK_BITRATE_SPREAD) so the chunks still sum to the target
+  3. encode   every chunk in its own ffmpeg process; the ffmpeg pool runs
+              as many side by side as the thread budget allows, and audio
+              is encoded once, alongside, from the full source
+  4. join     concat demuxer, stream copy, + the audio track, faststart
+
+N = ffmpeg_pool.encode_slots() clamped to [2, CHUNKED_ENCODE_MAX_CHUNKS],
+so it scales with cores. Each process gets its own FFMPEG_TIMEOUT. Any
+failure returns False and the caller falls back to the single-process
+encode — unless a process timed out: chunked_encode(status=...) then sets
+status["timed_out"], and the caller skips the single-process encode, which
+would only time out again on the whole video. benchmarks/chunked_encode.py
+compares both paths.
+
+Usage:
+    from utils.chunked_encode import chunk_count, chunked_encode
+
+    if duration >= config.CHUNKED_ENCODE_MIN_DURATION:
+        status: dict = {}
+        ok = await chunked_encode(src, dst, kbps=1800, preset="veryfast", height=720, status=status)
+"""
+import asyncio
+import csv
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from core.config import config
+from utils.logger import logger
+from utils.ffmpeg_pool import ffmpeg_pool
+from utils.encode_policy import encode_policy
+from utils.media_processor import _run_ffmpeg, _scan_keyframes, get_video_info, describe_output, AUDIO_KBPS
+
+CHUNK_BITRATE_SPREAD = 0.5   # Per-chunk bitrate stays within ×(1 ± spread) of the mean
+
+
+def chunk_count() -> int:
+    """How many chunks a chunked encode uses on this machine"""
+    return min(max(ffmpeg_pool.encode_slots(), 2), config.CHUNKED_ENCODE_MAX_CHUNKS)
+
+
+def _pick_cuts(keyframes: List[Tuple[float, int]], duration: float, n: int) -> List[Tuple[float, int]]:
+    """Keyframes nearest the even split points, as (time, bytes before)"""
+    candidates = [k for k in keyframes if 0 < k[0] < duration]
+    cuts: List[Tuple[float, int]] = []
+    for i in range(1, n):
+        if not candidates:
+            break
+        target = duration * i / n
+        best = min(candidates, key=lambda k: abs(k[0] - target))
+        if not cuts or best[0] > cuts[-1][0]:
+            cuts.append(best)
+    return cuts
+
+
+def _bitrate_plan(cuts: List[Tuple[float, int]], duration: float, total_bytes: int, kbps: int) -> List[int]:
+    """Per-chunk video kbps weighted by source bitrate, averaging to `kbps`"""
+    bounds = [(0.0, 0)] + cuts + [(duration, total_bytes)]
+    spans = [
+        (max(end[0] - start[0], 0.001), max(end[1] - start[1], 0))
+        for start, end in zip(bounds, bounds[1:])
+    ]
+    mean_rate = total_bytes / duration if duration and total_bytes else 0
+    weights = [
+        min(max((b / d) / mean_rate, 1 - CHUNK_BITRATE_SPREAD), 1 + CHUNK_BITRATE_SPREAD) if mean_rate else 1.0
+        for d, b in spans
+    ]
+    # Renormalise so the duration-weighted mean is exactly kbps
+    norm = sum(w * d for w, (d, _) in zip(weights, spans)) / sum(d for d, _ in spans)
+    return [max(int(kbps * w / norm), 100) for w in weights]
+
+
+def _note_timeout(status: Optional[dict], err: str) -> None:
+    """Flag status["timed_out"] when an ffmpeg run was killed by its timeout"""
+    if status is not None and err == "timeout":
+        status["timed_out"] = True
+
+
+async def _encode_chunk(
+    src: Path, dst: Path, kbps: int, preset: str, height: Optional[int], source_height: int, duration: float,
+    status: Optional[dict] = None,
+) -> bool:
+    args = [
+        "-y", "-i", str(src),
+        "-an",
+        "-c:v", "libx264",
+        "-preset", preset,
+        *(["-vf", f"scale=-2:{height}:flags=lanczos"] if height else []),
+        "-b:v", f"{kbps}k",
+        "-maxrate", f"{kbps}k",
+        "-bufsize", f"{kbps * 2}k",
+        "-pix_fmt", "yuv420p",
+        str(dst),
+    ]
+    timing: dict = {}
+    rc, err = await _run_ffmpeg(args, timing=timing)
+    if rc != 0 or not dst.exists():
+        logger.warning(f"Chunked encode: {src.name} failed: {err[:200]}")
+        _note_timeout(status, err)
+        return False
+    encode_policy.record(preset, height or source_height, duration, timing.get("seconds", 0))
+    return True
+
+
+async def _encode_audio(src: Path, dst: Path, status: Optional[dict] = None) -> bool:
+    args = [
+        "-y", "-i", str(src),
+        "-vn",
+        "-c:a", "aac",
+        "-b:a", f"{AUDIO_KBPS}k",
+        str(dst),
+    ]
+    rc, err = await _run_ffmpeg(args)
+    if rc != 0:
+        logger.warning(f"Chunked encode: audio failed: {err[:200]}")
+        _note_timeout(status, err)
+    return rc == 0 and dst.exists()
+
+
+async def chunked_encode(
+    input_path: Path,
+    output_path: Path,
+    kbps: int,
+    preset: str,
+    height: Optional[int] = None,
+    status: Optional[dict] = None,
+) -> bool:
+    """
+    Re-encode input_path to an H.264/AAC faststart MP4 at ~kbps video
+    bitrate using parallel keyframe chunks. False → use the single-process
+    path, unless status (if given) came back with "timed_out" set.
+    """
+    info = await get_video_info(input_path)
+    duration = info.get("duration")
+    if not duration:
+        return False
+
+    keyframes = await _scan_keyframes(input_path)
+    total_bytes = keyframes[-1][1] if keyframes else 0
+    cuts = _pick_cuts(keyframes, duration, chunk_count())
+    if not cuts:
+        logger.debug("Chunked encode: no usable keyframes, skipping")
+        return False
+    plan = _bitrate_plan(cuts, duration, total_bytes, kbps)
+    times = [0.0] + [t for t, _ in cuts] + [duration]
+    spans = [end - start for start, end in zip(times, times[1:])]
+    source_height = info.get("height") or 720
+
+    with tempfile.TemporaryDirectory(prefix="chunks_", dir=output_path.parent) as tmp:
+        work = Path(tmp)
+        segment_list = work / "segments.csv"
+        rc, err = await _run_ffmpeg([
+            "-y", "-i", str(input_path),
+            "-map", "0:v:0",
+            "-c", "copy",
+            "-f", "segment",
+            "-segment_times", ",".join(f"{max(t - 0.001, 0):.3f}" for t, _ in cuts),
+            "-reset_timestamps", "1",
+            "-segment_format", "matroska",
+            "-segment_list", str(segment_list),
+            "-segment_list_type", "csv",
+            str(work / "src_%03d.mkv"),
+        ])
+        if rc != 0:
+            logger.warning(f"Chunked encode: split failed: {err[:200]}")
+            _note_timeout(status, err)
+            return False
+        with open(segment_list, newline="") as f:
+            sources = [work / Path(row[0]).name for row in csv.reader(f) if row]
+        if len(sources) != len(plan):
+            logger.warning(f"Chunked encode: {len(sources)} chunks for a {len(plan)}-chunk plan")
+            return False
+
+        logger.info(
+            f"Chunked encode: {duration:.0f}s in {len(sources)} chunks, {preset}, "
+            f"kbps {'/'.join(str(k) for k in plan)}"
+        )
+        encoded = [work / f"enc_{i:03d}.mp4" for i in range(len(sources))]
+        audio = work / "audio.m4a"
+        has_audio = info.get("acodec") is not None
+        jobs = [
+            _encode_chunk(s, e, k, preset, height, source_height, d, status)
+            for s, e, k, d in zip(sources, encoded, plan, spans)
+        ]
+        if has_audio:
+            jobs.append(_encode_audio(input_path, audio, status))
+        results = await asyncio.gather(*jobs)
+        if not all(results):
+            return False
+
+        concat_list = work / "concat.txt"
+        concat_list.write_text("".join(f"file '{e.name}'\n" for e in encoded))
+        args = ["-y", "-f", "concat", "-safe", "0", "-i", str(concat_list)]
+        if has_audio:
+            args += ["-i", str(audio), "-map", "0:v:0", "-map", "1:a:0"]
+        args += ["-c", "copy", "-movflags", "+faststart", str(output_path)]
+        rc, err = await _run_ffmpeg(args)
+        if rc != 0 or not output_path.exists():
+            logger.warning(f"Chunked encode: concat failed: {err[:200]}")
+            _note_timeout(status, err)
+            return False
+    describe_output(output_path, info, height or source_height)
+    return True
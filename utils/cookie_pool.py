@@ -0,0 +1,194 @@
+"""
+Cookie pool — indexed cookie folders with health tracking and rate caps.
+
+get_random_cookie() globbed the folder on every call and picked blindly,
+so an expired or flagged account kept being handed to yt-dlp, and under
+peak load one account could take dozens of requests a minute — exactly
+what gets it flagged.
+
+Folders are indexed once and re-checked at most every COOKIE_RESCAN_INTERVAL
+seconds: a changed folder mtime re-globs it, a changed file mtime (cookie
+re-exported) clears that file's flag. Per cookie file the pool tracks:
+  uses in the last COOKIE_RATE_WINDOW seconds   (capped at COOKIE_RATE_LIMIT)
+  successes / failures
+  flagged_until                                 (out of rotation)
+
+Outcome → action:
+  "confirm you're not a bot" /
+  "cookies are no longer valid"     flag for COOKIE_COOLDOWN_BLOCKED, doubling
+                                    on each repeat (capped at 8×)
+  429                               flag for COOKIE_COOLDOWN_RATE_LIMIT
+  anything else (age gate, 403 on
+  a stream URL, …)                  not the cookie's fault — ignored
+
+pick() returns the healthy cookie with the fewest uses in the current
+window (ties broken at random), or None when every cookie is flagged or at
+its cap — callers already handle "no cookie" by going anonymous.
+
+Usage:
+    from utils.cookie_pool import cookie_pool
+
+    cookie = cookie_pool.pick(config.YT_COOKIES_FOLDER)
+    if cookie:
+        opts["cookiefile"] = cookie
+    ...
+    cookie_pool.report_ok(cookie)
+    cookie_pool.report_error(cookie, str(error))
+"""
+import os
+import random
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+from core.config import config
+from utils.logger import logger
+from utils.negative_cache import classify_failure, FAIL_BOT_CHECK, FAIL_RATE_LIMIT
+
+_INVALID_COOKIE_MARKERS = ("cookies are no longer valid", "cookies are invalid")
+
+
+class _CookieRecord:
+    __slots__ = ("mtime", "uses", "successes", "failures", "flags", "flagged_until")
+
+    def __init__(self, mtime: float):
+        self.mtime = mtime
+        self.uses: Deque[float] = deque()
+        self.successes = 0
+        self.failures = 0
+        self.flags = 0
+        self.flagged_until = 0.0
+
+    def recent_uses(self, now: float) -> int:
+        while self.uses and self.uses[0] <= now - config.COOKIE_RATE_WINDOW:
+            self.uses.popleft()
+        return len(self.uses)
+
+
+class _Folder:
+    __slots__ = ("mtime", "checked", "files")
+
+    def __init__(self):
+        self.mtime: Optional[float] = None
+        self.checked = 0.0
+        self.files: List[str] = []
+
+
+class CookiePool:
+    """Health-tracked, rate-capped rotation over cookie folders"""
+
+    def __init__(self):
+        self._folders: Dict[str, _Folder] = {}
+        self._records: Dict[str, _CookieRecord] = {}
+        self._stats: Dict[str, int] = {"picks": 0, "capped": 0, "exhausted": 0}
+
+    # ─── Index ────────────────────────────────────────────────────────────────
+
+    def files(self, folder: str) -> List[str]:
+        """Indexed *.txt files in folder, rescanned only when it changed"""
+        entry = self._folders.setdefault(folder, _Folder())
+        now = time.monotonic()
+        if entry.mtime is not None and now - entry.checked < config.COOKIE_RESCAN_INTERVAL:
+            return entry.files
+        entry.checked = now
+
+        try:
+            mtime = os.stat(folder).st_mtime
+        except OSError:
+            entry.mtime, entry.files = None, []
+            return entry.files
+
+        if mtime != entry.mtime:
+            entry.mtime = mtime
+            old = set(entry.files)
+            entry.files = sorted(str(p) for p in Path(folder).glob("*.txt"))
+            for gone in old - set(entry.files):
+                self._records.pop(gone, None)
+            logger.debug(f"Cookie pool: indexed {len(entry.files)} files in {Path(folder).name}")
+
+        for path in entry.files:
+            self._refresh(path)
+        return entry.files
+
+    def _refresh(self, path: str) -> None:
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return
+        rec = self._records.get(path)
+        if rec is None:
+            self._records[path] = _CookieRecord(mtime)
+        elif mtime != rec.mtime:
+            # Re-exported cookie — give it a clean slate
+            self._records[path] = _CookieRecord(mtime)
+            logger.info(f"Cookie pool: {Path(path).name} changed on disk, flags cleared")
+
+    # ─── Selection ────────────────────────────────────────────────────────────
+
+    def pick(self, folder: str) -> Optional[str]:
+        """Least-used healthy cookie under its rate cap, or None"""
+        files = self.files(folder)
+        if not files:
+            return None
+        now = time.monotonic()
+        healthy = [p for p in files if p in self._records and self._records[p].flagged_until <= now]
+        if not healthy:
+            self._stats["exhausted"] += 1
+            return None
+
+        uses = {p: self._records[p].recent_uses(now) for p in healthy}
+        available = [p for p in healthy if uses[p] < config.COOKIE_RATE_LIMIT]
+        if not available:
+            self._stats["capped"] += 1
+            logger.debug(f"Cookie pool: all {len(healthy)} cookies at rate cap, going anonymous")
+            return None
+
+        least = min(uses[p] for p in available)
+        cookie = random.choice([p for p in available if uses[p] == least])
+        self._records[cookie].uses.append(now)
+        self._stats["picks"] += 1
+        return cookie
+
+    # ─── Outcomes ─────────────────────────────────────────────────────────────
+
+    def report_ok(self, cookie: Optional[str]) -> None:
+        rec = self._records.get(cookie) if cookie else None
+        if rec:
+            rec.successes += 1
+
+    def report_error(self, cookie: Optional[str], error: str) -> None:
+        """Flag the cookie if the error says the account was rejected"""
+        rec = self._records.get(cookie) if cookie else None
+        if not rec:
+            return
+        err = (error or "").lower()
+        fail_class = classify_failure(err)
+        now = time.monotonic()
+
+        if fail_class == FAIL_RATE_LIMIT:
+            rec.failures += 1
+            rec.flagged_until = max(rec.flagged_until, now + config.COOKIE_COOLDOWN_RATE_LIMIT)
+            logger.info(f"Cookie pool: {Path(cookie).name} rate limited, resting")
+        elif fail_class == FAIL_BOT_CHECK or any(m in err for m in _INVALID_COOKIE_MARKERS):
+            ttl = config.COOKIE_COOLDOWN_BLOCKED * min(2 ** rec.flags, 8)
+            rec.failures += 1
+            rec.flags += 1
+            rec.flagged_until = max(rec.flagged_until, now + ttl)
+            logger.warning(f"Cookie pool: {Path(cookie).name} flagged for {ttl}s")
+
+    def stats(self) -> Dict[str, object]:
+        now = time.monotonic()
+        out: Dict[str, object] = dict(self._stats)
+        for path, rec in self._records.items():
+            resting = rec.flagged_until - now
+            out[Path(path).name] = (
+                f"{rec.recent_uses(now)}/{config.COOKIE_RATE_LIMIT} "
+                f"{rec.successes}✓ {rec.failures}✗"
+                + (f" ⏸{int(resting)}s" if resting > 0 else "")
+            )
+        return out
+
+
+# Global cookie pool instance
+cookie_pool = CookiePool()
@@ -0,0 +1,149 @@
+"""
+Download results — the files yt-dlp actually wrote, with their metadata.
+
+Downloaders used to find their output by globbing the temp dir for
+*.mp4 / *.webm / *.mkv / *.mp3. That is a directory scan per attempt, it
+picks the wrong file when a layer leaves more than one behind (kept
+pre-merge streams, a half-written .part, a thumbnail), and the metadata
+yt-dlp already had was thrown away, so the next stage ran ffprobe for it.
+
+yt-dlp records every file it delivers: requested_downloads[i]["filepath"]
+is the final path after merging and postprocessors (FFmpegExtractAudio,
+FFmpegVideoConvertor rewrite it in place), and with keepvideo each
+requested_formats[j]["filepath"] is a kept pre-merge stream. results()
+turns a processed info dict into DownloadResults:
+
+  path                 exact output file, checked to exist
+  size                 bytes on disk
+  duration             seconds, from the info dict
+  vcodec / acodec      ffprobe names; audio-only outputs by their extension
+                       (the source codec is gone after FFmpegExtractAudio)
+  width / height / fps
+
+Video results are primed into the probe cache (prime_video_info), so
+get_video_info() and ensure_fits_telegram() on the downloaded file don't
+run ffprobe.
+
+Usage:
+    from utils.download_result import DownloadResult, results, kept_streams
+
+    info = ydl.process_ie_result(info, download=True)
+    for r in results(info):
+        print(r.path, r.size, r.height)
+"""
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from utils.media_processor import _ffprobe_codec, prime_video_info
+
+# Container → codec for audio-only outputs
+_AUDIO_EXT_CODECS = {
+    "mp3": "mp3",
+    "m4a": "aac",
+    "aac": "aac",
+    "opus": "opus",
+    "ogg": "vorbis",
+    "flac": "flac",
+    "wav": "pcm_s16le",
+}
+
+
+@dataclass
+class DownloadResult:
+    """One file yt-dlp wrote"""
+    path: Path
+    size: int
+    duration: Optional[float] = None
+    vcodec: Optional[str] = None
+    acodec: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    is_video: bool = True   # False for audio-only outputs; codecs may still be unknown
+
+    @classmethod
+    def from_info(cls, info: dict, path: Optional[str] = None) -> Optional["DownloadResult"]:
+        """
+        Result for one requested_downloads entry (or format dict with a
+        filepath). None if yt-dlp recorded no path or the file is missing.
+        """
+        path = path or info.get("filepath") or info.get("_filename")
+        if not path:
+            return None
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+
+        ext = Path(path).suffix.lstrip(".").lower()
+        is_video = ext not in _AUDIO_EXT_CODECS and info.get("vcodec") != "none"
+        if not is_video:
+            return cls(
+                path=Path(path),
+                size=size,
+                duration=float(info["duration"]) if info.get("duration") else None,
+                acodec=_AUDIO_EXT_CODECS.get(ext) or _ffprobe_codec(info.get("acodec")),
+                is_video=False,
+            )
+        return cls(
+            path=Path(path),
+            size=size,
+            duration=float(info["duration"]) if info.get("duration") else None,
+            vcodec=_ffprobe_codec(info.get("vcodec")),
+            acodec=_ffprobe_codec(info.get("acodec")),
+            width=info.get("width"),
+            height=info.get("height"),
+            fps=info.get("fps"),
+        )
+
+    def media_info(self) -> dict:
+        """get_video_info()-shaped dict"""
+        return {
+            "duration": self.duration,
+            "vcodec": self.vcodec,
+            "acodec": self.acodec,
+            "width": self.width,
+            "height": self.height,
+            "fps": self.fps,
+        }
+
+
+def _downloaded(info: dict) -> List[dict]:
+    """
+    requested_downloads of `info` and of its entries (playlists). yt-dlp
+    strips the keys an entry shares with its parent, so they're merged back.
+    """
+    if info.get("entries") is not None:
+        return [d for entry in info["entries"] if entry for d in _downloaded(entry)]
+    return [{**info, **entry} for entry in info.get("requested_downloads") or []]
+
+
+def results(info: Optional[dict]) -> List[DownloadResult]:
+    """
+    Every final file in a processed info dict, in download order; video
+    files are primed into the probe cache.
+    """
+    if not info:
+        return []
+    out = []
+    for entry in _downloaded(info):
+        result = DownloadResult.from_info(entry)
+        if result is None:
+            continue
+        if result.is_video:
+            prime_video_info(result.path, entry)
+        out.append(result)
+    return out
+
+
+def kept_streams(info: Optional[dict]) -> List[DownloadResult]:
+    """Pre-merge streams left on disk by keepvideo (empty for progressive formats)"""
+    out = []
+    for entry in _downloaded(info) if info else []:
+        for fmt in entry.get("requested_formats") or []:
+            result = DownloadResult.from_info({"duration": entry.get("duration"), **fmt})
+            if result is not None:
+                out.append(result)
+    return out
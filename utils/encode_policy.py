@@ -0,0 +1,128 @@
+"""
+Encode policy — pick the x264 preset and scale target per job from current load.
+
+"-preset veryfast" everywhere is too slow when the ffmpeg pool is backed up
+(the job blows FFMPEG_TIMEOUT) and leaves quality on the table when the box
+is idle. Each encode asks the policy instead:
+
+  predicted = queue wait + duration / speed(preset, height)
+  queue wait = ffmpeg pool queue depth × avg encode time / parallel encodes
+  speed      = learned veryfast-at-720p speed (media s per wall s)
+               × PRESET_SPEED[preset] / (height / 720)²
+
+Presets are tried best-quality first (faster → veryfast → superfast →
+ultrafast) at the caller's height, then at each lower rung of
+HEIGHT_LADDER (never below ENCODE_MIN_HEIGHT). The first combination
+predicted to finish within ENCODE_LATENCY_SLO (80% of FFMPEG_TIMEOUT)
+wins; if none does, the fastest preset at the lowest allowed height is used.
+
+The policy only ever trades quality away when it has evidence: until
+record() has a real sample the speed is a guess, so the baseline (veryfast
+at the caller's height) is used as is; and with the ffmpeg pool queue
+empty there is no load to shed, so nothing below the baseline is picked —
+an idle box can only move up to "faster".
+
+Finished encodes feed the speed estimate back (record), so the model tracks
+the machine it runs on. Every decision is logged; counts show under /perf.
+benchmarks/encode_presets.py measures the quality/speed curve the
+PRESET_SPEED ratios come from.
+
+Usage:
+    from utils.encode_policy import encode_policy
+
+    preset, height = encode_policy.choose(duration, target_height)
+    ...  # ffmpeg -preset {preset} -vf scale=-2:{height}
+    encode_policy.record(preset, height, duration, wall_seconds)
+"""
+from typing import Dict, Tuple
+
+from core.config import config
+from utils.ffmpeg_pool import ffmpeg_pool
+from utils.logger import logger
+
+PRESET_LADDER = ("faster", "veryfast", "superfast", "ultrafast")   # best quality first
+BASELINE_PRESET = "veryfast"                                       # the pre-policy default
+PRESET_SPEED = {                                                   # relative to veryfast
+    "faster": 0.7,
+    "veryfast": 1.0,
+    "superfast": 1.5,
+    "ultrafast": 2.3,
+}
+HEIGHT_LADDER = (1080, 720, 540, 480)
+
+
+class EncodePolicy:
+    """Load-aware preset / height choice with a learned encode-speed model"""
+
+    def __init__(self):
+        self._speed = config.ENCODE_BASE_SPEED   # veryfast @ 720p, media s per wall s
+        self._samples = 0
+        self._stats: Dict[str, int] = {p: 0 for p in PRESET_LADDER}
+        self._stats["downscaled"] = 0
+        self._stats["slo_miss_predicted"] = 0
+
+    def _encode_seconds(self, duration: float, preset: str, height: int) -> float:
+        pixels = (height / 720) ** 2
+        return duration / (self._speed * PRESET_SPEED[preset] / pixels)
+
+    def _queue_wait(self) -> float:
+        depth = ffmpeg_pool.queue_depth()
+        if not depth:
+            return 0.0
+        avg = ffmpeg_pool.avg_encode_seconds() or config.ENCODE_LATENCY_SLO / 2
+        return depth * avg / ffmpeg_pool.encode_slots()
+
+    def choose(self, duration: float, height: int) -> Tuple[str, int]:
+        """(x264 preset, output height ≤ height) predicted to meet the latency SLO"""
+        duration = max(duration, 1.0)
+        wait = self._queue_wait()
+        budget = config.ENCODE_LATENCY_SLO - wait
+        if self._samples == 0:
+            # Uncalibrated speed — no grounds to leave the baseline
+            presets, heights = (BASELINE_PRESET,), [height]
+        elif not ffmpeg_pool.queue_depth():
+            # Idle pool — only a better preset than the baseline is on offer
+            presets, heights = PRESET_LADDER[:PRESET_LADDER.index(BASELINE_PRESET) + 1], [height]
+        else:
+            presets = PRESET_LADDER
+            heights = [height] + [
+                h for h in HEIGHT_LADDER if h < height and h >= config.ENCODE_MIN_HEIGHT
+            ]
+
+        choice = None
+        for h in heights:
+            for preset in presets:
+                if self._encode_seconds(duration, preset, h) <= budget:
+                    choice = (preset, h)
+                    break
+            if choice:
+                break
+        if choice is None:
+            choice = (presets[-1], heights[-1])
+            self._stats["slo_miss_predicted"] += 1
+
+        preset, out_h = choice
+        self._stats[preset] += 1
+        if out_h < height:
+            self._stats["downscaled"] += 1
+        logger.info(
+            f"Encode policy: {duration:.0f}s {height}p → {preset} @ {out_h}p "
+            f"(predicted {wait + self._encode_seconds(duration, preset, out_h):.0f}s, "
+            f"queue {ffmpeg_pool.queue_depth()} ~{wait:.0f}s, speed {self._speed:.1f}x)"
+        )
+        return preset, out_h
+
+    def record(self, preset: str, height: int, duration: float, wall_seconds: float) -> None:
+        """Feed a finished encode back into the speed model"""
+        if preset not in PRESET_SPEED or wall_seconds <= 0 or duration <= 0:
+            return
+        observed = duration / wall_seconds * (height / 720) ** 2 / PRESET_SPEED[preset]
+        self._speed = observed if self._samples == 0 else 0.7 * self._speed + 0.3 * observed
+        self._samples += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {**self._stats, "speed_720p_veryfast": f"{self._speed:.1f}x", "samples": self._samples}
+
+
+# Global encode policy instance
+encode_policy = EncodePolicy()
@@ -0,0 +1,163 @@
+"""
+FFmpeg CPU pool — hand out thread budgets so encodes don't oversubscribe the box.
+
+Every encode used to start with a hard-coded "-threads 6" (or 4), and with
+12 concurrent downloads an 8-core machine ran 40+ encoder threads at once:
+every encode slowed down and the event loop's ffprobe/upload work with it.
+
+The pool owns FFMPEG_CPU_BUDGET threads (default: core count). Each ffmpeg
+process reserves threads for its lifetime, by what it does:
+  libx264 encode              FFMPEG_ENCODE_THREADS
+  libx264 from http(s) input  FFMPEG_STREAM_THREADS (stream pipeline:
+                              paced by the download, not the CPU)
+  stream copy / remux / audio 1
+Requests wait in FIFO order until their threads are free — the timeout in
+_run_ffmpeg only starts once the process has its budget.
+
+Stats (under /perf): running, queue depth, threads in use, average queue
+wait, and throughput (processes and encodes per minute, average encode
+wall time over the last FFMPEG_STATS_WINDOW seconds) for sizing machines.
+
+Usage:
+    from utils.ffmpeg_pool import ffmpeg_pool
+
+    threads = ffmpeg_pool.demand(args)
+    async with ffmpeg_pool.reserve(threads, kind="encode"):
+        ...  # run ffmpeg with "-threads", str(threads)
+"""
+import asyncio
+import contextlib
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from core.config import config
+from utils.logger import logger
+
+_ENCODERS = ("libx264", "libx265", "libvpx", "libvpx-vp9")
+
+
+def _reads_network(args: List[str]) -> bool:
+    """Any -i input is a URL (the stream pipeline)"""
+    return any(
+        prev == "-i" and arg.startswith(("http://", "https://"))
+        for prev, arg in zip(args, args[1:])
+    )
+
+
+class FFmpegPool:
+    """FIFO thread-budget gate for ffmpeg processes"""
+
+    def __init__(self, budget: int):
+        self.budget = max(1, budget)
+        self._free = self.budget
+        self._running = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+        # (finished_at, kind, wall seconds) for throughput
+        self._done: Deque[Tuple[float, str, float]] = deque()
+        self._wait_total = 0.0
+        self._wait_count = 0
+        self._stats: Dict[str, int] = {"processes": 0, "queued": 0}
+
+    @staticmethod
+    def demand(args: List[str]) -> int:
+        """Threads an ffmpeg invocation should get"""
+        if any(a in _ENCODERS for a in args):
+            if _reads_network(args):
+                return config.FFMPEG_STREAM_THREADS
+            return config.FFMPEG_ENCODE_THREADS
+        return 1
+
+    @staticmethod
+    def kind(args: List[str]) -> str:
+        if any(a in _ENCODERS for a in args):
+            # Stream encodes run at download speed — kept out of the encode timings
+            return "stream" if _reads_network(args) else "encode"
+        return "copy" if "copy" in args else "audio"
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, threads: int, kind: str = "encode") -> AsyncIterator[int]:
+        """Hold `threads` (capped at the budget) for the duration of the block"""
+        threads = min(max(1, threads), self.budget)
+        queued_at = time.monotonic()
+        await self._acquire(threads)
+        waited = time.monotonic() - queued_at
+        self._wait_total += waited
+        self._wait_count += 1
+        if waited > 1:
+            logger.debug(f"FFmpeg pool: waited {waited:.1f}s for {threads} threads")
+
+        self._running += 1
+        self._stats["processes"] += 1
+        started = time.monotonic()
+        try:
+            yield threads
+        finally:
+            self._running -= 1
+            self._record(kind, time.monotonic() - started)
+            self._release(threads)
+
+    async def _acquire(self, threads: int) -> None:
+        if not self._waiters and self._free >= threads:
+            self._free -= threads
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append((threads, fut))
+        self._stats["queued"] += 1
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release(threads)
+            else:
+                with contextlib.suppress(ValueError):
+                    self._waiters.remove((threads, fut))
+                self._wake()
+            raise
+
+    def _release(self, threads: int) -> None:
+        self._free += threads
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self._free >= self._waiters[0][0]:
+            threads, fut = self._waiters.popleft()
+            if fut.done():
+                continue
+            self._free -= threads
+            fut.set_result(None)
+
+    def _record(self, kind: str, seconds: float) -> None:
+        now = time.monotonic()
+        self._done.append((now, kind, seconds))
+        while self._done and self._done[0][0] < now - config.FFMPEG_STATS_WINDOW:
+            self._done.popleft()
+
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def avg_encode_seconds(self) -> Optional[float]:
+        encodes = [s for _, k, s in self._done if k == "encode"]
+        return sum(encodes) / len(encodes) if encodes else None
+
+    def encode_slots(self) -> int:
+        """How many encodes run side by side at full thread budget"""
+        return max(1, self.budget // config.FFMPEG_ENCODE_THREADS)
+
+    def stats(self) -> Dict[str, object]:
+        window_min = config.FFMPEG_STATS_WINDOW / 60
+        encodes = [s for _, k, s in self._done if k == "encode"]
+        return {
+            **self._stats,
+            "running": self._running,
+            "queue_depth": len(self._waiters),
+            "threads": f"{self.budget - self._free}/{self.budget}",
+            "avg_wait": f"{self._wait_total / self._wait_count:.1f}s" if self._wait_count else "—",
+            "per_min": f"{len(self._done) / window_min:.1f}",
+            "encodes_per_min": f"{len(encodes) / window_min:.1f}",
+            "avg_encode": f"{sum(encodes) / len(encodes):.1f}s" if encodes else "—",
+        }
+
+
+# Global ffmpeg pool instance
+ffmpeg_pool = FFmpegPool(config.FFMPEG_CPU_BUDGET)
@@ -0,0 +1,198 @@
+"""
+Size-aware yt-dlp format selection — pick what already fits Telegram.
+
+"bestvideo[height<=1080]+bestaudio" downloads 1080p first and only then
+finds out it is over 49 MB, which costs up to two full libx264 encodes.
+The info dict already knows each format's size:
+  filesize          exact (YouTube DASH contentLength)
+  filesize_approx   yt-dlp's tbr × duration estimate
+  tbr × duration    computed here when neither is present
+
+pick_fitting_format() walks H.264 + AAC candidates (DASH video+audio pairs
+and progressive MP4s) from best to worst and returns the first whose
+predicted size fits the limit, so the download can be stream-copied.
+Nothing predicted to fit → best candidate ≤ 720p (cheap re-encode source).
+No usable candidates → None, caller keeps its normal format string.
+
+Predictions are checked against the downloaded file (record_actual) and
+reported under /perf.
+
+Usage:
+    from utils.format_fit import telegram_format_picker, format_fit_stats
+
+    picker = telegram_format_picker(max_height=1080)
+    picked = picker(info)            # (spec, predicted_bytes, limit_bytes) or None
+    if picked:
+        spec, predicted, limit = picked
+        ...  # download with "format": spec
+        format_fit_stats.record_actual(predicted, path.stat().st_size, limit)
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.logger import logger
+
+TG_LIMIT_BYTES = 49 * 1024 * 1024   # Same 49 MB safety margin as media_processor
+FIT_MARGIN     = 0.95               # Aim under the limit — mux overhead, estimate error
+FALLBACK_HEIGHT = 720               # Re-encode source when nothing fits
+
+Picker = Callable[[dict], Optional[Tuple[str, Optional[int], int]]]
+
+
+def _is_h264(fmt: dict) -> bool:
+    return (fmt.get("vcodec") or "").startswith(("avc1", "h264"))
+
+
+def _is_aac(fmt: dict) -> bool:
+    return (fmt.get("acodec") or "").startswith("mp4a")
+
+
+def _is_direct(fmt: dict) -> bool:
+    # HLS / DASH-manifest formats rarely carry sizes and can't be stream-copied cheaply
+    return (fmt.get("protocol") or "https") in ("https", "http")
+
+
+def predict_size(fmt: dict, duration: Optional[float]) -> Optional[int]:
+    """Predicted bytes for one format, or None if unknown"""
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if size:
+        return int(size)
+    tbr = fmt.get("tbr")
+    if tbr and duration:
+        return int(tbr * 1000 / 8 * duration)
+    return None
+
+
+def _candidates(info: dict, max_height: Optional[int]) -> List[Tuple[str, Optional[int], int, float]]:
+    """(format spec, predicted bytes, height, tbr) for every H.264/AAC option"""
+    duration = info.get("duration")
+    formats = [f for f in info.get("formats") or [] if _is_direct(f)]
+
+    def fits_height(f: dict) -> bool:
+        return not max_height or (f.get("height") or 0) <= max_height
+
+    videos = [
+        f for f in formats
+        if _is_h264(f) and f.get("acodec") == "none" and f.get("ext") == "mp4" and fits_height(f)
+    ]
+    audios = [
+        f for f in formats
+        if _is_aac(f) and f.get("vcodec") == "none" and f.get("ext") == "m4a"
+    ]
+    progressive = [
+        f for f in formats
+        if _is_h264(f) and _is_aac(f) and f.get("ext") == "mp4" and fits_height(f)
+    ]
+
+    out: List[Tuple[str, Optional[int], int, float]] = []
+    if audios:
+        audio = max(audios, key=lambda f: f.get("abr") or f.get("tbr") or 0)
+        audio_size = predict_size(audio, duration)
+        for v in videos:
+            v_size = predict_size(v, duration)
+            total = v_size + audio_size if v_size and audio_size else None
+            out.append((
+                f"{v['format_id']}+{audio['format_id']}",
+                total,
+                v.get("height") or 0,
+                (v.get("tbr") or 0) + (audio.get("tbr") or 0),
+            ))
+    for p in progressive:
+        out.append((p["format_id"], predict_size(p, duration), p.get("height") or 0, p.get("tbr") or 0))
+
+    # Best first: resolution, then bitrate
+    out.sort(key=lambda c: (c[2], c[3]), reverse=True)
+    return out
+
+
+def pick_fitting_format(
+    info: dict,
+    max_height: Optional[int] = 1080,
+    limit_bytes: int = TG_LIMIT_BYTES,
+) -> Optional[Tuple[str, Optional[int]]]:
+    """
+    Best H.264/AAC format spec predicted to fit limit_bytes.
+    Returns (spec, predicted_bytes) — predicted_bytes is None when the pick
+    is a fallback (nothing sized fits) — or None if no candidates exist.
+    """
+    candidates = _candidates(info, max_height)
+    if not candidates:
+        return None
+
+    budget = limit_bytes * FIT_MARGIN
+    for spec, size, height, _ in candidates:
+        if size is not None and size <= budget:
+            return spec, size
+
+    for spec, size, height, _ in candidates:
+        if height <= FALLBACK_HEIGHT:
+            return spec, None
+    return candidates[-1][0], None
+
+
+def telegram_format_picker(
+    max_height: Optional[int] = 1080,
+    limit_fn: Optional[Callable[[float], int]] = None,
+) -> Picker:
+    """
+    Build a picker for _ydl_download: info → (spec, predicted_bytes, limit_bytes).
+    limit_fn maps duration → byte budget (default: Telegram's 49 MB).
+    """
+    def picker(info: dict) -> Optional[Tuple[str, Optional[int], int]]:
+        limit = limit_fn(info.get("duration") or 0) if limit_fn else TG_LIMIT_BYTES
+        picked = pick_fitting_format(info, max_height, limit)
+        if not picked:
+            format_fit_stats.record_skip()
+            return None
+        spec, predicted = picked
+        logger.debug(
+            f"Format fit: {spec} predicted "
+            f"{f'{predicted / 1024 / 1024:.1f}MB' if predicted else 'over limit'} "
+            f"(limit {limit / 1024 / 1024:.0f}MB)"
+        )
+        return spec, predicted, limit
+    return picker
+
+# ─── Prediction accuracy ──────────────────────────────────────────────────────
+
+class FormatFitStats:
+    """How often the size prediction matched the downloaded file"""
+
+    def __init__(self):
+        self._stats: Dict[str, int] = {
+            "fit_ok": 0,       # predicted to fit, did fit → no re-encode
+            "fit_miss": 0,     # predicted to fit, came out over limit
+            "no_fit": 0,       # nothing predicted to fit → re-encode expected
+            "no_formats": 0,   # no H.264/AAC candidates → default selection
+        }
+        self._abs_err_pct_sum = 0.0
+        self._err_samples = 0
+
+    def stats(self) -> Dict[str, object]:
+        predicted = self._stats["fit_ok"] + self._stats["fit_miss"]
+        return {
+            **self._stats,
+            "hit_rate": f"{self._stats['fit_ok'] / predicted:.0%}" if predicted else "—",
+            "mean_err": f"{self._abs_err_pct_sum / self._err_samples:.1f}%" if self._err_samples else "—",
+        }
+
+    def record_skip(self) -> None:
+        self._stats["no_formats"] += 1
+
+    def record_actual(self, predicted: Optional[int], actual: int, limit: int) -> None:
+        if predicted is None:
+            self._stats["no_fit"] += 1
+            return
+        self._abs_err_pct_sum += abs(actual - predicted) / max(actual, 1) * 100
+        self._err_samples += 1
+        if actual <= limit:
+            self._stats["fit_ok"] += 1
+        else:
+            self._stats["fit_miss"] += 1
+            logger.info(
+                f"Format fit: predicted {predicted / 1024 / 1024:.1f}MB, "
+                f"got {actual / 1024 / 1024:.1f}MB"
+            )
+
+
+# Global format-fit stats instance
+format_fit_stats = FormatFitStats()
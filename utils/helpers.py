@@ -1,7 +1,5 @@
 """Helper utilities for the bot"""
 import os
-import glob
-import random
 from pathlib import Path
 from typing import Optional
 from aiogram.types import User
@@ -15,22 +13,16 @@ def mention(user: User) -> str:
 
 def get_random_cookie(folder: str) -> Optional[str]:
     """
-    Get random cookie file from folder
+    Legacy compat — delegates to the cookie pool
     
     Args:
         folder: Path to cookie folder
     
     Returns:
-        Path to random cookie file or None
+        Path to a healthy, least-used cookie file or None
     """
-    if not os.path.exists(folder):
-        return None
-    
-    cookies = glob.glob(f"{folder}/*.txt")
-    if not cookies:
-        return None
-    
-    return random.choice(cookies)
+    from utils.cookie_pool import cookie_pool
+    return cookie_pool.pick(folder)
 
 def resolve_pinterest_url(url: str) -> str:
     """
@@ -0,0 +1,101 @@
+"""
+yt-dlp metadata cache — extract a page once, download from it many times.
+
+Every YoutubeDL.extract_info() call re-fetches the watch page and player
+(2–5s, and most of our rate-limit exposure). A link typically triggers
+several: layer retries, the 🎥 and 🎧 branches, a second user pasting the
+same video, an audio-only fallback after the video branch is aborted.
+
+Entries are sanitized info dicts (same shape as --write-info-json) keyed by
+canonical media ID. Downloads feed them to process_ie_result(), which runs
+format selection + download with no new extraction — so one entry serves
+every format. Stream URLs are tied to the extracting IP, so each entry
+remembers its proxy and cached downloads must reuse it.
+
+Entries are also keyed by extraction route (downloader layer: player
+client, cookie, UA). A hedged or fallback layer exists to try a different
+route. If it took layer 1's entry, it would download layer 1's signed
+URLs through layer 1's proxy, repeating the slow transfer, so each route
+extracts for itself. Retries, the 🎥/🎧 branches and repeat pastes on the
+same route still share an entry.
+
+Only single-video results are cached under the media ID. A process=False
+extraction of watch?v=X&list=… can come back as a `_type: url` stub or a
+playlist; cached as X, it would make a later plain watch?v=X download the
+whole list.
+
+In-process only with a short TTL — info dicts are large and signed stream
+URLs expire, a shared Redis copy would mostly hold dead links.
+
+Usage:
+    from utils.info_cache import info_cache
+
+    cached = info_cache.get(url, route="layer1")
+    if cached:
+        info, proxy = cached
+        ...  # YoutubeDL({..., "proxy": proxy}).process_ie_result(info, download=True)
+    else:
+        info = ydl.extract_info(url, download=False)
+        info_cache.set(url, YoutubeDL.sanitize_info(info, remove_private_keys=True), proxy, route="layer1")
+"""
+import copy
+from typing import Dict, Optional, Tuple
+
+from core.config import config
+from utils.cache import _LocalLRU
+from utils.logger import logger
+from utils.media_id import media_key
+
+
+class InfoCache:
+    """In-process TTL cache of yt-dlp info dicts keyed by canonical media ID"""
+
+    def __init__(self):
+        self._local = _LocalLRU(config.INFO_CACHE_SIZE, config.INFO_CACHE_TTL)
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0}
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "size": len(self._local)}
+
+    @staticmethod
+    def _key(url: str, flat: bool, route: Optional[str] = None) -> str:
+        # Flat playlist listings keep the raw URL — watch?v=X&list=A and
+        # &list=B share a video ID but not a listing
+        if flat:
+            return f"flat:{url.strip()}"
+        return f"full:{media_key(url)}" + (f":{route}" if route else "")
+
+    def get(
+        self, url: str, flat: bool = False, route: Optional[str] = None,
+    ) -> Optional[Tuple[dict, Optional[str]]]:
+        """
+        Return (info, proxy) for url as extracted by `route`, or None.
+        The info is a private copy — yt-dlp mutates it during processing.
+        """
+        entry = self._local.get(self._key(url, flat, route))
+        if not entry:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        info, proxy = entry
+        return copy.deepcopy(info), proxy
+
+    def set(
+        self, url: str, info: dict, proxy: Optional[str] = None, flat: bool = False, route: Optional[str] = None,
+    ) -> None:
+        if not info:
+            return
+        if not flat and info.get("_type", "video") != "video":
+            logger.debug(f"Info cache: not caching {info.get('_type')} result for {media_key(url)}")
+            return
+        self._local.set(self._key(url, flat, route), (info, proxy))
+
+    def invalidate(self, url: str, flat: bool = False, route: Optional[str] = None) -> None:
+        """Drop an entry whose stream URLs stopped working"""
+        self._stats["stale"] += 1
+        self._local.delete(self._key(url, flat, route))
+        logger.debug(f"Info cache: dropped {media_key(url)}")
+
+
+# Global info cache instance
+info_cache = InfoCache()
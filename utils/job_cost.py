@@ -0,0 +1,81 @@
+"""
+Job cost model — predicted capacity units for a download, from its info dict.
+
+Every job used to cost one slot, so twelve 3-hour podcasts that each need
+an ensure_video_fits_telegram re-encode could take the whole box while the
+reels behind them waited. The scheduler (workers/task_queue.py) now charges
+each ticket a cost in units, where 1 unit ≈ a typical short clip:
+
+  network     predicted bytes / COST_BYTES_PER_UNIT
+  re-encode   only when no H.264/AAC format is predicted to fit Telegram
+              (utils/format_fit.py): minutes × (height / 720) × COST_ENCODE_PER_MINUTE
+  audio       transcode ≈ minutes × COST_AUDIO_PER_MINUTE
+
+cost = 1 + network + encode, capped at COST_MAX so even the heaviest job
+leaves room for others (the scheduler also caps at its capacity). Unknown
+info → 1 unit, same as before.
+
+Usage:
+    from utils.job_cost import estimate_cost
+
+    cost, label = estimate_cost(info, "video")   # (3.4, "heavy")
+    ticket = download_scheduler.slot(user_id, cost=cost)
+"""
+from typing import Optional, Tuple
+
+from utils.format_fit import pick_fitting_format, predict_size, FALLBACK_HEIGHT
+
+COST_BYTES_PER_UNIT    = 100 * 1024 * 1024   # 100 MB of download ≈ one unit
+COST_ENCODE_PER_MINUTE = 0.25                # libx264 720p, units per minute of video
+COST_AUDIO_PER_MINUTE  = 0.02                # MP3 transcode, units per minute of audio
+FALLBACK_BITRATE       = 2_500_000           # bits/s — 720p H.264 + AAC re-encode source
+COST_MAX               = 6.0
+
+LIGHT_MAX  = 1.5
+MEDIUM_MAX = 4.0
+
+
+def _label(cost: float) -> str:
+    if cost <= LIGHT_MAX:
+        return "light"
+    if cost <= MEDIUM_MAX:
+        return "medium"
+    return "heavy"
+
+
+def _best_audio_size(info: dict, duration: float) -> Optional[int]:
+    sizes = [
+        predict_size(f, duration) for f in info.get("formats") or []
+        if f.get("vcodec") == "none" and f.get("acodec") not in (None, "none")
+    ]
+    sizes = [s for s in sizes if s]
+    return max(sizes) if sizes else None
+
+
+def estimate_cost(info: Optional[dict], kind: str = "video", max_height: Optional[int] = 1080) -> Tuple[float, str]:
+    """
+    (cost units, "light" | "medium" | "heavy") for downloading `info` as
+    kind "video" or "audio". Works on unprocessed (process=False) info dicts.
+    """
+    if not info:
+        return 1.0, "light"
+    duration = float(info.get("duration") or 0)
+    minutes = duration / 60
+
+    if kind == "audio":
+        size = _best_audio_size(info, duration) or 0
+        cost = min(1.0 + size / COST_BYTES_PER_UNIT + minutes * COST_AUDIO_PER_MINUTE, COST_MAX)
+        return round(cost, 2), _label(cost)
+
+    cost = 1.0
+    picked = pick_fitting_format(info, max_height)
+    if picked and picked[1] is not None:
+        # Fits as downloaded — stream copy, network only
+        cost += picked[1] / COST_BYTES_PER_UNIT
+    else:
+        # Re-encode expected from a ≤720p source
+        height = min(info.get("height") or FALLBACK_HEIGHT, FALLBACK_HEIGHT)
+        cost += minutes * (height / 720) * COST_ENCODE_PER_MINUTE
+        cost += duration * FALLBACK_BITRATE / 8 / COST_BYTES_PER_UNIT
+    cost = min(cost, COST_MAX)
+    return round(cost, 2), _label(cost)
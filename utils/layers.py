@@ -0,0 +1,358 @@
+"""
+Extraction layer runner — adaptive order, hedged fallback, per-layer stats.
+
+Downloaders try layers in order (plain → alt client/UA → cookies). Strictly
+sequential, a layer that hangs until its 30s socket timeout adds all of it
+to the user's wait before the next layer even starts.
+
+run_hedged() starts layer 1; if it has not finished after its hedge delay,
+the next layer starts in parallel. A failure starts the next layer at once.
+First success wins; the others get their cancel event set (yt-dlp progress
+hook aborts) and their asyncio task cancelled. Once the job's own cancel
+event (job_cancel) is set, no further layer starts and the aborted layer's
+failure isn't recorded — it says nothing about the layer.
+
+Hedge delay per (platform, layer) comes from that layer's recent record:
+  delay = p90(success latency) × max(success rate, 0.25)
+clamped to [HEDGE_DELAY_MIN, HEDGE_DELAY_MAX]. Reliable layers get time to
+finish, flaky ones are hedged early. HEDGE_DELAY_DEFAULT until
+HEDGE_MIN_SAMPLES successes are recorded.
+
+Layer order is learned, not fixed. Each (platform, layer) keeps
+exponentially decayed win/fail counts (half-life LAYER_SCORE_HALFLIFE) and an
+EWMA of success latency:
+  rate  = (wins + prior × 2) / (wins + fails + 2)
+  score = rate / (1 + latency / LAYER_LATENCY_SCALE)
+The prior follows the code's default order (0.9, 0.8, 0.7 …), so with no
+data nothing moves. When upstream starts blocking a layer, its fails
+outweigh the decayed history within a few half-lives and it drops behind.
+Decay pulls a demoted layer back toward its prior, so it gets retried and
+recovers once upstream does.
+
+Scores persist to Redis (hash "layers:scores", written at most every
+LAYER_PERSIST_INTERVAL) so a restart or deploy doesn't relearn from scratch.
+/layers shows the live order; /layers reset clears it.
+
+Each attempt should write into its own directory — parallel layers must
+not write over each other's files.
+
+Usage:
+    from utils.layers import run_hedged, ytdlp_cancel_hook
+
+    async def attempt(cancel: threading.Event):
+        opts = ...
+        opts["progress_hooks"] = [ytdlp_cancel_hook(cancel)]
+        return await _try_download(url, opts)   # result or None
+
+    result = await run_hedged("youtube", [("layer1", attempt1), ("layer2", attempt2)])
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from yt_dlp.utils import DownloadCancelled
+
+from core.config import config
+from utils.logger import logger
+from utils.redis_client import redis_client
+
+_REDIS_KEY = "layers:scores"
+_PRIOR_WEIGHT = 2.0
+
+AttemptFn = Callable[[threading.Event], Awaitable[object]]
+
+# ─── yt-dlp cancel hook ───────────────────────────────────────────────────────
+
+def ytdlp_cancel_hook(*events: threading.Event, state: Optional[dict] = None):
+    """
+    yt-dlp progress hook: abort the download as soon as any event is set.
+    Counts finished streams into state["streams_done"] when given.
+    """
+    def hook(d: dict) -> None:
+        if any(e.is_set() for e in events):
+            raise DownloadCancelled("attempt cancelled")
+        if state is not None and d.get("status") == "finished":
+            state["streams_done"] = state.get("streams_done", 0) + 1
+    return hook
+
+# ─── Per-layer stats ──────────────────────────────────────────────────────────
+
+class _LayerRecord:
+    __slots__ = ("wins", "fails", "cancelled", "latencies", "d_wins", "d_fails", "lat_ewma", "updated")
+
+    def __init__(self):
+        self.wins = 0
+        self.fails = 0
+        self.cancelled = 0
+        self.latencies: Deque[float] = deque(maxlen=50)
+        # Decayed counters for ordering — wall clock so they survive a restart
+        self.d_wins = 0.0
+        self.d_fails = 0.0
+        self.lat_ewma: Optional[float] = None
+        self.updated = time.time()
+
+    def success_rate(self) -> float:
+        total = self.wins + self.fails
+        return self.wins / total if total else 1.0
+
+    def decayed(self, now: float) -> Tuple[float, float]:
+        factor = 0.5 ** (max(now - self.updated, 0.0) / config.LAYER_SCORE_HALFLIFE)
+        return self.d_wins * factor, self.d_fails * factor
+
+    def add(self, ok: bool, elapsed: float, now: float) -> None:
+        self.d_wins, self.d_fails = self.decayed(now)
+        self.updated = now
+        if ok:
+            self.d_wins += 1
+            self.lat_ewma = elapsed if self.lat_ewma is None else 0.7 * self.lat_ewma + 0.3 * elapsed
+        else:
+            self.d_fails += 1
+
+    def score(self, prior: float, default_latency: float, now: float) -> float:
+        wins, fails = self.decayed(now)
+        rate = (wins + prior * _PRIOR_WEIGHT) / (wins + fails + _PRIOR_WEIGHT)
+        latency = self.lat_ewma if self.lat_ewma is not None else default_latency
+        return rate / (1 + latency / config.LAYER_LATENCY_SCALE)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "wins": self.wins, "fails": self.fails, "cancelled": self.cancelled,
+            "d_wins": self.d_wins, "d_fails": self.d_fails,
+            "lat_ewma": self.lat_ewma, "updated": self.updated,
+            "latencies": list(self.latencies),
+        })
+
+    @classmethod
+    def from_json(cls, raw: str) -> "_LayerRecord":
+        data = json.loads(raw)
+        rec = cls()
+        rec.wins = int(data.get("wins", 0))
+        rec.fails = int(data.get("fails", 0))
+        rec.cancelled = int(data.get("cancelled", 0))
+        rec.d_wins = float(data.get("d_wins", 0.0))
+        rec.d_fails = float(data.get("d_fails", 0.0))
+        rec.lat_ewma = data.get("lat_ewma")
+        rec.updated = float(data.get("updated", time.time()))
+        rec.latencies.extend(data.get("latencies") or [])
+        return rec
+
+    def p90(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.9 * (len(ordered) - 1))]
+
+
+class LayerStats:
+    """Win/fail counts, success latencies and learned order per (platform, layer)"""
+
+    def __init__(self):
+        self._records: Dict[Tuple[str, str], _LayerRecord] = {}
+        self._defaults: Dict[str, List[str]] = {}   # platform → code order, first seen
+        self._dirty = False
+        self._last_save = 0.0
+
+    def _get(self, platform: str, layer: str) -> _LayerRecord:
+        key = (platform, layer)
+        if key not in self._records:
+            self._records[key] = _LayerRecord()
+        return self._records[key]
+
+    def record(self, platform: str, layer: str, ok: bool, elapsed: float) -> None:
+        rec = self._get(platform, layer)
+        if ok:
+            rec.wins += 1
+            rec.latencies.append(elapsed)
+        else:
+            rec.fails += 1
+        rec.add(ok, elapsed, time.time())
+        self._dirty = True
+        self._maybe_save()
+
+    def record_cancel(self, platform: str, layer: str) -> None:
+        self._get(platform, layer).cancelled += 1
+
+    # ── Ordering ──
+
+    def order(self, platform: str, layers: List[str]) -> List[str]:
+        """`layers` (given in default order) sorted by learned score, best first"""
+        now = time.time()
+        seen = self._defaults.setdefault(platform, [])
+        seen.extend(name for name in layers if name not in seen)
+        known = [
+            self._records[(platform, name)].lat_ewma for name in layers
+            if (platform, name) in self._records and self._records[(platform, name)].lat_ewma is not None
+        ]
+        # Unmeasured layers get the average latency — no bonus for being untried
+        default_latency = sum(known) / len(known) if known else 0.0
+        scored = [
+            (self._get(platform, name).score(0.9 - 0.1 * i, default_latency, now), -i, name)
+            for i, name in enumerate(layers)
+        ]
+        return [name for _, _, name in sorted(scored, reverse=True)]
+
+    def table(self) -> Dict[str, Dict[str, str]]:
+        """Per-platform learned order for /layers"""
+        now = time.time()
+        platforms: Dict[str, List[str]] = {}
+        for platform, layer in sorted(self._records):
+            platforms.setdefault(platform, []).append(layer)
+        out: Dict[str, Dict[str, str]] = {}
+        for platform, layers in platforms.items():
+            # Records restored from Redis before any request: fall back to name order
+            default = self._defaults.get(platform, [])
+            layers = [n for n in default if n in layers] + [n for n in layers if n not in default]
+            section: Dict[str, str] = {}
+            for rank, name in enumerate(self.order(platform, layers), 1):
+                rec = self._records[(platform, name)]
+                wins, fails = rec.decayed(now)
+                lat = f"{rec.lat_ewma:.1f}s" if rec.lat_ewma is not None else "—"
+                section[f"{rank}. {name}"] = f"{wins:.1f}✓ {fails:.1f}✗ lat {lat}"
+            out[platform] = section
+        return out
+
+    def reset(self) -> None:
+        self._records.clear()
+        self._dirty = True
+        self._last_save = 0.0
+        self._maybe_save()
+
+    # ── Persistence ──
+
+    def _maybe_save(self) -> None:
+        if not self._dirty or time.monotonic() - self._last_save < config.LAYER_PERSIST_INTERVAL:
+            return
+        self._last_save = time.monotonic()
+        try:
+            asyncio.get_running_loop().create_task(self.save())
+        except RuntimeError:
+            pass
+
+    async def save(self) -> None:
+        """Write every record to Redis (best effort)"""
+        self._dirty = False
+        try:
+            if not self._records:
+                await redis_client.delete(_REDIS_KEY)
+                return
+            for (platform, layer), rec in list(self._records.items()):
+                await redis_client.hset(_REDIS_KEY, f"{platform}/{layer}", rec.to_json())
+        except Exception as e:
+            logger.debug(f"Layer stats save failed: {e}")
+
+    async def load(self) -> None:
+        """Restore records from Redis — call once at startup"""
+        try:
+            raw = await redis_client.hgetall(_REDIS_KEY)
+        except Exception as e:
+            logger.debug(f"Layer stats load failed: {e}")
+            return
+        for field, value in (raw or {}).items():
+            try:
+                platform, layer = field.split("/", 1)
+                self._records[(platform, layer)] = _LayerRecord.from_json(value)
+            except Exception:
+                continue
+        if raw:
+            logger.info(f"Layer stats: restored {len(self._records)} layer records")
+
+    def hedge_delay(self, platform: str, layer: str) -> float:
+        """Seconds to give `layer` before starting the next one alongside it"""
+        if not config.HEDGE_ENABLED:
+            return float("inf")
+        rec = self._get(platform, layer)
+        p90 = rec.p90()
+        if p90 is None or len(rec.latencies) < config.HEDGE_MIN_SAMPLES:
+            return config.HEDGE_DELAY_DEFAULT
+        delay = p90 * max(rec.success_rate(), 0.25)
+        return min(max(delay, config.HEDGE_DELAY_MIN), config.HEDGE_DELAY_MAX)
+
+    def stats(self) -> Dict[str, str]:
+        out: Dict[str, str] = {}
+        for (platform, layer), rec in sorted(self._records.items()):
+            p90 = rec.p90()
+            delay = self.hedge_delay(platform, layer)
+            out[f"{platform}/{layer}"] = (
+                f"{rec.wins}✓ {rec.fails}✗ {rec.cancelled}⊘ "
+                f"p90 {f'{p90:.1f}s' if p90 is not None else '—'} "
+                f"hedge {f'{delay:.1f}s' if delay != float('inf') else 'off'}"
+            )
+        return out
+
+
+# Global layer stats instance
+layer_stats = LayerStats()
+
+# ─── Hedged runner ────────────────────────────────────────────────────────────
+
+async def run_hedged(
+    platform: str,
+    attempts: List[Tuple[str, AttemptFn]],
+    job_cancel: Optional[threading.Event] = None,
+) -> Optional[object]:
+    """
+    Run layer attempts with hedging. Returns the first truthy result, or None
+    when every layer failed or job_cancel was set. Losers are cancelled
+    before returning.
+    """
+    running: Dict[asyncio.Task, Tuple[str, float, threading.Event]] = {}
+    next_idx = 0
+    last_start = 0.0
+
+    def start_next() -> None:
+        nonlocal next_idx, last_start
+        name, fn = attempts[next_idx]
+        next_idx += 1
+        cancel = threading.Event()
+        last_start = time.monotonic()
+        running[asyncio.ensure_future(fn(cancel))] = (name, last_start, cancel)
+
+    if not attempts:
+        return None
+    by_name = dict(attempts)
+    attempts = [(name, by_name[name]) for name in layer_stats.order(platform, [a[0] for a in attempts])]
+    start_next()
+    try:
+        while running:
+            timeout = None
+            if next_idx < len(attempts):
+                last_name = attempts[next_idx - 1][0]
+                deadline = last_start + layer_stats.hedge_delay(platform, last_name)
+                timeout = max(0.0, deadline - time.monotonic()) if deadline != float("inf") else None
+
+            done, _ = await asyncio.wait(
+                running.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                logger.info(f"{platform}: {attempts[next_idx - 1][0]} slow, hedging with {attempts[next_idx][0]}")
+                start_next()
+                continue
+
+            for task in done:
+                name, started, _ = running.pop(task)
+                elapsed = time.monotonic() - started
+                try:
+                    result = task.result()
+                except Exception as e:
+                    logger.debug(f"{platform}/{name} raised: {e}")
+                    result = None
+                if result:
+                    layer_stats.record(platform, name, True, elapsed)
+                    return result
+                # Job aborted — the layer didn't fail, and no other layer should start
+                if job_cancel is not None and job_cancel.is_set():
+                    return None
+                layer_stats.record(platform, name, False, elapsed)
+
+            # A layer failed — the next one starts now, not after a hedge delay
+            if next_idx < len(attempts):
+                start_next()
+        return None
+    finally:
+        for task, (name, _, cancel) in running.items():
+            cancel.set()
+            task.cancel()
+            layer_stats.record_cancel(platform, name)
@@ -0,0 +1,139 @@
+"""
+Media ID canonicalizer — one stable identity per piece of media.
+
+The same reel / video / pin / track reaches the bot under many URL variants:
+  youtu.be/X, youtube.com/watch?v=X&si=..., m.youtube.com/shorts/X
+  instagram.com/reel/CODE/?igsh=..., instagram.com/user/p/CODE
+  pinterest.com/pin/some-title--123/, pinterest.co.uk/pin/123/
+  open.spotify.com/intl-de/track/ID?si=..., spotify:track:ID
+
+canonical_media_id() collapses them to a platform-scoped key:
+  yt:<video_id>          YouTube video / Short / YT Music track
+  ytpl:<list_id>         YouTube playlist (no video selected)
+  ig:<shortcode>         Instagram post / reel / tv
+  ig:story:<id>          Instagram story item
+  pin:<pin_id>           Pinterest pin
+  sp:<kind>:<id>         Spotify track / album / playlist
+
+Returns None when no ID can be extracted (e.g. unresolved pin.it short links) —
+callers fall back to the raw URL.
+"""
+import re
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+# ─── Platform detection ───────────────────────────────────────────────────────
+
+PLATFORM_INSTAGRAM = "instagram"
+PLATFORM_YOUTUBE   = "youtube"
+PLATFORM_PINTEREST = "pinterest"
+PLATFORM_SPOTIFY   = "spotify"
+
+
+def detect_platform(url: str) -> Optional[str]:
+    """Return platform name for a URL, or None if unsupported"""
+    url_lower = url.lower()
+    if "instagram.com" in url_lower:
+        return PLATFORM_INSTAGRAM
+    if "youtube.com" in url_lower or "youtu.be" in url_lower:
+        return PLATFORM_YOUTUBE
+    if "pinterest." in url_lower or "pin.it" in url_lower:
+        return PLATFORM_PINTEREST
+    if "spotify.com" in url_lower or url_lower.startswith("spotify:"):
+        return PLATFORM_SPOTIFY
+    return None
+
+# ─── Per-platform extractors ──────────────────────────────────────────────────
+
+_YT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_YT_PATH_RE = re.compile(r"^/(?:shorts|embed|live|v|e)/([A-Za-z0-9_-]{11})")
+
+_IG_POST_RE = re.compile(r"/(?:p|reel|reels|tv)/([A-Za-z0-9_-]+)")
+_IG_STORY_RE = re.compile(r"/stories/[^/]+/(\d+)")
+
+_PIN_RE = re.compile(r"/pin/(?:[^/]*--)?(\d+)")
+
+_SPOTIFY_PATH_RE = re.compile(r"/(track|album|playlist)/([A-Za-z0-9]+)")
+_SPOTIFY_URI_RE = re.compile(r"^spotify:(track|album|playlist):([A-Za-z0-9]+)")
+
+
+def _youtube_id(url: str) -> Optional[str]:
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    query = parse_qs(parsed.query)
+
+    # youtu.be/<id>
+    if host.endswith("youtu.be"):
+        vid = parsed.path.strip("/").split("/")[0]
+        if _YT_ID_RE.match(vid):
+            return f"yt:{vid}"
+        return None
+
+    # /shorts/<id>, /embed/<id>, /live/<id>
+    m = _YT_PATH_RE.match(parsed.path)
+    if m:
+        return f"yt:{m.group(1)}"
+
+    # /watch?v=<id> (youtube.com, m.youtube.com, music.youtube.com)
+    vid = (query.get("v") or [""])[0]
+    if _YT_ID_RE.match(vid):
+        return f"yt:{vid}"
+
+    # /playlist?list=<id> — playlist without a selected video
+    list_id = (query.get("list") or [""])[0]
+    if list_id:
+        return f"ytpl:{list_id}"
+    return None
+
+
+def _instagram_id(url: str) -> Optional[str]:
+    path = urlparse(url).path
+    m = _IG_STORY_RE.search(path)
+    if m:
+        return f"ig:story:{m.group(1)}"
+    m = _IG_POST_RE.search(path)
+    if m:
+        return f"ig:{m.group(1)}"
+    return None
+
+
+def _pinterest_id(url: str) -> Optional[str]:
+    # pin.it short links need a redirect lookup — not resolvable offline
+    m = _PIN_RE.search(urlparse(url).path)
+    return f"pin:{m.group(1)}" if m else None
+
+
+def _spotify_id(url: str) -> Optional[str]:
+    m = _SPOTIFY_URI_RE.match(url.strip())
+    if not m:
+        m = _SPOTIFY_PATH_RE.search(urlparse(url).path)
+    return f"sp:{m.group(1)}:{m.group(2)}" if m else None
+
+
+_EXTRACTORS = {
+    PLATFORM_YOUTUBE:   _youtube_id,
+    PLATFORM_INSTAGRAM: _instagram_id,
+    PLATFORM_PINTEREST: _pinterest_id,
+    PLATFORM_SPOTIFY:   _spotify_id,
+}
+
+# ─── Public API ───────────────────────────────────────────────────────────────
+
+def canonical_media_id(url: str) -> Optional[str]:
+    """
+    Canonical platform-scoped media ID for a URL.
+    Tracking params (si=, igsh=, utm_*) and host variants are ignored.
+    Returns None if the URL carries no recognizable ID.
+    """
+    platform = detect_platform(url)
+    if not platform:
+        return None
+    try:
+        return _EXTRACTORS[platform](url)
+    except Exception:
+        return None
+
+
+def media_key(url: str) -> str:
+    """Canonical media ID, falling back to the stripped raw URL"""
+    return canonical_media_id(url) or url.strip()
@@ -16,9 +16,11 @@ Bitrate formula:
   clamp minimum to 600 kbps
 
 Encode command (FAST MODE):
-  ffmpeg -vcodec libx264 -preset veryfast -b:v {kbps}k
+  ffmpeg -vcodec libx264 -preset {policy} -b:v {kbps}k
          -maxrate {kbps}k -bufsize {kbps*2}k
-         -acodec aac -b:a 128k -movflags +faststart -threads 6
+         -acodec aac -b:a 128k -movflags +faststart
+  -threads is set per process by the ffmpeg pool (utils/ffmpeg_pool.py)
+  preset + scale come from the load-aware encode policy (utils/encode_policy.py)
 
 Rules:
   - Never 2-pass
@@ -26,24 +28,40 @@ Rules:
   - Never VP9 in speed mode
   - Stream copy if already small + H.264/AAC
   - Always MP4 + faststart for Telegram preview
+
+Probe cache: get_video_info() results are cached per (path, size, mtime),
+pre-filled from yt-dlp's info dict (prime_video_info) and, for files this
+module writes, from the encode parameters (describe_output) — one delivery
+runs ffprobe at most once per file it didn't create.
+
+Splitting (last resort): one packet scan finds keyframes and the bytes
+before each, then a single segment-muxer pass cuts at the keyframes that
+keep every part under SPLIT_CHUNK_MB. Part metadata comes from the scan,
+so sending the parts needs no further ffprobe calls.
 """
 import asyncio
+import csv
 import json
 import math
 import os
 import shutil
+import time
 from pathlib import Path
-from typing import List, Optional, Tuple
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
 from utils.logger import logger
+from utils.ffmpeg_pool import ffmpeg_pool
+from utils.encode_policy import encode_policy
 from core.config import config
 
 # ─── Constants ────────────────────────────────────────────────────────────────
 TG_LIMIT_BYTES  = 49 * 1024 * 1024   # 49 MB safety margin
 SPLIT_CHUNK_MB  = 45                  # Each split part target
+SPLIT_OVERHEAD  = 0.98                # Share of a part's bytes that is packet payload
+PROBE_CACHE_SIZE = 256                # Files whose metadata is kept (LRU)
 MIN_VIDEO_KBPS  = 600                 # Minimum video bitrate
 AUDIO_KBPS      = 128                 # Audio bitrate (kbps)
-FFMPEG_THREADS  = "6"
 
 
 # ─── Target size lookup ───────────────────────────────────────────────────────
@@ -86,29 +104,49 @@ def _calc_video_kbps(target_mb: float, duration_s: float) -> int:
 
 # ─── FFmpeg runner ────────────────────────────────────────────────────────────
 
-async def _run_ffmpeg(args: List[str], timeout: int = None) -> Tuple[int, str]:
+def _with_threads(args: List[str], threads: int) -> List[str]:
+    """Replace any -threads option with the pool's grant (placed before the output path)"""
+    out: List[str] = []
+    skip = False
+    for a in args[:-1]:
+        if skip:
+            skip = False
+            continue
+        if a == "-threads":
+            skip = True
+            continue
+        out.append(a)
+    return out + ["-threads", str(threads), args[-1]]
+
+
+async def _run_ffmpeg(args: List[str], timeout: int = None, timing: Optional[dict] = None) -> Tuple[int, str]:
     """
-    Run FFmpeg asynchronously.
+    Run FFmpeg asynchronously once the ffmpeg pool grants it a thread budget.
     Returns (returncode, stderr_text).
+    timing, if given, receives "seconds" — process run time, excluding the pool wait.
     """
     timeout = timeout or config.FFMPEG_TIMEOUT
     try:
-        proc = await asyncio.create_subprocess_exec(
-            "ffmpeg", *args,
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        try:
-            _, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
-            return proc.returncode, stderr.decode(errors="replace")
-        except asyncio.TimeoutError:
+        async with ffmpeg_pool.reserve(ffmpeg_pool.demand(args), ffmpeg_pool.kind(args)) as threads:
+            started = time.monotonic()
+            proc = await asyncio.create_subprocess_exec(
+                "ffmpeg", *_with_threads(args, threads),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
             try:
-                proc.kill()
-                await proc.communicate()
-            except Exception:
-                pass
-            logger.warning(f"FFmpeg timed out after {timeout}s")
-            return -1, "timeout"
+                _, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+                if timing is not None:
+                    timing["seconds"] = time.monotonic() - started
+                return proc.returncode, stderr.decode(errors="replace")
+            except asyncio.TimeoutError:
+                try:
+                    proc.kill()
+                    await proc.communicate()
+                except Exception:
+                    pass
+                logger.warning(f"FFmpeg timed out after {timeout}s")
+                return -1, "timeout"
     except FileNotFoundError:
         logger.error("FFmpeg not found — install ffmpeg")
         return -1, "ffmpeg not found"
@@ -127,11 +165,122 @@ def get_file_size(path: Path) -> int:
         return 0
 
 
+# ─── Probe cache ──────────────────────────────────────────────────────────────
+# path → (mtime, size, info). Filled by ffprobe, by yt-dlp's info dict
+# (prime_video_info) and by encoders describing their own output
+# (describe_output); an entry is dropped once the file's mtime or size changes.
+_probe_cache: "OrderedDict[str, Tuple[float, int, dict]]" = OrderedDict()
+_probe_stats: Dict[str, int] = {"hits": 0, "probes": 0, "primed": 0, "described": 0}
+
+# yt-dlp codec tags → ffprobe codec names
+_YTDLP_CODECS = (
+    ("avc", "h264"), ("h264", "h264"), ("hev", "hevc"), ("hvc", "hevc"),
+    ("vp09", "vp9"), ("vp9", "vp9"), ("vp8", "vp8"), ("av01", "av1"),
+    ("mp4a", "aac"), ("aac", "aac"), ("opus", "opus"), ("vorbis", "vorbis"), ("mp3", "mp3"),
+)
+
+
+def _cache_info(path: Path, info: dict) -> None:
+    try:
+        st = path.stat()
+    except OSError:
+        return
+    _probe_cache[str(path)] = (st.st_mtime, st.st_size, dict(info))
+    _probe_cache.move_to_end(str(path))
+    while len(_probe_cache) > PROBE_CACHE_SIZE:
+        _probe_cache.popitem(last=False)
+
+
+def _cached_info(path: Path) -> Optional[dict]:
+    entry = _probe_cache.get(str(path))
+    if not entry:
+        return None
+    try:
+        st = path.stat()
+    except OSError:
+        st = None
+    if st is None or (st.st_mtime, st.st_size) != entry[:2]:
+        _probe_cache.pop(str(path), None)
+        return None
+    _probe_cache.move_to_end(str(path))
+    return dict(entry[2])
+
+
+def _ffprobe_codec(tag: Optional[str]) -> Optional[str]:
+    if not tag or tag == "none":
+        return None
+    tag = tag.lower()
+    for prefix, name in _YTDLP_CODECS:
+        if tag.startswith(prefix):
+            return name
+    return tag.split(".")[0]
+
+
+def prime_video_info(path: Path, ytdlp_info: Optional[dict]) -> bool:
+    """
+    Pre-fill the probe cache for a file yt-dlp just wrote, from its processed
+    info dict. Only when width, height, duration and codecs are all known.
+    """
+    if not ytdlp_info:
+        return False
+    info = {
+        "duration": ytdlp_info.get("duration"),
+        "vcodec": _ffprobe_codec(ytdlp_info.get("vcodec")),
+        "acodec": _ffprobe_codec(ytdlp_info.get("acodec")),
+        "width": ytdlp_info.get("width"),
+        "height": ytdlp_info.get("height"),
+        "fps": ytdlp_info.get("fps"),
+    }
+    if not all(info[k] for k in ("duration", "vcodec", "acodec", "width", "height")):
+        return False
+    info["duration"] = float(info["duration"])
+    _cache_info(path, info)
+    _probe_stats["primed"] += 1
+    return True
+
+
+def _scaled_width(source: dict, height: int) -> Optional[int]:
+    """Output width of scale=-2:{height} (even, aspect kept)"""
+    w, h = source.get("width"), source.get("height")
+    if not w or not h:
+        return None
+    return max(2, int(round(w * height / h / 2)) * 2)
+
+
+def describe_output(path: Path, source: dict, height: Optional[int] = None, fps: Optional[float] = None) -> None:
+    """
+    Cache an encoder's output from its parameters instead of probing it:
+    H.264 (+ AAC if the source had audio) at `height` (None = stream copy).
+    """
+    if height is None:
+        info = dict(source)
+    else:
+        info = {
+            **source,
+            "vcodec": "h264",
+            "acodec": "aac" if source.get("acodec") else None,
+            "width": _scaled_width(source, height),
+            "height": height,
+            "fps": fps or source.get("fps"),
+        }
+    _cache_info(path, info)
+    _probe_stats["described"] += 1
+
+
+def probe_cache_stats() -> Dict[str, object]:
+    return {**_probe_stats, "entries": len(_probe_cache)}
+
+
 async def get_video_info(path: Path) -> dict:
     """
     Get video metadata via ffprobe.
     Returns: {duration, vcodec, acodec, width, height, fps}
     """
+    cached = _cached_info(path)
+    if cached is not None:
+        _probe_stats["hits"] += 1
+        return cached
+    _probe_stats["probes"] += 1
     result = {
         "duration": None, "vcodec": None, "acodec": None,
         "width": None, "height": None, "fps": None,
@@ -169,6 +318,9 @@ async def get_video_info(path: Path) -> dict:
             elif ctype == "audio" and result["acodec"] is None:
                 result["acodec"] = stream.get("codec_name")
 
+        if result["duration"]:
+            _cache_info(path, result)
+
     except Exception as e:
         logger.debug(f"ffprobe failed: {e}")
 
@@ -231,21 +383,25 @@ async def adaptive_encode(
         ]
         rc, err = await _run_ffmpeg(args)
         if rc == 0:
+            describe_output(output_path, info)
             return True
         logger.debug(f"Stream copy failed, falling back to encode: {err[:80]}")
 
+    # Preset (and possibly a lower height) from current encode load
+    preset, target_h = encode_policy.choose(duration, target_h)
+
     # Scale filter — never upscale
     scale_filter = f"scale=-2:{target_h}:flags=lanczos"
 
     logger.debug(
         f"adaptive_encode: {duration:.0f}s → {target_h}p "
-        f"@ {video_kbps}kbps (target {target_mb}MB)"
+        f"@ {video_kbps}kbps {preset} (target {target_mb}MB)"
     )
 
     args = [
         "-y", "-i", str(input_path),
         "-vcodec", "libx264",
-        "-preset", "veryfast",
+        "-preset", preset,
         "-b:v", f"{video_kbps}k",
         "-maxrate", f"{video_kbps}k",
         "-bufsize", f"{video_kbps * 2}k",
@@ -254,12 +410,15 @@ async def adaptive_encode(
         "-b:a", f"{AUDIO_KBPS}k",
         "-movflags", "+faststart",
         "-pix_fmt", "yuv420p",
-        "-threads", FFMPEG_THREADS,
         str(output_path),
     ]
-    rc, err = await _run_ffmpeg(args)
+    timing: dict = {}
+    rc, err = await _run_ffmpeg(args, timing=timing)
     if rc != 0:
         logger.warning(f"adaptive_encode failed: {err[:200]}")
+    else:
+        encode_policy.record(preset, target_h, duration, timing.get("seconds", 0))
+        describe_output(output_path, info, target_h)
     return rc == 0
 
 
@@ -285,6 +444,7 @@ async def instagram_smart_encode(input_path: Path, output_path: Path) -> bool:
         ]
         rc, _ = await _run_ffmpeg(args)
         if rc == 0:
+            describe_output(output_path, info)
             return True
 
     # Re-encode preserving FPS
@@ -293,12 +453,13 @@ async def instagram_smart_encode(input_path: Path, output_path: Path) -> bool:
     orig_height = info.get("height") or 1080
     target_h = _target_height(duration, orig_height)
     video_kbps = _calc_video_kbps(_target_size_mb(duration), duration)
+    preset, target_h = encode_policy.choose(duration, target_h)
 
-    logger.debug(f"Instagram: re-encode {target_h}p @ {video_kbps}kbps fps={fps:.1f}")
+    logger.debug(f"Instagram: re-encode {target_h}p @ {video_kbps}kbps {preset} fps={fps:.1f}")
     args = [
         "-y", "-i", str(input_path),
         "-vcodec", "libx264",
-        "-preset", "veryfast",
+        "-preset", preset,
         "-b:v", f"{video_kbps}k",
         "-maxrate", f"{video_kbps}k",
         "-bufsize", f"{video_kbps * 2}k",
@@ -307,12 +468,15 @@ async def instagram_smart_encode(input_path: Path, output_path: Path) -> bool:
         "-b:a", f"{AUDIO_KBPS}k",
         "-movflags", "+faststart",
         "-pix_fmt", "yuv420p",
-        "-threads", FFMPEG_THREADS,
         str(output_path),
     ]
-    rc, err = await _run_ffmpeg(args)
+    timing: dict = {}
+    rc, err = await _run_ffmpeg(args, timing=timing)
     if rc != 0:
         logger.warning(f"Instagram encode failed: {err[:200]}")
+    else:
+        encode_policy.record(preset, target_h, duration, timing.get("seconds", 0))
+        describe_output(output_path, info, target_h, fps)
     return rc == 0
 
 
@@ -337,6 +501,7 @@ async def reencode_shorts(input_path: Path, output_path: Path) -> bool:
         ]
         rc, _ = await _run_ffmpeg(args)
         if rc == 0:
+            describe_output(output_path, info)
             return True
 
     return await adaptive_encode(input_path, output_path)
@@ -370,6 +535,7 @@ async def ensure_fits_telegram(
             ]
             rc, _ = await _run_ffmpeg(args)
             if rc == 0 and remuxed.exists():
+                describe_output(remuxed, await get_video_info(video_path))
                 return [remuxed]
         return [video_path]
 
@@ -386,7 +552,7 @@ async def ensure_fits_telegram(
     logger.info("Encode insufficient, splitting")
     parts = await split_video(video_path, tmp_dir)
     if parts:
-        return parts
+        return [part["path"] for part in parts]
 
     logger.warning("Could not compress or split — returning original")
     return [video_path]
@@ -394,45 +560,135 @@ async def ensure_fits_telegram(
 
 # ─── Video splitting ──────────────────────────────────────────────────────────
 
+async def _scan_keyframes(path: Path) -> List[Tuple[float, int]]:
+    """
+    Video keyframes as (pts seconds, bytes of all packets demuxed before it),
+    from one ffprobe packet scan — no decoding.
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "ffprobe",
+            "-v", "quiet",
+            "-show_entries", "packet=codec_type,pts_time,size,flags",
+            "-of", "compact=p=0",
+            str(path),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=config.FFMPEG_TIMEOUT)
+    except Exception as e:
+        logger.debug(f"Keyframe scan failed: {e}")
+        return []
+
+    keyframes: List[Tuple[float, int]] = []
+    total = 0
+    for line in stdout.decode(errors="replace").splitlines():
+        fields = dict(kv.split("=", 1) for kv in line.split("|") if "=" in kv)
+        if fields.get("codec_type") == "video" and fields.get("flags", "").startswith("K"):
+            try:
+                keyframes.append((float(fields["pts_time"]), total))
+            except (KeyError, ValueError):
+                pass
+        try:
+            total += int(fields.get("size") or 0)
+        except ValueError:
+            pass
+    keyframes.append((float("inf"), total))
+    return keyframes
+
+
+def _plan_cuts(keyframes: List[Tuple[float, int]], budget: int) -> List[float]:
+    """
+    Greedy cut times: each part ends at the last keyframe that keeps it
+    within `budget` bytes. A keyframe interval larger than the budget
+    becomes its own (oversized) part — stream copy can't cut inside it.
+    """
+    cuts: List[float] = []
+    part_start = 0
+    prev: Optional[Tuple[float, int]] = None
+    for t, before in keyframes:
+        if before - part_start > budget:
+            if prev is not None and prev[1] > part_start:
+                cuts.append(prev[0])
+                part_start = prev[1]
+            if before - part_start > budget and t != float("inf"):
+                cuts.append(t)
+                part_start = before
+        prev = (t, before)
+    return [t for t in cuts if t > 0]
+
+
 async def split_video(
     input_path: Path,
     output_dir: Path,
     chunk_mb: int = SPLIT_CHUNK_MB,
-) -> List[Path]:
-    """Split video into Telegram-safe chunks"""
-    duration = await get_video_duration(input_path)
+) -> List[dict]:
+    """
+    Split video into Telegram-safe chunks in one stream-copy pass.
+    Returns one dict per part: {path, size} + get_video_info() fields.
+    """
+    info = await get_video_info(input_path)
+    duration = info.get("duration")
     if not duration:
         return []
 
     size = get_file_size(input_path)
-    size_mb = size / 1024 / 1024
-    num_parts = math.ceil(size_mb / chunk_mb)
-    part_duration = duration / num_parts
+    budget = int(chunk_mb * 1024 * 1024 * SPLIT_OVERHEAD)
+    keyframes = await _scan_keyframes(input_path)
+    if len(keyframes) > 1:
+        cuts = _plan_cuts(keyframes, budget)
+    else:
+        # No packet data — equal time slices, cut at the next keyframe by the muxer
+        num_parts = math.ceil(size / budget)
+        cuts = [duration * i / num_parts for i in range(1, num_parts)]
 
-    logger.info(f"Splitting {size_mb:.1f}MB into {num_parts} parts")
+    logger.info(f"Splitting {size/1024/1024:.1f}MB into {len(cuts) + 1} parts at keyframes")
 
-    parts = []
     stem = input_path.stem
+    segment_list = output_dir / f"{stem}_parts.csv"
+    args = [
+        "-y", "-i", str(input_path),
+        "-c", "copy",
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-f", "segment",
+        "-segment_times", ",".join(f"{max(t - 0.001, 0):.3f}" for t in cuts) or str(duration + 1),
+        "-segment_start_number", "1",
+        "-reset_timestamps", "1",
+        "-segment_format", "mp4",
+        "-segment_format_options", "movflags=+faststart",
+        "-segment_list", str(segment_list),
+        "-segment_list_type", "csv",
+        str(output_dir / f"{stem}_part%d.mp4"),
+    ]
+    rc, err = await _run_ffmpeg(args)
+    if rc != 0:
+        logger.warning(f"Split failed: {err[:200]}")
+        return []
 
-    for i in range(num_parts):
-        start = i * part_duration
-        part_path = output_dir / f"{stem}_part{i+1}.mp4"
-        args = [
-            "-y",
-            "-ss", str(start),
-            "-i", str(input_path),
-            "-t", str(part_duration),
-            "-c", "copy",
-            "-avoid_negative_ts", "make_zero",
-            "-movflags", "+faststart",
-            str(part_path),
-        ]
-        rc, err = await _run_ffmpeg(args)
-        if rc == 0 and part_path.exists():
-            parts.append(part_path)
-        else:
-            logger.warning(f"Split part {i+1} failed: {err[:100]}")
+    parts: List[dict] = []
+    try:
+        with open(segment_list, newline="") as f:
+            rows = list(csv.reader(f))
+    except OSError as e:
+        logger.warning(f"Split: segment list unreadable: {e}")
+        return []
 
+    for row in rows:
+        if len(row) < 3:
+            continue
+        part_path = output_dir / Path(row[0]).name
+        if not part_path.exists():
+            continue
+        part = {
+            **info,
+            "path": part_path,
+            "size": get_file_size(part_path),
+            "duration": max(float(row[2]) - float(row[1]), 0.0) or None,
+        }
+        _cache_info(part_path, {k: v for k, v in part.items() if k not in ("path", "size")})
+        if part["size"] > chunk_mb * 1024 * 1024:
+            logger.warning(f"Split part {len(parts)+1} is {part['size']/1024/1024:.1f}MB — keyframe gap exceeds budget")
+        parts.append(part)
     return parts
 
 
@@ -456,6 +712,22 @@ async def extract_audio_from_video(
     return rc == 0
 
 
+async def remux_audio(source_path: Path, output_path: Path) -> bool:
+    """Copy the AAC track into a tagged, faststart M4A — no decode/encode"""
+    args = [
+        "-y", "-i", str(source_path),
+        "-vn",
+        "-c:a", "copy",
+        "-map_metadata", "0",
+        "-movflags", "+faststart",
+        str(output_path),
+    ]
+    rc, err = await _run_ffmpeg(args)
+    if rc != 0:
+        logger.debug(f"remux_audio failed: {err[:120]}")
+    return rc == 0
+
+
 # ─── Legacy compat ────────────────────────────────────────────────────────────
 
 async def reencode_video(
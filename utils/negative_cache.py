@@ -0,0 +1,196 @@
+"""
+Negative cache — remember media that failed every extraction layer.
+
+A private post / removed video / geo-blocked clip fails all layers, and each
+layer can burn a 30s socket timeout. The next paste of the same link should
+fail in milliseconds without taking a download slot.
+
+Keyed by canonical media ID (utils/media_id.py), so URL variants share one entry.
+Each entry records a failure class; the class decides the TTL:
+  permanent (private, unavailable, geo)  → NEG_CACHE_TTL_PERMANENT
+  transient (proxy, network, rate limit,
+             bot check, age gate,
+             unknown)                    → NEG_CACHE_TTL_TRANSIENT
+
+HTTP 404 is only "unavailable" on the page/extractor request — a 404 on
+a stream or fragment URL is a CDN hiccup and stays transient. The age gate
+("Sign in to confirm your age") is its own class: it is not a bot check,
+and a cookie layer with an age-verified account can still get past it.
+  format    (requested format missing)   → not cached (format-specific)
+
+In-process only — entries are short-lived, a Redis round trip would cost more
+than the lookup saves.
+
+Usage:
+    from utils.negative_cache import negative_cache
+
+    failure = negative_cache.get(url)
+    if failure:
+        ...  # reply error immediately
+
+    errors = []
+    ...  # each layer appends its error string
+    negative_cache.record(url, errors)
+"""
+import re
+import time
+from typing import Dict, List, Optional, Pattern, Tuple, Union
+
+from core.config import config
+from utils.logger import logger
+from utils.media_id import media_key
+
+# ─── Failure classification ───────────────────────────────────────────────────
+
+FAIL_PRIVATE     = "private"
+FAIL_UNAVAILABLE = "unavailable"
+FAIL_GEO         = "geo"
+FAIL_FORMAT      = "format"
+FAIL_BOT_CHECK   = "bot_check"
+FAIL_AGE_GATE    = "age_gate"
+FAIL_RATE_LIMIT  = "rate_limit"
+FAIL_PROXY       = "proxy"
+FAIL_NETWORK     = "network"
+FAIL_UNKNOWN     = "unknown"
+
+_PERMANENT = {FAIL_PRIVATE, FAIL_UNAVAILABLE, FAIL_GEO}
+
+# "Unable to download webpage: HTTP Error 404", not "... video data: HTTP Error 404"
+_PAGE_404 = re.compile(r"unable to (?:download|extract) (?!video data)[\w\s-]*: http error 404")
+_PAGE_403 = re.compile(r"unable to (?:download|extract) (?!video data)[\w\s-]*: http error 403")
+
+# Checked in order — first match wins
+_PATTERNS: List[Tuple[str, Tuple[Union[str, Pattern], ...]]] = [
+    (FAIL_GEO,         ("not available in your country", "geo restrict", "geo-restrict",
+                        "blocked it in your country")),
+    (FAIL_AGE_GATE,    ("confirm your age", "age-restricted", "age restricted",
+                        "inappropriate for some users")),
+    (FAIL_BOT_CHECK,   ("not a bot",)),
+    (FAIL_PRIVATE,     ("private video", "private post", "this account is private",
+                        "members-only", "join this channel")),
+    (FAIL_UNAVAILABLE, ("video unavailable", "has been removed", "no longer available",
+                        "does not exist", "account has been terminated", _PAGE_404,
+                        "content isn't available", "unsupported url", "no video formats")),
+    (FAIL_FORMAT,      ("requested format is not available",)),
+    (FAIL_RATE_LIMIT,  ("429", "too many requests", "rate-limit", "rate limit")),
+    (FAIL_PROXY,       ("proxy", "tunnel connection failed")),
+    (FAIL_NETWORK,     ("timed out", "timeout", "connection", "reset by peer",
+                        "temporary failure", "name resolution", "ssl")),
+]
+
+
+def _matches(err: str, needle: Union[str, Pattern]) -> bool:
+    return needle in err if isinstance(needle, str) else needle.search(err) is not None
+
+
+def classify_failure(error: str) -> str:
+    """Map a yt-dlp / HTTP error string to a failure class"""
+    err = (error or "").lower()
+    for fail_class, needles in _PATTERNS:
+        if any(_matches(err, n) for n in needles):
+            return fail_class
+    return FAIL_UNKNOWN
+
+
+def is_page_forbidden(error: str) -> bool:
+    """
+    HTTP 403 on the page/extractor request — the requester (proxy IP) was
+    refused. A 403 on one signed stream URL says nothing about the proxy.
+    """
+    return _PAGE_403.search((error or "").lower()) is not None
+
+
+def _ttl_for(fail_class: str) -> int:
+    if fail_class in _PERMANENT:
+        return config.NEG_CACHE_TTL_PERMANENT
+    return config.NEG_CACHE_TTL_TRANSIENT
+
+# ─── yt-dlp logger adapter ────────────────────────────────────────────────────
+
+class YtdlpErrorCollector:
+    """
+    yt-dlp `logger` that keeps error lines.
+    Needed where `ignoreerrors` is set — yt-dlp then reports instead of raising.
+    """
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+
+    def debug(self, msg: str) -> None:
+        pass
+
+    def info(self, msg: str) -> None:
+        pass
+
+    def warning(self, msg: str) -> None:
+        pass
+
+    def error(self, msg: str) -> None:
+        self.errors.append(str(msg))
+
+# ─── Cache ────────────────────────────────────────────────────────────────────
+
+class NegativeCache:
+    """In-process failure cache keyed by canonical media ID"""
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._stats: Dict[str, int] = {"hits": 0, "recorded": 0}
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "size": len(self._entries)}
+
+    def get(self, url: str) -> Optional[str]:
+        """Return the cached failure class for url, or None"""
+        key = media_key(url)
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        fail_class, expires_at = entry
+        if time.monotonic() >= expires_at:
+            self._entries.pop(key, None)
+            return None
+        self._stats["hits"] += 1
+        return fail_class
+
+    def record(self, url: str, errors: List[str]) -> Optional[str]:
+        """
+        Record that every layer failed for url.
+        The most permanent class seen across layers wins — a proxy error on
+        layer 1 must not mask "video unavailable" on layer 3.
+        Returns the recorded class, or None if not cacheable.
+        """
+        classes = [classify_failure(e) for e in errors] or [FAIL_UNKNOWN]
+        permanent = [c for c in classes if c in _PERMANENT]
+        if permanent:
+            fail_class = permanent[0]
+        elif FAIL_FORMAT in classes:
+            return None
+        else:
+            fail_class = classes[-1]
+
+        ttl = _ttl_for(fail_class)
+        self._prune()
+        self._entries[media_key(url)] = (fail_class, time.monotonic() + ttl)
+        self._stats["recorded"] += 1
+        logger.info(f"Negative cache: {media_key(url)} → {fail_class} ({ttl}s)")
+        return fail_class
+
+    def clear(self, url: str) -> None:
+        self._entries.pop(media_key(url), None)
+
+    def _prune(self) -> None:
+        if len(self._entries) < self.max_size:
+            return
+        now = time.monotonic()
+        for key in [k for k, (_, exp) in self._entries.items() if exp <= now]:
+            self._entries.pop(key, None)
+        # Still full — drop oldest-expiring entries
+        while len(self._entries) >= self.max_size:
+            oldest = min(self._entries, key=lambda k: self._entries[k][1])
+            self._entries.pop(oldest, None)
+
+
+# Global negative cache instance
+negative_cache = NegativeCache()
@@ -0,0 +1,147 @@
+"""
+Proxy pool — health-scored proxy selection with automatic quarantine.
+
+random.choice(PROXIES) keeps handing out dead or throttled proxies, and
+each bad pick costs a 30s socket timeout inside yt-dlp. The pool tracks
+per proxy:
+  successes / failures        (only failures that are the proxy's fault)
+  429 / 403 counts            (rate limited / blocked by the upstream site)
+  latency EWMA                (small requests only — extraction, API calls)
+  cooldown_until              (temporarily out of rotation)
+
+Outcome → action:
+  429 / "too many requests"        cooldown PROXY_COOLDOWN_RATE_LIMIT
+  page/extractor 403 /
+  "confirm you're not a bot"       cooldown PROXY_COOLDOWN_BLOCKED
+  proxy / tunnel / network error   failure; PROXY_QUARANTINE_FAILS in a row
+                                   → quarantine PROXY_QUARANTINE_TTL, doubling
+                                   on each repeat (capped at 8×)
+  private / removed / format /
+  age gate / stream-URL 403 …      not the proxy's fault — ignored
+
+pick() draws from proxies not in cooldown, weighted by
+  (successes + 1) / (successes + failures + 2) / (1 + latency / 5s)
+If every proxy is cooling down it returns the one that recovers first —
+a degraded proxy beats silently switching to the server's own IP.
+
+Usage:
+    from utils.proxy_pool import proxy_pool
+
+    proxy = proxy_pool.pick()                  # yt-dlp (http/https/socks)
+    proxy = proxy_pool.pick(http_only=True)    # aiohttp (no socks support)
+    proxy_pool.report_ok(proxy, latency=1.2)
+    proxy_pool.report_error(proxy, str(error))
+"""
+import random
+import time
+from typing import Dict, List, Optional
+
+from core.config import config
+from utils.logger import logger
+from utils.negative_cache import (
+    classify_failure, is_page_forbidden,
+    FAIL_BOT_CHECK, FAIL_NETWORK, FAIL_PROXY, FAIL_RATE_LIMIT,
+)
+
+
+class _ProxyRecord:
+    __slots__ = (
+        "successes", "failures", "rate_limited", "blocked",
+        "latency", "consecutive_fails", "quarantines", "cooldown_until",
+    )
+
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.blocked = 0
+        self.latency: Optional[float] = None
+        self.consecutive_fails = 0
+        self.quarantines = 0
+        self.cooldown_until = 0.0
+
+    def weight(self) -> float:
+        rate = (self.successes + 1) / (self.successes + self.failures + 2)
+        return rate / (1 + (self.latency or 0.0) / 5.0)
+
+
+class ProxyPool:
+    """Health-scored pool over config.PROXIES"""
+
+    def __init__(self, proxies: List[str]):
+        self._records: Dict[str, _ProxyRecord] = {p: _ProxyRecord() for p in proxies}
+
+    def pick(self, http_only: bool = False) -> Optional[str]:
+        """Weighted pick among healthy proxies, or None when no proxies are configured"""
+        candidates = [
+            p for p in self._records
+            if not http_only or p.lower().startswith(("http://", "https://"))
+        ]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        healthy = [p for p in candidates if self._records[p].cooldown_until <= now]
+        if not healthy:
+            return min(candidates, key=lambda p: self._records[p].cooldown_until)
+        weights = [self._records[p].weight() for p in healthy]
+        return random.choices(healthy, weights=weights, k=1)[0]
+
+    def report_ok(self, proxy: Optional[str], latency: Optional[float] = None) -> None:
+        rec = self._records.get(proxy) if proxy else None
+        if not rec:
+            return
+        rec.successes += 1
+        rec.consecutive_fails = 0
+        if latency is not None:
+            rec.latency = latency if rec.latency is None else 0.7 * rec.latency + 0.3 * latency
+
+    def report_error(self, proxy: Optional[str], error: str) -> None:
+        """Classify an error and penalize the proxy if it was at fault"""
+        rec = self._records.get(proxy) if proxy else None
+        if not rec:
+            return
+        err = (error or "").lower()
+        fail_class = classify_failure(err)
+        now = time.monotonic()
+
+        if fail_class == FAIL_RATE_LIMIT:
+            rec.rate_limited += 1
+            rec.failures += 1
+            rec.cooldown_until = max(rec.cooldown_until, now + config.PROXY_COOLDOWN_RATE_LIMIT)
+            logger.info(f"Proxy pool: {_mask(proxy)} rate limited, cooling down")
+        elif fail_class == FAIL_BOT_CHECK or is_page_forbidden(err):
+            # Only proxy-attributable refusals — not age gates or a 403 on one stream URL
+            rec.blocked += 1
+            rec.failures += 1
+            rec.cooldown_until = max(rec.cooldown_until, now + config.PROXY_COOLDOWN_BLOCKED)
+            logger.info(f"Proxy pool: {_mask(proxy)} blocked upstream, cooling down")
+        elif fail_class in (FAIL_PROXY, FAIL_NETWORK):
+            rec.failures += 1
+            rec.consecutive_fails += 1
+            if rec.consecutive_fails >= config.PROXY_QUARANTINE_FAILS:
+                ttl = config.PROXY_QUARANTINE_TTL * min(2 ** rec.quarantines, 8)
+                rec.quarantines += 1
+                rec.consecutive_fails = 0
+                rec.cooldown_until = max(rec.cooldown_until, now + ttl)
+                logger.warning(f"Proxy pool: {_mask(proxy)} quarantined for {ttl}s")
+
+    def stats(self) -> Dict[str, str]:
+        now = time.monotonic()
+        out: Dict[str, str] = {}
+        for proxy, rec in self._records.items():
+            cooling = rec.cooldown_until - now
+            lat = f"{rec.latency:.1f}s" if rec.latency is not None else "—"
+            out[_mask(proxy)] = (
+                f"{rec.successes}✓ {rec.failures}✗ 429×{rec.rate_limited} 403×{rec.blocked} "
+                f"lat {lat}" + (f" ⏸{int(cooling)}s" if cooling > 0 else "")
+            )
+        return out
+
+
+def _mask(proxy: str) -> str:
+    """host:port only — never log or show credentials"""
+    return proxy.rsplit("@", 1)[-1]
+
+
+# Global proxy pool instance
+proxy_pool = ProxyPool(config.PROXIES)
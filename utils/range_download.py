@@ -0,0 +1,253 @@
+"""
+Range downloader — parallel HTTP Range requests for direct media URLs.
+
+yt-dlp fetches a progressive MP4 (Instagram, Pinterest) over one
+connection, and CDNs throttle per connection, so a 40 MB reel downloads at
+a single connection's rate. For a direct http(s) format this module
+downloads the file itself instead:
+
+  probe     GET bytes=0-0 → total size, and whether ranges are honoured
+  pieces    RANGE_PIECE_MB slices in a shared queue
+  workers   up to RANGE_CONNECTIONS per job (the per-job connection
+            budget; the session's connector enforces it), each pulling the
+            next piece and writing it at its offset in a preallocated file;
+            a failed piece is retried RANGE_RETRIES times
+  fallback  no Content-Range / tiny file → one plain streaming GET
+
+File writes run in worker threads (asyncio.to_thread), never on the
+event loop. Formats that carry yt-dlp cookies, and SOCKS proxies (aiohttp
+takes http proxies only), stay with yt-dlp — the range engine would fail
+its probe on them first.
+
+Anything else (DASH/HLS, merged formats, postprocessors, playlists) is
+left to yt-dlp, which now also fetches fragments in parallel
+(DOWNLOAD_FRAGMENTS → concurrent_fragment_downloads in the option
+builders). ytdlp_download() is the glue: extract, pick the engine, download.
+
+Throughput per engine is under /perf. benchmarks/range_download.py
+measures it against a local server with per-connection throttling.
+
+Usage:
+    from utils.range_download import ytdlp_download, range_download
+
+    info = await ytdlp_download(url, opts, cancel)   # processed info or None
+    info = await ytdlp_download(url, opts, cancel, info=extracted)   # no re-extraction
+    ok = await range_download(media_url, dest, headers, proxy)
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO, Deque, Dict, Optional, Tuple
+
+import aiohttp
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadCancelled
+
+from core.config import config
+from utils.logger import logger
+
+_READ_CHUNK = 256 * 1024
+_DIRECT_PROTOCOLS = ("http", "https")
+
+_stats: Dict[str, float] = {"ranged": 0, "single": 0, "failed": 0, "bytes": 0, "seconds": 0.0}
+
+
+class _RangeError(Exception):
+    pass
+
+
+# ─── Engine ───────────────────────────────────────────────────────────────────
+
+async def _probe(session: aiohttp.ClientSession, url: str, proxy: Optional[str]) -> Tuple[Optional[int], bool]:
+    """(total size, ranges supported)"""
+    async with session.get(url, proxy=proxy, headers={"Range": "bytes=0-0"}) as resp:
+        resp.raise_for_status()
+        content_range = resp.headers.get("Content-Range", "")
+        if resp.status == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            return (int(total) if total.isdigit() else None), True
+        length = resp.headers.get("Content-Length")
+        return (int(length) if length and length.isdigit() else None), False
+
+
+def _write_at(f: BinaryIO, offset: int, data: bytes) -> None:
+    """Blocking: write `data` at `offset` — run via asyncio.to_thread"""
+    f.seek(offset)
+    f.write(data)
+
+
+def _preallocate(dest: Path, size: int) -> None:
+    with open(dest, "wb") as f:
+        f.truncate(size)
+
+
+async def _fetch_whole(
+    session: aiohttp.ClientSession, url: str, dest: Path, proxy: Optional[str], cancel: Optional[threading.Event],
+) -> int:
+    written = 0
+    async with session.get(url, proxy=proxy) as resp:
+        resp.raise_for_status()
+        with open(dest, "wb") as f:
+            async for chunk in resp.content.iter_chunked(_READ_CHUNK):
+                if cancel is not None and cancel.is_set():
+                    raise DownloadCancelled("range download cancelled")
+                await asyncio.to_thread(f.write, chunk)
+                written += len(chunk)
+    return written
+
+
+async def _worker(
+    session: aiohttp.ClientSession,
+    url: str,
+    dest: Path,
+    proxy: Optional[str],
+    pieces: Deque[Tuple[int, int]],
+    cancel: Optional[threading.Event],
+) -> None:
+    with open(dest, "r+b") as f:
+        while pieces:
+            start, end = pieces.popleft()
+            for attempt in range(config.RANGE_RETRIES + 1):
+                try:
+                    async with session.get(url, proxy=proxy, headers={"Range": f"bytes={start}-{end}"}) as resp:
+                        if resp.status != 206:
+                            raise _RangeError(f"HTTP {resp.status} for a range request")
+                        got = 0
+                        async for chunk in resp.content.iter_chunked(_READ_CHUNK):
+                            if cancel is not None and cancel.is_set():
+                                raise DownloadCancelled("range download cancelled")
+                            await asyncio.to_thread(_write_at, f, start + got, chunk)
+                            got += len(chunk)
+                        if got != end - start + 1:
+                            raise _RangeError(f"short piece {start}-{end}: {got} bytes")
+                    break
+                except (aiohttp.ClientError, asyncio.TimeoutError, _RangeError) as e:
+                    if attempt == config.RANGE_RETRIES:
+                        raise
+                    logger.debug(f"Range piece {start}-{end} retry {attempt + 1}: {e}")
+
+
+async def range_download(
+    url: str,
+    dest: Path,
+    headers: Optional[dict] = None,
+    proxy: Optional[str] = None,
+    connections: Optional[int] = None,
+    cancel: Optional[threading.Event] = None,
+) -> bool:
+    """
+    Download `url` to `dest` with up to `connections` parallel range
+    requests (default RANGE_CONNECTIONS). False on failure — `dest` removed.
+    """
+    connections = max(1, connections or config.RANGE_CONNECTIONS)
+    piece = config.RANGE_PIECE_MB * 1024 * 1024
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=30)
+    started = time.monotonic()
+    try:
+        async with aiohttp.ClientSession(
+            headers=headers, timeout=timeout, connector=aiohttp.TCPConnector(limit=connections),
+        ) as session:
+            size, ranged = await _probe(session, url, proxy)
+            if not size or not ranged or connections == 1 or size < 2 * piece:
+                written = await _fetch_whole(session, url, dest, proxy, cancel)
+                _stats["single"] += 1
+            else:
+                await asyncio.to_thread(_preallocate, dest, size)
+                pieces: Deque[Tuple[int, int]] = deque(
+                    (start, min(start + piece, size) - 1) for start in range(0, size, piece)
+                )
+                workers = [
+                    asyncio.create_task(_worker(session, url, dest, proxy, pieces, cancel))
+                    for _ in range(min(connections, len(pieces)))
+                ]
+                try:
+                    await asyncio.gather(*workers)
+                finally:
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+                written = size
+                _stats["ranged"] += 1
+    except asyncio.CancelledError:
+        dest.unlink(missing_ok=True)
+        raise
+    except DownloadCancelled:
+        dest.unlink(missing_ok=True)
+        return False
+    except Exception as e:
+        _stats["failed"] += 1
+        dest.unlink(missing_ok=True)
+        logger.debug(f"Range download failed: {type(e).__name__}: {str(e)[:100]}")
+        return False
+
+    elapsed = time.monotonic() - started
+    _stats["bytes"] += written
+    _stats["seconds"] += elapsed
+    logger.debug(f"Range download: {written/1024/1024:.1f}MB in {elapsed:.1f}s ({connections} connections)")
+    return True
+
+
+# ─── yt-dlp glue ──────────────────────────────────────────────────────────────
+
+def direct_format(info: Optional[dict], proxy: Optional[str] = None) -> Optional[dict]:
+    """
+    The single progressive http(s) format selected in a processed info
+    dict, if range_download can fetch it through `proxy` — not when it
+    needs yt-dlp's cookies or the proxy isn't http(s).
+    """
+    if not info or info.get("entries") or info.get("requested_formats"):
+        return None
+    if info.get("fragments") or (info.get("protocol") or "") not in _DIRECT_PROTOCOLS:
+        return None
+    if info.get("cookies") or (proxy and not proxy.startswith(("http://", "https://"))):
+        return None
+    return info if info.get("url") else None
+
+
+async def ytdlp_download(
+    url: str,
+    opts: dict,
+    cancel: Optional[threading.Event] = None,
+    info: Optional[dict] = None,
+) -> Optional[dict]:
+    """
+    yt-dlp extract + download where a direct progressive format goes through
+    range_download. `info` (extract_info(download=False) output, resolved
+    through opts["proxy"]) skips the extraction. Returns the processed info
+    dict (None when yt-dlp, with ignoreerrors, returned nothing). Raises
+    like YoutubeDL.download().
+    """
+    def _extract():
+        with YoutubeDL(opts) as ydl:
+            extracted = info if info is not None else ydl.extract_info(url, download=False)
+            return extracted, ydl.prepare_filename(extracted) if extracted else None
+
+    info, filename = await asyncio.to_thread(_extract)
+    fmt = direct_format(info, opts.get("proxy")) if config.RANGE_DOWNLOAD and not opts.get("postprocessors") else None
+    if fmt and filename:
+        if await range_download(fmt["url"], Path(filename), fmt.get("http_headers"), opts.get("proxy"), cancel=cancel):
+            # Same shape as a yt-dlp download, so callers read the path from it
+            info["requested_downloads"] = [{"filepath": filename}]
+            return info
+        if cancel is not None and cancel.is_set():
+            raise DownloadCancelled("attempt cancelled")
+        logger.debug("Range download failed, handing the format back to yt-dlp")
+
+    def _download():
+        with YoutubeDL(opts) as ydl:
+            return ydl.process_ie_result(info, download=True)
+
+    return await asyncio.to_thread(_download) if info else None
+
+
+def range_stats() -> Dict[str, object]:
+    seconds = _stats["seconds"]
+    return {
+        "ranged": int(_stats["ranged"]),
+        "single": int(_stats["single"]),
+        "failed": int(_stats["failed"]),
+        "MB": f"{_stats['bytes'] / 1024 / 1024:.0f}",
+        "avg_MBps": f"{_stats['bytes'] / 1024 / 1024 / seconds:.1f}" if seconds else "—",
+    }
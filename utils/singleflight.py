@@ -0,0 +1,132 @@
+"""
+Request coalescing (singleflight) for identical in-flight downloads.
+
+When 30 people paste the same reel within a minute, only the first request
+(the leader) downloads, encodes and uploads. Everyone else (followers) waits
+for the leader to finish and gets its outcome — one download, one encode,
+one upload:
+
+  succeed(file_ids)   the Telegram file_id(s) sent — one, or every part of
+                      a split video in order; followers re-send them
+  fail(failure)       a negative-cache failure class; followers reply the
+                      error right away instead of retrying the download
+  neither             leader crashed, was cancelled or failed without a
+                      failure class (timeout, upload error); followers fall
+                      through to their own download
+
+Key = canonical media ID + format tag, so URL variants coalesce too.
+Followers never hold a download_scheduler slot while waiting. A follower
+that times out waiting has no outcome and proceeds alone.
+
+Usage:
+    from utils.singleflight import singleflight
+
+    flight = await singleflight.join(url, "video")
+    try:
+        if not flight.leader:
+            if flight.file_ids:
+                ...  # send by file_id
+                return
+            if flight.failure:
+                ...  # reply error
+                return
+        ...  # download → encode → upload → url_cache.set()
+        flight.succeed(file_id)   # or flight.fail(negative_cache.get(url))
+    finally:
+        flight.release()
+"""
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from core.config import config
+from utils.logger import logger
+from utils.media_id import media_key
+
+
+class Flight:
+    """Handle for one request's participation in a coalesced download"""
+
+    def __init__(
+        self,
+        group: "SingleFlight",
+        key: str,
+        leader: bool,
+        outcome: Tuple[List[str], Optional[str]] = ([], None),
+    ):
+        self._group = group
+        self.key = key
+        self.leader = leader
+        # Leader: what it will publish. Follower: what the leader published.
+        self.file_ids, self.failure = list(outcome[0]), outcome[1]
+        self._released = False
+
+    def succeed(self, *file_ids: str) -> None:
+        """Leader: publish the file_id(s) it sent (parts in order)"""
+        self.file_ids, self.failure = [f for f in file_ids if f], None
+
+    def fail(self, failure: Optional[str]) -> None:
+        """
+        Leader: publish a failure class — followers fail fast with it.
+        None publishes nothing: a transient failure is no reason for
+        followers not to try for themselves.
+        """
+        self.file_ids, self.failure = [], failure or None
+
+    def release(self) -> None:
+        """Leader: wake all followers with its outcome. Follower: no-op. Idempotent."""
+        if self.leader and not self._released:
+            self._released = True
+            self._group._finish(self.key, (self.file_ids, self.failure))
+
+
+class SingleFlight:
+    """Tracks in-flight downloads and parks duplicate requests behind them"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats: Dict[str, int] = {
+            "leaders": 0, "coalesced": 0, "shared": 0, "shared_failures": 0, "wait_timeouts": 0,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "in_flight": len(self._inflight)}
+
+    @staticmethod
+    def _key(url: str, fmt: str) -> str:
+        return f"{media_key(url)}:{fmt}"
+
+    async def join(self, url: str, fmt: str, timeout: Optional[int] = None) -> Flight:
+        """
+        Become leader for url+fmt, or wait for the current leader to finish.
+        Followers give up waiting after `timeout` (default DOWNLOAD_TIMEOUT)
+        and proceed on their own; otherwise they carry the leader's outcome.
+        """
+        key = self._key(url, fmt)
+        existing = self._inflight.get(key)
+        if existing is None:
+            self._inflight[key] = asyncio.get_running_loop().create_future()
+            self._stats["leaders"] += 1
+            return Flight(self, key, leader=True)
+
+        self._stats["coalesced"] += 1
+        logger.info(f"Singleflight: coalescing request for {key}")
+        try:
+            outcome = await asyncio.wait_for(asyncio.shield(existing), timeout=timeout or config.DOWNLOAD_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._stats["wait_timeouts"] += 1
+            logger.warning(f"Singleflight: leader for {key} still running, proceeding alone")
+            return Flight(self, key, leader=False)
+        if outcome[0]:
+            self._stats["shared"] += 1
+        elif outcome[1]:
+            self._stats["shared_failures"] += 1
+        return Flight(self, key, leader=False, outcome=outcome)
+
+    def _finish(self, key: str, outcome: Tuple[List[str], Optional[str]]) -> None:
+        future = self._inflight.pop(key, None)
+        if future and not future.done():
+            future.set_result(outcome)
+
+
+# Global singleflight instance
+singleflight = SingleFlight()
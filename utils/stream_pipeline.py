@@ -0,0 +1,172 @@
+"""
+Stream pipeline — encode straight from the media URL, no intermediate file.
+
+The file path downloads the whole video, reads it back for remux/encode and
+a third time for upload, so a reel's time to delivery is download + encode.
+For short-form content (≤ STREAM_PIPELINE_MAX_DURATION) the downloaders
+resolve the chosen format's direct URL(s) from yt-dlp's info dict instead,
+and ffmpeg reads them over HTTP while it encodes — time to delivery becomes
+roughly max(download, encode).
+
+  H.264/AAC already under the target size   stream copy (remux)
+  anything else                             adaptive_encode's recipe:
+                                            target size/height/bitrate,
+                                            preset from the encode policy
+
+Separate video/audio formats are two ffmpeg inputs. Request headers come
+from the format; the extraction proxy is passed as -http_proxy, because
+signed media URLs are bound to the IP that resolved them. SOCKS proxies,
+DASH manifests and anything else ffmpeg can't read directly make
+stream_inputs() return None — so do formats with downloader_options:
+googlevideo serves DASH streams fast only in http_chunk_size ranges, and
+ffmpeg's single un-chunked GET gets throttled to playback speed (YouTube
+streams its HLS formats instead).
+
+On any failure the caller uses the normal download path. The output is a
+faststart MP4, described into the probe cache from its parameters.
+
+ffmpeg reads the inputs at network speed, so a stream encode holds the
+ffmpeg pool's smaller FFMPEG_STREAM_THREADS budget, not a full encode's.
+
+Usage:
+    from utils.stream_pipeline import stream_inputs, stream_to_mp4
+
+    if stream_inputs(processed_info, proxy):
+        ok = await stream_to_mp4(processed_info, tmp / "stream.mp4", proxy)
+"""
+from pathlib import Path
+from typing import List, Optional
+
+from core.config import config
+from utils.logger import logger
+from utils.encode_policy import encode_policy
+from utils.media_processor import (
+    _run_ffmpeg, _target_size_mb, _target_height, _calc_video_kbps, _ffprobe_codec,
+    describe_output, AUDIO_KBPS,
+)
+from utils.format_fit import predict_size
+
+_STREAMABLE_PROTOCOLS = ("http", "https", "m3u8", "m3u8_native")
+
+_stats = {"streamed": 0, "copied": 0, "encoded": 0, "failed": 0, "skipped": 0}
+
+
+def stream_inputs(info: Optional[dict], proxy: Optional[str] = None) -> Optional[List[dict]]:
+    """
+    The format dicts ffmpeg would read for a processed yt-dlp info dict —
+    one (progressive) or two (video + audio) — or None if not streamable.
+    """
+    if not info or info.get("entries"):
+        return None
+    if proxy and not proxy.startswith("http"):
+        return None
+    formats = info.get("requested_formats") or [info]
+    if len(formats) > 2:
+        return None
+    for fmt in formats:
+        if not fmt.get("url") or (fmt.get("protocol") or "https") not in _STREAMABLE_PROTOCOLS:
+            return None
+        # Chunked-range downloads (googlevideo DASH) — one plain GET is throttled
+        if fmt.get("downloader_options"):
+            return None
+    return list(formats)
+
+
+def _input_args(fmt: dict, proxy: Optional[str]) -> List[str]:
+    args = ["-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "5"]
+    headers = fmt.get("http_headers") or {}
+    if headers:
+        args += ["-headers", "".join(f"{k}: {v}\r\n" for k, v in headers.items())]
+    if proxy:
+        args += ["-http_proxy", proxy]
+    return args + ["-i", fmt["url"]]
+
+
+def _source_info(info: dict, formats: List[dict]) -> dict:
+    """get_video_info()-shaped description of what the inputs carry"""
+    video = next((f for f in formats if f.get("vcodec") not in (None, "none")), formats[0])
+    audio = next((f for f in formats if f.get("acodec") not in (None, "none")), None)
+    return {
+        "duration": float(info.get("duration") or 0) or None,
+        "vcodec": _ffprobe_codec(video.get("vcodec")),
+        "acodec": _ffprobe_codec(audio.get("acodec")) if audio else None,
+        "width": video.get("width") or info.get("width"),
+        "height": video.get("height") or info.get("height"),
+        "fps": video.get("fps") or info.get("fps"),
+    }
+
+
+async def stream_to_mp4(
+    info: dict,
+    output_path: Path,
+    proxy: Optional[str] = None,
+    keep_fps: bool = False,
+) -> bool:
+    """
+    Remux or encode the formats selected in `info` (processed, download=False)
+    from their URLs into a faststart MP4. keep_fps caps the encode at the
+    source frame rate (≤ 60), as instagram_smart_encode does.
+    """
+    formats = stream_inputs(info, proxy)
+    if not formats:
+        _stats["skipped"] += 1
+        return False
+
+    source = _source_info(info, formats)
+    duration = source["duration"] or 30.0
+    sizes = [predict_size(f, duration) for f in formats]
+    predicted = sum(sizes) if all(sizes) else None
+    target_bytes = int(_target_size_mb(duration) * 1024 * 1024)
+    copy = (
+        source["vcodec"] == "h264" and source["acodec"] in ("aac", None)
+        and predicted is not None and predicted <= target_bytes
+    )
+
+    args = ["-y"]
+    for fmt in formats:
+        args += _input_args(fmt, proxy)
+    if len(formats) == 2:
+        video_idx = 0 if formats[0].get("vcodec") not in (None, "none") else 1
+        args += ["-map", f"{video_idx}:v:0", "-map", f"{1 - video_idx}:a:0"]
+    else:
+        args += ["-map", "0:v:0", "-map", "0:a:0?"]
+
+    out_h = fps = None
+    if copy:
+        args += ["-c", "copy"]
+    else:
+        kbps = _calc_video_kbps(_target_size_mb(duration), duration)
+        preset, out_h = encode_policy.choose(duration, _target_height(duration, source["height"] or 1080))
+        fps = min(source["fps"] or 30.0, 60.0) if keep_fps else None
+        vf = f"scale=-2:{out_h}:flags=lanczos" + (f",fps={fps:.3f}" if fps else "")
+        args += [
+            "-vcodec", "libx264",
+            "-preset", preset,
+            "-b:v", f"{kbps}k",
+            "-maxrate", f"{kbps}k",
+            "-bufsize", f"{kbps * 2}k",
+            "-vf", vf,
+            "-acodec", "aac",
+            "-b:a", f"{AUDIO_KBPS}k",
+            "-pix_fmt", "yuv420p",
+        ]
+    args += ["-movflags", "+faststart", str(output_path)]
+
+    logger.info(
+        f"Stream pipeline: {len(formats)} input(s), {duration:.0f}s → "
+        f"{'copy' if copy else f'{out_h}p encode'}"
+    )
+    rc, err = await _run_ffmpeg(args, timeout=config.FFMPEG_TIMEOUT)
+    if rc != 0 or not output_path.exists() or not output_path.stat().st_size:
+        _stats["failed"] += 1
+        logger.warning(f"Stream pipeline failed, using the file path: {err[:200]}")
+        return False
+
+    _stats["streamed"] += 1
+    _stats["copied" if copy else "encoded"] += 1
+    describe_output(output_path, source, out_h, fps)
+    return True
+
+
+def stream_stats() -> dict:
+    return dict(_stats)
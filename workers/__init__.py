@@ -1,4 +1,10 @@
 """Worker module for async task management"""
-from .task_queue import download_semaphore, music_semaphore, spotify_semaphore
+from .task_queue import (
+    FairScheduler, Ticket, download_scheduler, music_scheduler, spotify_scheduler,
+    PRIORITY_SINGLE, PRIORITY_PLAYLIST, PRIORITY_PREFETCH,
+)
 
-__all__ = ['download_semaphore', 'music_semaphore', 'spotify_semaphore']
+__all__ = [
+    'FairScheduler', 'Ticket', 'download_scheduler', 'music_scheduler', 'spotify_scheduler',
+    'PRIORITY_SINGLE', 'PRIORITY_PLAYLIST', 'PRIORITY_PREFETCH',
+]
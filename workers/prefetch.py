@@ -0,0 +1,111 @@
+"""
+Ordered prefetch — download playlist tracks ahead while the current one uploads.
+
+Playlists used to run download → upload → next, leaving the network idle
+during uploads and Telegram idle during downloads. ordered_prefetch() keeps
+up to `ahead` fetches running in the background and yields results strictly
+in input order, so DM delivery order is unchanged.
+
+Each fetch gets a private temp dir that lives until the consumer moves on to
+the next item, and a scheduler ticket (workers/task_queue.py) it enters only
+when it actually needs capacity — cache hits never take a slot. Tickets
+start as PRIORITY_PREFETCH; the one the consumer is blocked on is promoted
+to PRIORITY_PLAYLIST.
+
+A fetch that raises yields result=None (logged), it never aborts the
+playlist. Leaving the loop early (e.g. bot blocked) cancels the pending
+fetches and removes their temp dirs — always close the stream.
+
+Usage:
+    from workers.prefetch import ordered_prefetch
+
+    async def fetch(url, tmp, slot):
+        async with slot:
+            return await download(url, tmp)
+
+    stream = ordered_prefetch(urls, fetch, ahead=config.PLAYLIST_PREFETCH,
+                              scheduler=music_scheduler, user_id=user_id)
+    try:
+        async for i, url, result, tmp in stream:
+            ...  # send result to DM; tmp is still on disk here
+    finally:
+        await stream.aclose()
+"""
+import asyncio
+import tempfile
+from collections import deque
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Deque, List, Optional, Sequence, Tuple, TypeVar
+
+from utils.logger import logger
+from workers.task_queue import FairScheduler, Ticket, PRIORITY_PLAYLIST, PRIORITY_PREFETCH
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def _fetch_into_tmp(
+    item: T,
+    fetch: Callable[[T, Path, Ticket], Awaitable[R]],
+    slot: Ticket,
+) -> Tuple[tempfile.TemporaryDirectory, Optional[R]]:
+    tmp_dir = tempfile.TemporaryDirectory(prefix="prefetch_")
+    try:
+        return tmp_dir, await fetch(item, Path(tmp_dir.name), slot)
+    except asyncio.CancelledError:
+        tmp_dir.cleanup()
+        raise
+    except Exception as e:
+        logger.error(f"Prefetch: fetch failed: {type(e).__name__}: {e}", exc_info=True)
+        return tmp_dir, None
+
+
+async def ordered_prefetch(
+    items: Sequence[T],
+    fetch: Callable[[T, Path, Ticket], Awaitable[R]],
+    ahead: int,
+    scheduler: FairScheduler,
+    user_id: int,
+) -> AsyncIterator[Tuple[int, T, Optional[R], Path]]:
+    """
+    Yield (index, item, result, tmp) in input order with up to `ahead`
+    fetches in flight beyond the item currently being consumed.
+    """
+    items = list(items)
+    ahead = max(1, ahead)
+    pending: Deque[Tuple[Ticket, asyncio.Task]] = deque()
+    next_index = 0
+
+    def fill() -> None:
+        nonlocal next_index
+        while next_index < len(items) and len(pending) < ahead:
+            slot = scheduler.slot(user_id, PRIORITY_PREFETCH)
+            task = asyncio.create_task(_fetch_into_tmp(items[next_index], fetch, slot))
+            pending.append((slot, task))
+            next_index += 1
+
+    try:
+        fill()
+        index = 0
+        while pending:
+            slot, task = pending.popleft()
+            # The consumer is blocked on this one now
+            slot.promote(PRIORITY_PLAYLIST)
+            fill()
+            tmp_dir, result = await task
+            try:
+                yield index, items[index], result, Path(tmp_dir.name)
+            finally:
+                tmp_dir.cleanup()
+            index += 1
+    finally:
+        await _cancel_all([task for _, task in pending])
+
+
+async def _cancel_all(tasks: List[asyncio.Task]) -> None:
+    for task in tasks:
+        task.cancel()
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        # Finished before the cancel landed — its temp dir is still ours to remove
+        if isinstance(result, tuple):
+            result[0].cleanup()
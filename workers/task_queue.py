@@ -1,13 +1,311 @@
-"""Task queue and concurrency management"""
+"""
+Task queue and concurrency management — fair, prioritized download slots.
+
+Plain asyncio.Semaphores are FIFO: one user's 200-track playlist queued
+ahead of everyone else's Shorts holds every slot until it drains.
+FairScheduler hands out the same capacity, but in this order:
+
+  1. priority class    PRIORITY_SINGLE   → a user is waiting on this message
+                       PRIORITY_PLAYLIST → the playlist track being delivered now
+                       PRIORITY_PREFETCH → playlist tracks downloaded ahead
+  2. within a class    deficit round robin across users — each user with
+                       waiting tickets earns `quantum` per round and spends
+                       the ticket's cost, so users alternate regardless of
+                       how many tickets each has queued
+
+Tickets carry a cost in capacity units (utils/job_cost.py — a 10s reel
+is ~1, a 3-hour podcast that needs re-encoding several). When the next
+ticket is too heavy for the free capacity, lighter tickets that fit are
+backfilled past it for up to ADMISSION_MAX_DEFER seconds; after that the
+scheduler drains for the heavy one so it can't starve.
+
+Tickets can be promoted while waiting (a prefetch becomes the track the
+playlist is blocked on) and report their queue position. admission()
+previews a ticket before it is entered: runs now or queued, position and
+an estimated wait from the measured seconds-per-unit of recent jobs.
+
+Usage:
+    from workers.task_queue import download_scheduler, PRIORITY_PLAYLIST
+
+    async with download_scheduler.slot(user_id):
+        ...  # download
+
+    ticket = music_scheduler.slot(user_id, PRIORITY_PREFETCH)
+    ticket.position()          # 1-based while queued, 0 once running
+    ticket.promote(PRIORITY_PLAYLIST)
+    async with ticket:
+        ...
+
+    ticket = download_scheduler.slot(user_id, cost=4.0)
+    runs_now, position, wait_s = download_scheduler.admission(ticket)
+"""
 import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
+
 from core.config import config
 
-# ─── Global semaphores ────────────────────────────────────────────────────────
+PRIORITY_SINGLE   = 0
+PRIORITY_PLAYLIST = 1
+PRIORITY_PREFETCH = 2
+
+_PRIORITY_NAMES = {PRIORITY_SINGLE: "single", PRIORITY_PLAYLIST: "playlist", PRIORITY_PREFETCH: "prefetch"}
+
+
+class Ticket:
+    """One request for capacity — use as an async context manager"""
+
+    def __init__(self, scheduler: "FairScheduler", user_id: int, priority: int, cost: float = 1.0):
+        self._scheduler = scheduler
+        self.user_id = user_id
+        self.priority = priority
+        self.cost = cost
+        self._future: Optional[asyncio.Future] = None
+        self.granted = False
+        self.queued_at = 0.0
+        self.granted_at = 0.0
+
+    async def __aenter__(self) -> "Ticket":
+        await self._scheduler._acquire(self)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._scheduler._release(self)
+
+    def promote(self, priority: int) -> None:
+        """Move to a more urgent class if still waiting"""
+        self._scheduler._promote(self, priority)
+
+    def position(self) -> Optional[int]:
+        """1-based queue position while waiting, 0 once running, None if not submitted"""
+        return self._scheduler._position(self)
+
+
+class FairScheduler:
+    """Capacity-limited, priority-classed, per-user fair replacement for a semaphore"""
+
+    def __init__(self, name: str, capacity: int, quantum: float = 1.0):
+        self.name = name
+        self.capacity = capacity
+        self.quantum = quantum
+        self._in_use = 0.0
+        self._running = 0
+        self._unit_seconds = config.ADMISSION_UNIT_SECONDS  # EWMA hold time per cost unit
+        # priority → user → waiting tickets (OrderedDict order is the DRR rotation)
+        self._queues: Dict[int, "OrderedDict[int, Deque[Ticket]]"] = {}
+        self._deficit: Dict[Tuple[int, int], float] = {}
+        self._stats: Dict[str, int] = {"granted": 0, "queued": 0, "cancelled": 0, "backfilled": 0}
+
+    def slot(self, user_id: int, priority: int = PRIORITY_SINGLE, cost: float = 1.0) -> Ticket:
+        return Ticket(self, user_id, priority, min(max(cost, 0.1), self.capacity))
+
+    # ─── Acquire / release ────────────────────────────────────────────────────
+
+    async def _acquire(self, ticket: Ticket) -> None:
+        if not self._waiting() and self._fits(ticket):
+            self._grant(ticket)
+            return
+
+        ticket._future = asyncio.get_running_loop().create_future()
+        ticket.queued_at = time.monotonic()
+        self._queues.setdefault(ticket.priority, OrderedDict()).setdefault(ticket.user_id, deque()).append(ticket)
+        self._stats["queued"] += 1
+        # A heavy ticket may be holding the queue with capacity to spare
+        self._dispatch()
+        try:
+            await ticket._future
+        except asyncio.CancelledError:
+            if ticket.granted:
+                self._release(ticket)
+            else:
+                self._remove(ticket)
+                self._stats["cancelled"] += 1
+            raise
+
+    def _release(self, ticket: Ticket) -> None:
+        if not ticket.granted:
+            return
+        ticket.granted = False
+        self._in_use -= ticket.cost
+        self._running -= 1
+        per_unit = (time.monotonic() - ticket.granted_at) / ticket.cost
+        self._unit_seconds = 0.8 * self._unit_seconds + 0.2 * per_unit
+        self._dispatch()
+
+    def _fits(self, ticket: Ticket) -> bool:
+        # An oversized ticket still runs — alone
+        return self._in_use + ticket.cost <= self.capacity or self._running == 0
+
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.granted = True
+        ticket.granted_at = time.monotonic()
+        self._in_use += ticket.cost
+        self._running += 1
+        self._stats["granted"] += 1
+
+    # ─── Deficit round robin ──────────────────────────────────────────────────
+
+    def _waiting(self) -> int:
+        return sum(len(q) for users in self._queues.values() for q in users.values())
+
+    def _head(self) -> Optional[Ticket]:
+        """
+        Next ticket by priority, then DRR — None if nothing waits.
+        The user at the front of the rotation earns a quantum when its
+        credit can't cover its next ticket, and goes to the back if it
+        still can't.
+        """
+        for priority in sorted(self._queues):
+            users = self._queues[priority]
+            if not users:
+                continue
+            while True:
+                user_id, queue = next(iter(users.items()))
+                key = (priority, user_id)
+                if self._deficit.get(key, 0.0) < queue[0].cost:
+                    self._deficit[key] = self._deficit.get(key, 0.0) + self.quantum
+                if self._deficit[key] >= queue[0].cost:
+                    return queue[0]
+                users.move_to_end(user_id)
+        return None
+
+    def _rotate(self, ticket: Ticket) -> None:
+        """After serving `ticket`, its user yields the front unless credit covers its next one"""
+        users = self._queues.get(ticket.priority)
+        queue = users.get(ticket.user_id) if users else None
+        if queue and self._deficit.get((ticket.priority, ticket.user_id), 0.0) < queue[0].cost:
+            users.move_to_end(ticket.user_id)
+
+    def _backfill(self, head: Ticket) -> Optional[Ticket]:
+        """A lighter waiting ticket that fits now, unless `head` has waited long enough"""
+        if time.monotonic() - head.queued_at >= config.ADMISSION_MAX_DEFER:
+            return None
+        for priority in sorted(self._queues):
+            for queue in self._queues[priority].values():
+                for ticket in queue:
+                    if ticket is not head and self._fits(ticket):
+                        return ticket
+        return None
+
+    def _dispatch(self) -> None:
+        while True:
+            ticket = self._head()
+            if ticket is None:
+                return
+            served = self._fits(ticket)
+            if served:
+                self._deficit[(ticket.priority, ticket.user_id)] -= ticket.cost
+            else:
+                # Heavy head — let light jobs use the free capacity meanwhile
+                ticket = self._backfill(ticket)
+                if ticket is None:
+                    return
+                self._stats["backfilled"] += 1
+            self._remove(ticket)
+            if served:
+                self._rotate(ticket)
+            self._grant(ticket)
+            if not ticket._future.done():
+                ticket._future.set_result(None)
+
+    def _remove(self, ticket: Ticket) -> None:
+        users = self._queues.get(ticket.priority)
+        queue = users.get(ticket.user_id) if users else None
+        if not queue or ticket not in queue:
+            return
+        queue.remove(ticket)
+        if not queue:
+            del users[ticket.user_id]
+            self._deficit.pop((ticket.priority, ticket.user_id), None)
+
+    def _promote(self, ticket: Ticket, priority: int) -> None:
+        if ticket.granted or ticket._future is None or ticket._future.done() or priority >= ticket.priority:
+            ticket.priority = min(ticket.priority, priority)
+            return
+        self._remove(ticket)
+        ticket.priority = priority
+        self._queues.setdefault(priority, OrderedDict()).setdefault(ticket.user_id, deque()).append(ticket)
+        self._dispatch()
+
+    # ─── Introspection ────────────────────────────────────────────────────────
+
+    def _position(self, ticket: Ticket) -> Optional[int]:
+        """
+        Estimated 1-based position: every ticket in a more urgent class, plus
+        each user's tickets in this class that round robin serves first —
+        users ahead in the rotation get one more turn than users behind.
+        """
+        if ticket.granted:
+            return 0
+        users = self._queues.get(ticket.priority)
+        queue = users.get(ticket.user_id) if users else None
+        if not queue or ticket not in queue:
+            return None
+        depth = queue.index(ticket)
+        ahead = sum(
+            len(q) for p, us in self._queues.items() if p < ticket.priority for q in us.values()
+        )
+        before = True
+        for user_id, q in users.items():
+            if user_id == ticket.user_id:
+                before = False
+                continue
+            ahead += min(len(q), depth + 1 if before else depth)
+        return ahead + depth + 1
+
+    def queued_for(self, user_id: int) -> int:
+        return sum(len(us.get(user_id, ())) for us in self._queues.values())
+
+    def running(self) -> int:
+        return self._running
+
+    def waiting(self) -> int:
+        return self._waiting()
+
+    def estimate_wait(self, units_ahead: float, cost: float) -> float:
+        """Seconds until `cost` units are free with `units_ahead` queued before it"""
+        shortfall = self._in_use + units_ahead + cost - self.capacity
+        if shortfall <= 0:
+            return 0.0
+        # Capacity turns over `capacity` units every `_unit_seconds`
+        return shortfall * self._unit_seconds / self.capacity
+
+    def admission(self, ticket: Ticket) -> Tuple[bool, int, float]:
+        """
+        Preview for a ticket not yet entered: (runs now, queue position,
+        estimated wait seconds). Position counts tickets in the same or a
+        more urgent class — round robin may well serve it sooner.
+        """
+        if not self._waiting() and self._fits(ticket):
+            return True, 0, 0.0
+        ahead = [
+            t for p, us in self._queues.items() if p <= ticket.priority
+            for q in us.values() for t in q
+        ]
+        units_ahead = sum(t.cost for t in ahead)
+        return False, len(ahead) + 1, self.estimate_wait(units_ahead, ticket.cost)
+
+    def stats(self) -> Dict[str, object]:
+        out: Dict[str, object] = {
+            "running": f"{self._running} ({self._in_use:g}/{self.capacity} units)",
+            "unit_seconds": f"{self._unit_seconds:.1f}s",
+            **self._stats,
+        }
+        for priority in sorted(self._queues):
+            users = self._queues[priority]
+            waiting = sum(len(q) for q in users.values())
+            if waiting:
+                out[f"waiting {_PRIORITY_NAMES.get(priority, priority)}"] = f"{waiting} ({len(users)} users)"
+        return out
+
+
+# ─── Global schedulers ────────────────────────────────────────────────────────
 # These control how many concurrent downloads run globally
 
-download_semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_DOWNLOADS)
-music_semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_MUSIC)
-spotify_semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_SPOTIFY)
+download_scheduler = FairScheduler("download", config.MAX_CONCURRENT_DOWNLOADS)
+music_scheduler = FairScheduler("music", config.MAX_CONCURRENT_MUSIC)
+spotify_scheduler = FairScheduler("spotify", config.MAX_CONCURRENT_SPOTIFY)
 
 # ─── Note ─────────────────────────────────────────────────────────────────────
 # Per-user concurrency is handled in utils/watchdog.py via acquire_user_slot()